@@ -53,14 +53,19 @@ class Application(QApplication):
         # Connect the SIGINT signal to a slot
         signal.signal(signal.SIGINT, self._handle_sigint)  # type: ignore
         # Create and show the main window
+        time_start = time.perf_counter()
         self.main_window = MainWindow()
+        self.aboutToQuit.connect(self.main_window.window_widget.shutdown)
         self.main_window.show()
+        # The model and cameras keep loading in the background, see Window
+        LOGGER.info("Main window shown in %.2f s", time.perf_counter() - time_start)
 
     def _handle_sigint(self, *_: Tuple[Any, ...]) -> None:
         """Perform any cleanup or save operations here
         before exiting the application due to a SIGINT/keyboard interrupt
         """
         LOGGER.info("SIGINT received. Shutting down gracefully.")
+        self.main_window.window_widget.db_api.flush()
         self.quit()
         # app.setQuitOnLastWindowClosed(False) # useful if we use system tray icon
         # if QSystemTrayIcon.isSystemTrayAvailable() and QSystemTrayIcon.supportsMessages():
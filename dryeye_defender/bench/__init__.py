@@ -0,0 +1 @@
+"""Headless benchmarks of the hot paths, run with `python -m dryeye_defender.bench`"""
@@ -0,0 +1,164 @@
+"""Command line entry point of the benchmarks, printing their report as JSON
+
+Usage:
+    python -m dryeye_defender.bench pipeline <video file or image directory>
+    python -m dryeye_defender.bench database [--baseline <report>] [--save_baseline]
+
+A report with regressions compared to the baseline exits with a non-zero status.
+"""
+import json
+import logging
+import os
+import sys
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+LEVEL = os.environ.get("LOGLEVEL", "WARNING")
+logging.basicConfig(level=LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+LOGGER = logging.getLogger(__name__)
+
+
+def run_pipeline(args: Namespace) -> dict[str, Any]:
+    """Run the pipeline benchmark from the parsed arguments
+
+    :param args: parsed command line arguments
+    :return: the report
+    """
+    # Imported here so that the other benchmarks do not need the model and Qt
+    from dryeye_defender.bench.pipeline import (  # pylint: disable=import-outside-toplevel
+        run_pipeline_benchmark,
+    )
+    return run_pipeline_benchmark(args.source,
+                                  loops=args.loops,
+                                  max_frames=args.max_frames,
+                                  warmup_frames=args.warmup_frames,
+                                  pipelined=args.pipelined,
+                                  roi_tracking=args.roi_tracking)
+
+
+def run_database(args: Namespace) -> dict[str, Any]:
+    """Run the database benchmark from the parsed arguments, saving it as the new baseline if
+    requested
+
+    :param args: parsed command line arguments
+    :return: the report
+    """
+    from dryeye_defender.bench.database import (  # pylint: disable=import-outside-toplevel
+        run_database_benchmark,
+    )
+    baseline = None
+    if args.baseline is not None and args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    report = run_database_benchmark(args.histories,
+                                    repeats=args.repeats,
+                                    data_dir=args.data_dir,
+                                    seed=args.seed,
+                                    baseline=baseline,
+                                    regression_threshold=args.regression_threshold,
+                                    frames_per_second=args.frames_per_second)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        LOGGER.info("Baseline written to %s", args.baseline)
+    return report
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> Namespace:
+    """Parse the command line arguments
+
+    :param argv: arguments, defaults to sys.argv
+    :return: the parsed arguments
+    """
+    parser = ArgumentParser("python -m dryeye_defender.bench",
+                            description="Run a headless benchmark and print its report as JSON")
+    parser.add_argument("--output",
+                        "-o",
+                        type=Path,
+                        help="also write the report to this file")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", help="replay recorded frames through the capture, inference and database path")
+    pipeline_parser.add_argument("source",
+                                 type=Path,
+                                 help="video file, or directory of images replayed in name order")
+    pipeline_parser.add_argument("--loops",
+                                 type=int,
+                                 default=1,
+                                 help="number of times the source is replayed")
+    pipeline_parser.add_argument("--max_frames",
+                                 type=int,
+                                 help="stop after measuring this many frames")
+    pipeline_parser.add_argument("--warmup_frames",
+                                 type=int,
+                                 default=10,
+                                 help="frames processed before measuring")
+    pipeline_parser.add_argument("--pipelined",
+                                 action="store_true",
+                                 help="read frames on a capture thread")
+    pipeline_parser.add_argument("--roi_tracking",
+                                 action="store_true",
+                                 help="run inference on a crop around the face")
+    pipeline_parser.set_defaults(run=run_pipeline)
+
+    database_parser = subparsers.add_parser(
+        "database", help="time the database queries on synthetic histories of increasing length")
+    database_parser.add_argument("--histories",
+                                 nargs="+",
+                                 choices=["1_day", "30_days", "1_year", "3_years"],
+                                 default=["1_day", "30_days", "1_year", "3_years"],
+                                 help="synthetic histories to benchmark")
+    database_parser.add_argument("--repeats",
+                                 type=int,
+                                 default=20,
+                                 help="number of timed calls of each query")
+    database_parser.add_argument("--data_dir",
+                                 type=Path,
+                                 help="directory the histories are generated in and reused from")
+    database_parser.add_argument("--seed",
+                                 type=int,
+                                 default=0,
+                                 help="seed of the synthetic histories")
+    database_parser.add_argument("--frames_per_second",
+                                 type=float,
+                                 default=30.0,
+                                 help="rate of the per-frame rows of the synthetic histories")
+    database_parser.add_argument("--baseline",
+                                 type=Path,
+                                 help="report to compare against")
+    database_parser.add_argument("--save_baseline",
+                                 action="store_true",
+                                 help="write the report to --baseline instead of comparing")
+    database_parser.add_argument("--regression_threshold",
+                                 type=float,
+                                 default=1.5,
+                                 help="p50 latency ratio to the baseline reported as a regression")
+    database_parser.set_defaults(run=run_database)
+    args = parser.parse_args(argv)
+    if args.benchmark == "database" and args.save_baseline and args.baseline is None:
+        parser.error("--save_baseline requires --baseline")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmark selected on the command line and print its report
+
+    :param argv: arguments, defaults to sys.argv
+    :return: exit status, 1 if the report has regressions compared to the baseline
+    """
+    args = parse_args(argv)
+    report = args.run(args)
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if args.output is not None:
+        args.output.write_text(report_json + "\n", encoding="utf-8")
+        LOGGER.info("Report written to %s", args.output)
+    if report.get("regressions"):
+        LOGGER.warning("Regressions compared to the baseline: %s", report["regressions"])
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
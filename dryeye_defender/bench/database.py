@@ -0,0 +1,346 @@
+"""Benchmark of the database queries on synthetic histories of increasing length
+
+Each history is a database holding the blinks of a user blinking ~15 times per minute during
+working hours, and a few blink reminder events per hour, up to the time it was generated. As
+in the application, one row is written per processed frame, the frames where a blink starts
+being marked (blink_marker = 1). Raw rows older than the retention period are then deleted,
+the blinks staying counted in the rollup tables, so only the blink rows are generated for the
+days before the retention period.
+
+Every `query_*` method of `BlinkHistoryDryEyeDefender` used by the stats window, and
+`store_event()`, is then timed on each history. The results can be saved as a baseline and
+compared against it to catch regressions.
+"""
+import logging
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+import numpy as np
+from blinkdetector.utils.database import EventTypes
+
+from dryeye_defender.bench.utils import summarise_latencies
+from dryeye_defender.utils.database import (DEFAULT_RETENTION_DAYS, INSERT_BLINK_SQL,
+                                            INSERT_EVENT_SQL, BlinkHistoryDryEyeDefender)
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of each synthetic history and the number of days it covers
+HISTORIES = OrderedDict([
+    ("1_day", 1),
+    ("30_days", 30),
+    ("1_year", 365),
+    ("3_years", 3 * 365),
+])
+BLINKS_PER_MINUTE = 15.0
+# Frame rate sustained by the application, whose inference timer fires every 10 ms, once the
+# inference time of each frame is taken into account
+DEFAULT_FRAMES_PER_SECOND = 30.0
+# Eye aspect ratios of the open eyes and of the eyes closing in a blink
+OPEN_EAR = (0.3, 0.02)
+BLINK_EAR = (0.15, 0.02)
+BLINK_REMINDERS_PER_HOUR = 2.0
+# Local hours during which blinks are generated
+WORKING_HOURS = (9, 17)
+DEFAULT_REPEATS = 20
+DEFAULT_SEED = 0
+# A p50 latency this many times slower than the baseline is reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.5
+REMINDER_EVENT_TYPES = [EventTypes["SYSTEM_TRAY_NOTIFICATION"],
+                        EventTypes["POPUP_NOTIFICATION"]]
+
+
+class Operation(NamedTuple):
+    """Database call timed by the benchmark"""
+
+    name: str
+    # Called with the database and the unix timestamp of the end of the history
+    run: Callable[[BlinkHistoryDryEyeDefender, float], Any]
+
+
+# The queries of each stats window view, then the queries covering the whole history
+OPERATIONS = [
+    Operation("query_raw_blink_history_no_grouping_5_minutes",
+              lambda db_api, end: db_api.query_raw_blink_history_no_grouping(
+                  end - 5 * 60, as_array=True)),
+    Operation("query_events_5_minutes",
+              lambda db_api, end: db_api.query_events(
+                  end - 5 * 60, REMINDER_EVENT_TYPES, as_array=True)),
+    Operation("query_blink_history_groupby_minute_since_1_hour",
+              lambda db_api, end: db_api.query_blink_history_groupby_minute_since(
+                  end - 60 * 60, as_array=True)),
+    Operation("query_blink_history_groupby_hour_since_1_day",
+              lambda db_api, end: db_api.query_blink_history_groupby_hour_since(
+                  end - 24 * 60 * 60, as_array=True)),
+    Operation("query_blink_history_groupby_day_since_30_days",
+              lambda db_api, end: db_api.query_blink_history_groupby_day_since(
+                  end - 30 * 24 * 60 * 60, as_array=True)),
+    Operation("query_blink_history_groupby_day_since_360_days",
+              lambda db_api, end: db_api.query_blink_history_groupby_day_since(
+                  end - 360 * 24 * 60 * 60, as_array=True)),
+    Operation("query_blink_counts_hour_1_day",
+              lambda db_api, end: db_api.query_blink_counts(
+                  end - 24 * 60 * 60, resolution=60 * 60)),
+    Operation("query_blink_rate_minute_all",
+              lambda db_api, end: db_api.query_blink_rate(0, resolution=60, as_array=True)),
+    Operation("query_blink_rate_day_all",
+              lambda db_api, end: db_api.query_blink_rate(
+                  0, resolution=24 * 60 * 60, as_array=True)),
+    Operation("query_events_all",
+              lambda db_api, end: db_api.query_events(0, REMINDER_EVENT_TYPES, as_array=True)),
+    Operation("store_event",
+              lambda db_api, end: db_api.store_event(
+                  time.time(), EventTypes["SYSTEM_TRAY_NOTIFICATION"])),
+]
+
+
+def _working_periods(days: int, end: float) -> list[tuple[float, float]]:
+    """Get the working hours of the last days up to the last one which started before `end`,
+    in chronological order
+
+    :param days: number of days to cover
+    :param end: unix timestamp after which no period is returned
+    :return: list of (start, end) unix timestamps
+    """
+    end_date = time.localtime(end)
+    last_day = 0 if end_date.tm_hour >= WORKING_HOURS[0] else 1
+    periods = []
+    for day in range(last_day + days - 1, last_day - 1, -1):
+        # mktime normalises the day of the month and picks the DST offset of each day
+        start_s, end_s = (time.mktime((end_date.tm_year, end_date.tm_mon, end_date.tm_mday - day,
+                                       hour, 0, 0, 0, 0, -1))
+                          for hour in WORKING_HOURS)
+        periods.append((start_s, min(end_s, end)))
+    return periods
+
+
+def _frame_rows(rng: np.random.Generator,
+                start_s: float,
+                end_s: float,
+                blink_times: np.ndarray,
+                frames_per_second: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Generate the rows written for the frames processed during a period
+
+    :param rng: the random generator
+    :param start_s: unix timestamp of the first frame
+    :param end_s: unix timestamp after which no frame is generated
+    :param blink_times: unix timestamps of the blinks of the period, each marks the frame
+      nearest to it, blinks falling on the same frame are merged
+    :param frames_per_second: rate of the frames
+    :return: the frame timestamps, whether each frame is a blink, and the left and right eye
+      aspect ratios of each frame
+    """
+    frame_times = np.arange(start_s, end_s, 1 / frames_per_second)
+    markers = np.zeros(len(frame_times), dtype=bool)
+    if len(frame_times):
+        blink_frames = np.rint((blink_times - start_s) * frames_per_second).astype(np.int64)
+        markers[np.clip(blink_frames, 0, len(frame_times) - 1)] = True
+    ears = rng.normal(*OPEN_EAR, (len(frame_times), 2))
+    ears[markers] = rng.normal(*BLINK_EAR, (int(markers.sum()), 2))
+    return frame_times, markers, ears
+
+
+def _write_period(db_con: sqlite3.Connection,  # pylint: disable=too-many-arguments
+                  rng: np.random.Generator,
+                  start_s: float,
+                  end_s: float,
+                  frames_since: float,
+                  frames_per_second: float) -> tuple[int, int]:
+    """Generate and write the rows of a working period, in time order as the retention relies
+    on it
+
+    :param db_con: connection to the history
+    :param rng: the random generator
+    :param start_s: unix timestamp of the start of the period
+    :param end_s: unix timestamp of the end of the period
+    :param frames_since: only the blink rows are generated before this unix timestamp
+    :param frames_per_second: rate of the per-frame rows
+    :return: the number of blinks and of per-frame rows written
+    """
+    duration_s = end_s - start_s
+    blink_times = np.sort(rng.uniform(
+        start_s, end_s, rng.poisson(BLINKS_PER_MINUTE * duration_s / 60)))
+    reminder_times = np.sort(rng.uniform(
+        start_s, end_s, rng.poisson(BLINK_REMINDERS_PER_HOUR * duration_s / 3600)))
+    frames_start_s = max(start_s, frames_since)
+    expired = blink_times < frames_start_s
+    expired_ears = rng.normal(*BLINK_EAR, (int(expired.sum()), 2))
+    frame_times, markers, ears = _frame_rows(rng, frames_start_s, end_s, blink_times[~expired],
+                                             frames_per_second)
+    with db_con:
+        db_con.executemany(INSERT_BLINK_SQL, (
+            (blink_time, 1, left_ear, right_ear, 1)
+            for blink_time, (left_ear, right_ear) in zip(blink_times[expired].tolist(),
+                                                         expired_ears.tolist())))
+        db_con.executemany(INSERT_BLINK_SQL, (
+            (frame_time, 1 if marker else -1, left_ear, right_ear, int(marker))
+            for frame_time, marker, (left_ear, right_ear) in zip(
+                frame_times.tolist(), markers.tolist(), ears.tolist())))
+        db_con.executemany(INSERT_EVENT_SQL, (
+            (float(reminder_time), REMINDER_EVENT_TYPES[0].value, None, None)
+            for reminder_time in reminder_times))
+    return int(expired.sum()) + int(markers.sum()), len(frame_times)
+
+
+def generate_history(db_path: Path,
+                     days: int,
+                     seed: int = DEFAULT_SEED,
+                     retention_days: Optional[float] = DEFAULT_RETENTION_DAYS,
+                     frames_per_second: float = DEFAULT_FRAMES_PER_SECOND) -> None:
+    """Create a database holding a synthetic history ending with the last working hours
+
+    :param db_path: where to create the database, which must not exist
+    :param days: number of days covered by the history
+    :param seed: seed of the random generator
+    :param retention_days: raw rows older than this are deleted once generated, None to keep
+      them all
+    :param frames_per_second: rate of the per-frame rows generated within the retention period
+    """
+    rng = np.random.default_rng(seed)
+    end = time.time()
+    # Frames before this would be deleted right away, only their blinks are generated
+    frames_since = end - retention_days * 24 * 60 * 60 if retention_days is not None else 0.0
+    # Create the tables, rollups and triggers
+    BlinkHistoryDryEyeDefender(db_path, retention_days=None).close()
+    with closing(sqlite3.connect(db_path)) as db_con:
+        written = [_write_period(db_con, rng, start_s, end_s, frames_since, frames_per_second)
+                   for start_s, end_s in _working_periods(days, end)]
+    blink_count, frame_count = (sum(counts) for counts in zip(*written))
+    LOGGER.info("Generated %s blinks and %s frames over %s days in %s", blink_count,
+                frame_count, days, db_path)
+    if retention_days is not None:
+        db_api = BlinkHistoryDryEyeDefender(db_path, retention_days=retention_days)
+        try:
+            db_api.run_maintenance()
+        finally:
+            db_api.close()
+
+
+def _history_end(db_path: Path) -> float:
+    """Get the timestamp of the last frame of a history
+
+    :param db_path: the database of the history
+    :return: unix timestamp
+    """
+    with closing(sqlite3.connect(db_path)) as db_con:
+        end = db_con.execute("SELECT MAX(blink_time) FROM blink_history").fetchone()[0]
+    return float(end)
+
+
+def _db_size_mb(db_path: Path) -> float:
+    """Get the size of a database, including the pages not checkpointed yet
+
+    :param db_path: the database
+    :return: size in MiB
+    """
+    wal_path = db_path.with_name(db_path.name + "-wal")
+    size = db_path.stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0)
+    return size / (1024 * 1024)
+
+
+def time_operations(db_path: Path, repeats: int = DEFAULT_REPEATS) -> dict[str, Any]:
+    """Time each operation on a history
+
+    :param db_path: the database of the history
+    :param repeats: number of timed calls of each operation, after an untimed one
+    :return: the latency summary of each operation, by name
+    """
+    end = _history_end(db_path)
+    db_api = BlinkHistoryDryEyeDefender(db_path)
+    results = {}
+    try:
+        for operation in OPERATIONS:
+            operation.run(db_api, end)
+            samples_s = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                operation.run(db_api, end)
+                samples_s.append(time.perf_counter() - start)
+            results[operation.name] = summarise_latencies(samples_s)
+    finally:
+        db_api.close()
+    return results
+
+
+def compare_to_baseline(results: dict[str, Any],
+                        baseline: dict[str, Any],
+                        regression_threshold: float = DEFAULT_REGRESSION_THRESHOLD) \
+        -> tuple[dict[str, Any], list[str]]:
+    """Compare the p50 latencies of the results to the ones of a baseline
+
+    :param results: the "results" of a report
+    :param baseline: the "results" of the baseline report
+    :param regression_threshold: ratio to the baseline above which a latency is a regression
+    :return: the ratio of each latency to its baseline by history and operation, and the
+      "history/operation" names of the regressions. Latencies missing from the baseline are
+      not compared.
+    """
+    comparison: dict[str, Any] = {}
+    regressions = []
+    for history, operations in results.items():
+        for name, summary in operations.items():
+            baseline_summary = baseline.get(history, {}).get(name, {})
+            if not baseline_summary.get("count") or not summary.get("count"):
+                continue
+            ratio = summary["p50_ms"] / max(baseline_summary["p50_ms"], 1e-6)
+            comparison.setdefault(history, {})[name] = {
+                "baseline_p50_ms": baseline_summary["p50_ms"],
+                "p50_ms": summary["p50_ms"],
+                "ratio": ratio,
+            }
+            if ratio > regression_threshold:
+                regressions.append(f"{history}/{name}")
+    return comparison, regressions
+
+
+def run_database_benchmark(  # pylint: disable=too-many-arguments
+        histories: Sequence[str] = tuple(HISTORIES),
+        repeats: int = DEFAULT_REPEATS,
+        data_dir: Optional[Path] = None,
+        seed: int = DEFAULT_SEED,
+        baseline: Optional[dict[str, Any]] = None,
+        regression_threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+        frames_per_second: float = DEFAULT_FRAMES_PER_SECOND) -> dict[str, Any]:
+    """Generate the histories and time the operations on each of them
+
+    :param histories: names of the histories from `HISTORIES` to benchmark
+    :param repeats: number of timed calls of each operation
+    :param data_dir: directory the histories are generated in, and reused from if they already
+      exist there. Defaults to a temporary directory.
+    :param seed: seed of the random generator
+    :param baseline: a previous report to compare against
+    :param regression_threshold: ratio to the baseline above which a latency is a regression
+    :param frames_per_second: rate of the per-frame rows of the histories
+    :return: the report, with the size of each history and the latency summary of each
+      operation by history, and their comparison to the baseline if any
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = data_dir or Path(tmp_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        results = {}
+        db_sizes_mb = {}
+        for history in histories:
+            db_path = data_dir / f"bench_{history}_seed{seed}_fps{frames_per_second:g}.db"
+            if not db_path.exists():
+                start = time.perf_counter()
+                generate_history(db_path, HISTORIES[history], seed,
+                                 frames_per_second=frames_per_second)
+                LOGGER.info("Generated history %s in %.1f s", history,
+                            time.perf_counter() - start)
+            db_sizes_mb[history] = _db_size_mb(db_path)
+            results[history] = time_operations(db_path, repeats)
+    report: dict[str, Any] = {
+        "repeats": repeats,
+        "seed": seed,
+        "frames_per_second": frames_per_second,
+        "db_size_mb": db_sizes_mb,
+        "results": results,
+    }
+    if baseline is not None:
+        report["comparison"], report["regressions"] = compare_to_baseline(
+            results, baseline.get("results", {}), regression_threshold)
+    return report
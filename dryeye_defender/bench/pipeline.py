@@ -0,0 +1,229 @@
+"""Benchmark replaying recorded frames through the detector without the GUI
+
+Frames go through the same path as in the application: `BlinkModelThread` reads them from the
+capture device, runs `FilteredMediaPipeAPI.update()` on them, which queues the blink rows to the
+`BlinkHistoryDryEyeDefender` database. Only the capture device is replaced, by a
+`ReplayCapture` reading a video file or a directory of images.
+"""
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import cv2
+from PySide6.QtCore import Slot
+
+from dryeye_defender.bench.utils import summarise_latencies
+from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
+from dryeye_defender.widgets.components.blink_model_thread import BlinkModelThread
+from dryeye_defender.widgets.components.frame_grabber import FrameGrabber
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png")
+# Frames processed before measuring, so that model initialisation is not measured
+DEFAULT_WARMUP_FRAMES = 10
+# Same as the application, it has no effect on the measured path
+LACK_OF_BLINK_THRESHOLD_MS = 10
+
+
+class ReplayCapture:
+    """Stand-in for `cv2.VideoCapture` replaying a video file or the images of a directory in
+    file name order, returning frames as fast as they are read
+
+    Like a camera, frames are decoded when read, so decoding is counted as capture time.
+    """
+
+    def __init__(self, source: Path, loops: int = 1) -> None:
+        """Open the source
+
+        :param source: a video file, or a directory of images
+        :param loops: number of times the source is replayed before `read()` fails
+        """
+        self.source = source
+        self.loops = loops
+        self._loop = 0
+        self._index = 0
+        self._video: Optional[cv2.VideoCapture] = None  # pylint: disable=no-member
+        self.image_paths: list[Path] = []
+        if source.is_dir():
+            self.image_paths = sorted(path for path in source.iterdir()
+                                      if path.suffix.lower() in IMAGE_EXTENSIONS)
+            if not self.image_paths:
+                raise ValueError(f"No images found in {source}")
+        else:
+            self._video = cv2.VideoCapture(str(source))  # pylint: disable=no-member
+            if not self._video.isOpened():
+                raise ValueError(f"Could not open video {source}")
+
+    def _read_next(self) -> tuple[bool, Any]:
+        """Read the next frame of the current loop
+
+        :return: (success, image), success is False at the end of the source
+        """
+        if self._video is not None:
+            return self._video.read()
+        while self._index < len(self.image_paths):
+            image_path = self.image_paths[self._index]
+            self._index += 1
+            img = cv2.imread(str(image_path))  # pylint: disable=no-member
+            if img is not None:
+                return True, img
+            LOGGER.warning("Skipping unreadable image %s", image_path)
+        return False, None
+
+    def read(self) -> tuple[bool, Any]:
+        """Read the next frame, mirroring `cv2.VideoCapture.read()`
+
+        :return: (success, image), success is False once the source was replayed `loops` times
+        """
+        while self._loop < self.loops:
+            ret, img = self._read_next()
+            if ret:
+                return True, img
+            self._loop += 1
+            self._index = 0
+            if self._video is not None:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)  # pylint: disable=no-member
+        return False, None
+
+    def release(self) -> None:
+        """Close the video file if any"""
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the process so far, including the model loading
+
+    :return: the peak RSS in MiB, None if the platform does not report it
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in KiB on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max_rss / divisor
+
+
+@Slot(int)
+def _ignore_blink_value(output: int) -> None:  # pylint: disable=unused-argument
+    """The benchmark has no label to show the blink value on"""
+
+
+@Slot()
+def _ignore_frame_processed() -> None:
+    """The benchmark processes the frames itself rather than when signalled"""
+
+
+def _timed(func: Callable[..., Any], samples_s: list[float]) -> Callable[..., Any]:
+    """Wrap a function to record the duration of each call
+
+    :param func: the function to time
+    :param samples_s: list the durations in seconds are appended to
+    :return: the wrapped function
+    """
+    def timed_func(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples_s.append(time.perf_counter() - start)
+    return timed_func
+
+
+def run_pipeline_benchmark(  # pylint: disable=too-many-arguments,too-many-locals
+        source: Path,
+        loops: int = 1,
+        max_frames: Optional[int] = None,
+        warmup_frames: int = DEFAULT_WARMUP_FRAMES,
+        pipelined: bool = False,
+        roi_tracking: bool = False,
+        db_path: Optional[Path] = None) -> dict[str, Any]:
+    """Replay a source through the detector and measure it
+
+    :param source: a video file, or a directory of images
+    :param loops: number of times the source is replayed
+    :param max_frames: stop after measuring this many frames, None to replay the whole source
+    :param warmup_frames: frames processed before measuring
+    :param pipelined: read frames on a capture thread, see `FrameGrabber`
+    :param roi_tracking: run inference on a crop around the face, see `FaceRoiTracker`
+    :param db_path: database the blinks are written to, defaults to a temporary database
+    :return: the report: number of frames measured, sustained FPS, CPU time, peak RSS and
+      the latency of each stage of the frames
+    :raises ValueError: if the source has no frames left to measure after the warm-up
+    """
+    frame_stats: list[dict[str, Any]] = []
+    store_samples_s: list[float] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_api = BlinkHistoryDryEyeDefender(db_path or Path(tmp_dir) / "bench.db")
+        db_api.store_blink = _timed(  # type: ignore[method-assign]
+            db_api.store_blink, store_samples_s)
+        thread = BlinkModelThread(db_api, _ignore_blink_value, _ignore_frame_processed,
+                                  LACK_OF_BLINK_THRESHOLD_MS, roi_tracking=roi_tracking)
+        thread.update_frame_stats.connect(frame_stats.append)
+        capture = ReplayCapture(source, loops)
+        thread.cap = capture  # type: ignore[assignment]
+        if pipelined:
+            thread.frame_grabber = FrameGrabber(capture)  # type: ignore[arg-type]
+            thread.frame_grabber.start()
+        try:
+            for _ in range(warmup_frames):
+                try:
+                    thread._process_frame()  # pylint: disable=protected-access
+                except IOError:
+                    break
+            frame_stats.clear()
+            store_samples_s.clear()
+            frame_count = 0
+            wall_start = wall_end = time.perf_counter()
+            cpu_start = cpu_end = time.process_time()
+            while max_frames is None or frame_count < max_frames:
+                try:
+                    thread._process_frame()  # pylint: disable=protected-access
+                except IOError:
+                    # End of the source, the time waited for it is not measured
+                    break
+                frame_count += 1
+                wall_end = time.perf_counter()
+                cpu_end = time.process_time()
+            if not frame_count:
+                raise ValueError(f"No frames of {source} were left to measure after "
+                                 f"{warmup_frames} warm-up frames, replay it more times with "
+                                 f"--loops or lower --warmup_frames")
+            flush_start = time.perf_counter()
+            db_api.flush()
+            flush_s = time.perf_counter() - flush_start
+        finally:
+            thread.release_cap()
+            db_api.close()
+    wall_s = wall_end - wall_start
+    cpu_s = cpu_end - cpu_start
+    LOGGER.info("Measured %s frames in %.3f s", frame_count, wall_s)
+    return {
+        "source": str(source),
+        "pipelined": pipelined,
+        "roi_tracking": roi_tracking,
+        "frames": frame_count,
+        "wall_s": wall_s,
+        "fps": frame_count / wall_s if wall_s > 0 else None,
+        "cpu_s": cpu_s,
+        # Above 1 when several threads are busy at the same time
+        "cpu_per_wall_s": cpu_s / wall_s if wall_s > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "latency": {
+            "grab": summarise_latencies([stats["grab_s"] for stats in frame_stats]),
+            "inference": summarise_latencies([stats["inference_s"] for stats in frame_stats]),
+            "store_blink": summarise_latencies(store_samples_s),
+            "total": summarise_latencies([stats["total_s"] for stats in frame_stats]),
+        },
+        "final_flush_ms": flush_s * 1000,
+    }
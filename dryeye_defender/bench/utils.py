@@ -0,0 +1,23 @@
+"""Helpers shared by the benchmarks"""
+from typing import Sequence
+
+import numpy as np
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def summarise_latencies(samples_s: Sequence[float]) -> dict[str, float]:
+    """Summarise latency samples
+
+    :param samples_s: durations in seconds
+    :return: the number of samples, and the mean, percentiles and maximum in milliseconds
+    """
+    if not samples_s:
+        return {"count": 0}
+    samples_ms = np.asarray(samples_s) * 1000
+    summary = {"count": len(samples_ms), "mean_ms": float(samples_ms.mean())}
+    for percentile, value in zip(LATENCY_PERCENTILES,
+                                 np.percentile(samples_ms, LATENCY_PERCENTILES)):
+        summary[f"p{percentile}_ms"] = float(value)
+    summary["max_ms"] = float(samples_ms.max())
+    return summary
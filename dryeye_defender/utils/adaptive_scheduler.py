@@ -0,0 +1,106 @@
+"""Scheduler choosing how often to run inference from the blink state and a CPU budget"""
+import logging
+import math
+from typing import Any, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+MIN_INTERVAL_MS = 10
+MAX_INTERVAL_MS = 200
+DEFAULT_CPU_BUDGET_PERCENT = 25.0
+# Start sampling at the fastest rate this many seconds before a lack of blink alert is due
+ALERT_LEAD_TIME_S = 2.0
+# Multiplier applied to the interval on each frame where the eyes are steadily open
+BACKOFF_FACTOR = 1.2
+# Smoothing factor of the exponential moving averages of frame cost and EAR
+EMA_ALPHA = 0.1
+# A blink looks likely when the EAR drops this many standard deviations below its baseline
+BLINK_LIKELY_STD = 2.0
+# Floor on the EAR standard deviation so that a very stable signal does not trigger on noise
+MIN_EAR_STD = 0.02
+
+
+class AdaptiveInferenceScheduler:
+    """Pick the interval between inference frames: sample fast when a blink looks likely or a
+    lack of blink alert is close, back off when the face is absent or the eyes are steadily open,
+    and never use more than `cpu_budget_percent` of a core.
+    """
+
+    def __init__(self,
+                 min_interval_ms: int = MIN_INTERVAL_MS,
+                 max_interval_ms: int = MAX_INTERVAL_MS,
+                 cpu_budget_percent: float = DEFAULT_CPU_BUDGET_PERCENT) -> None:
+        """Initialise the scheduler at the fastest interval
+
+        :param min_interval_ms: fastest interval between frames
+        :param max_interval_ms: slowest interval between frames when backing off, the CPU budget
+          may still push the interval above this
+        :param cpu_budget_percent: maximum percentage of one core spent processing frames
+        """
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.cpu_budget_percent = cpu_budget_percent
+        self.interval_ms = min_interval_ms
+        self._frame_cost_s: Optional[float] = None
+        self._ear_mean: Optional[float] = None
+        self._ear_var = 0.0
+
+    def _update_frame_cost(self, frame_cost_s: float) -> float:
+        """Update and return the moving average of the time taken to process one frame"""
+        if self._frame_cost_s is None:
+            self._frame_cost_s = frame_cost_s
+        else:
+            self._frame_cost_s += EMA_ALPHA * (frame_cost_s - self._frame_cost_s)
+        return self._frame_cost_s
+
+    def _is_blink_likely(self, ear: float) -> bool:
+        """Update the EAR baseline and return whether the EAR has dropped far enough below it
+        to suggest the eyes are closing
+
+        :param ear: mean EAR of both eyes for the current frame
+        """
+        if self._ear_mean is None:
+            self._ear_mean = ear
+            return False
+        ear_std = max(math.sqrt(self._ear_var), MIN_EAR_STD)
+        blink_likely = ear < self._ear_mean - BLINK_LIKELY_STD * ear_std
+        deviation = ear - self._ear_mean
+        self._ear_mean += EMA_ALPHA * deviation
+        self._ear_var = (1 - EMA_ALPHA) * (self._ear_var + EMA_ALPHA * deviation ** 2)
+        return blink_likely
+
+    def budget_interval_ms(self) -> float:
+        """Smallest interval which keeps the CPU usage within the budget"""
+        if self._frame_cost_s is None or self.cpu_budget_percent <= 0:
+            return self.min_interval_ms
+        return 1000 * self._frame_cost_s / (self.cpu_budget_percent / 100)
+
+    def update(self,
+               frame_stats: dict[str, Any],
+               seconds_since_last_blink: float,
+               lack_of_blink_threshold_s: float) -> int:
+        """Update the scheduler with the latest processed frame and return the interval to use
+        before the next one
+
+        :param frame_stats: the dict emitted by `BlinkModelThread.update_frame_stats`
+        :param seconds_since_last_blink: seconds since the last blink was detected
+        :param lack_of_blink_threshold_s: seconds without blinks before an alert is raised
+        :return: interval in milliseconds until the next frame should be processed
+        """
+        self._update_frame_cost(frame_stats["total_s"])
+        left_ear, right_ear = frame_stats["left_ear"], frame_stats["right_ear"]
+        face_present = (left_ear is not None and right_ear is not None
+                        and not math.isnan(left_ear) and not math.isnan(right_ear))
+        if not face_present:
+            target_ms = float(self.max_interval_ms)
+        elif (frame_stats["blink_value"] == 1
+              or self._is_blink_likely((left_ear + right_ear) / 2)
+              or seconds_since_last_blink >= lack_of_blink_threshold_s - ALERT_LEAD_TIME_S):
+            target_ms = float(self.min_interval_ms)
+        else:
+            # Eyes are steadily open, gradually back off
+            target_ms = min(self.interval_ms * BACKOFF_FACTOR, self.max_interval_ms)
+        interval_ms = max(target_ms, self.min_interval_ms, self.budget_interval_ms())
+        self.interval_ms = int(math.ceil(interval_ms))
+        LOGGER.debug("adaptive inference interval: %s ms", self.interval_ms)
+        return self.interval_ms
@@ -5,37 +5,450 @@ but this is the only class that should be used for the dryeye defender software.
 """
 import logging
 import sqlite3
-from datetime import datetime, timezone
+import threading
+import time
+from contextlib import closing
 from pathlib import Path
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Callable, NamedTuple, Union, Literal, overload
 
+import numpy as np
 from blinkdetector.utils.database import EventTypes, BlinkHistory
 
+from dryeye_defender.utils.database_writer import MAINTENANCE_STARTUP_DELAY_S, DatabaseWriter
+from dryeye_defender.utils.migrations import (AUTO_VACUUM_INCREMENTAL, has_pending_backfills,
+                                              migrate, run_backfills)
+
 LOGGER = logging.getLogger(__name__)
 
+# Queued writes are flushed once this many rows are pending or the oldest is this old
+DEFAULT_FLUSH_MAX_ROWS = 500
+DEFAULT_FLUSH_INTERVAL_MS = 2000
+# Raw blink_history rows older than this are deleted, the rollup tables are kept forever
+DEFAULT_RETENTION_DAYS = 30.0
+# Seconds between two maintenance runs once the expired rows have been deleted
+DEFAULT_MAINTENANCE_INTERVAL_S = 60 * 60
+# Maximum number of rows deleted, or pages freed, by one maintenance step
+MAINTENANCE_BATCH_ROWS = 10000
+INCREMENTAL_VACUUM_PAGES = 1000
+
+
+class ConnectionProfile(NamedTuple):
+    """SQLite settings applied to every connection to the blink database, see
+    https://www.sqlite.org/pragma.html
+    """
+
+    # WAL lets the readers (stats window) and the writer (detector) work concurrently
+    journal_mode: str = "WAL"
+    # In WAL mode, NORMAL only syncs at checkpoints instead of on every commit
+    synchronous: str = "NORMAL"
+    mmap_size: int = 64 * 1024 * 1024
+    # Negative values are in KiB rather than pages
+    cache_size: int = -16 * 1024
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+
+
+DEFAULT_CONNECTION_PROFILE = ConnectionProfile()
+
+
+def apply_connection_profile(db_con: sqlite3.Connection,
+                             profile: ConnectionProfile,
+                             read_only: bool = False) -> None:
+    """Apply the settings of a connection profile to a connection
+
+    :param db_con: connection to configure
+    :param profile: settings to apply
+    :param read_only: whether the connection is read-only, in which case the journal mode, which
+      is stored in the database file, is left to the writing connections
+    """
+    if not read_only:
+        journal_mode = db_con.execute(f"PRAGMA journal_mode = {profile.journal_mode}").fetchone()
+        LOGGER.debug("Database journal mode: %s", journal_mode[0])
+    db_con.execute(f"PRAGMA synchronous = {profile.synchronous}")
+    db_con.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}")
+    db_con.execute(f"PRAGMA cache_size = {int(profile.cache_size)}")
+    db_con.execute(f"PRAGMA temp_store = {profile.temp_store}")
+    db_con.execute(f"PRAGMA busy_timeout = {int(profile.busy_timeout_ms)}")
+
+
+class RollupTier(NamedTuple):
+    """A table of blink counts aggregated over fixed width bins, see migrations.py"""
+
+    table: str
+    # Column holding the bin number, i.e. the unix timestamp divided by the bin width
+    key: str
+    seconds: int
+    # SQL expression giving the number of minutes with blinks in a bin
+    active_minutes: str
+
+
+# From the coarsest to the finest, below the finest tier the raw blink_history table is read
+ROLLUP_TIERS = [
+    RollupTier("blink_day_rollup", "day", 24 * 60 * 60, "active_minutes"),
+    RollupTier("blink_hour_rollup", "hour", 60 * 60, "active_minutes"),
+    RollupTier("blink_minute_rollup", "minute", 60, "1"),
+]
+# Resolution requesting the raw blinks rather than a rate
+RAW_RESOLUTION_S = 0
+
+# Query results as lists, and as arrays when queried with `as_array=True`
+BlinkSeries = dict[str, List[float | int]]
+BlinkArrays = dict[str, np.ndarray]
+
+
+@overload
+def fetch_series(cursor: sqlite3.Cursor, as_array: Literal[False] = False,
+                 value_dtype: Any = np.float64) -> BlinkSeries:
+    ...
+
+
+@overload
+def fetch_series(cursor: sqlite3.Cursor, as_array: Literal[True],
+                 value_dtype: Any = np.float64) -> BlinkArrays:
+    ...
+
+
+@overload
+def fetch_series(cursor: sqlite3.Cursor, as_array: bool,
+                 value_dtype: Any = np.float64) -> Union[BlinkSeries, BlinkArrays]:
+    ...
+
+
+def fetch_series(cursor: sqlite3.Cursor, as_array: bool = False,
+                 value_dtype: Any = np.float64) -> Union[BlinkSeries, BlinkArrays]:
+    """Read the (timestamp, value) rows of a query into a dict of "timestamps" and "values"
+
+    :param cursor: cursor of the executed query
+    :param as_array: fill NumPy arrays straight from the cursor rather than building lists
+    :param value_dtype: dtype of the values array, the timestamps are always float64
+    :return: dict of "timestamps" and "values"
+    """
+    if as_array:
+        records = np.fromiter(cursor,
+                              dtype=[("timestamps", np.float64), ("values", value_dtype)])
+        return {"timestamps": np.ascontiguousarray(records["timestamps"]),
+                "values": np.ascontiguousarray(records["values"])}
+    rows = cursor.fetchall()
+    return {"timestamps": [i[0] for i in rows], "values": [i[1] for i in rows]}
+
 
-class BlinkHistoryDryEyeDefender(BlinkHistory):
-    """Database class to interact with SQLite3 database"""
+def local_utc_offset_s(timestamp: Optional[float] = None) -> int:
+    """Get the offset of the local timezone from UTC
 
-    def __init__(self,
+    :param timestamp: unix timestamp at which to get the offset, now if None
+    :return: offset in seconds, e.g. 3600 for UTC+1
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return int(time.localtime(timestamp).tm_gmtoff)
+
+
+INSERT_BLINK_SQL = """INSERT INTO blink_history(blink_time, blink_value, left_ear, right_ear,
+ blink_marker) VALUES(?,?,?,?,?)"""
+INSERT_EVENT_SQL = """INSERT INTO events(timestamp, event_type_id,
+ event_numerical_metadata, event_textual_metadata) VALUES(?,?,?,?)"""
+
+
+class BlinkHistoryDryEyeDefender(BlinkHistory):  # pylint: disable=too-many-instance-attributes
+    """Database class to interact with SQLite3 database
+
+    Blinks and events are not committed one by one: they are queued and written in a single
+    transaction once `flush_max_rows` rows are queued or the oldest queued row is older than
+    `flush_interval_ms`, or when `flush()` is called.
+
+    When created from a `db_path`, a `DatabaseWriter` thread owns the only connection writing
+    to the database, and each thread running queries gets its own read-only connection, so that
+    long queries from the GUI never stall the inference thread. Queries read the committed rows
+    without waiting for the writer, so the rows stored in the last `flush_interval_ms` may be
+    missing, call `flush()` first for a consistent read. When created from a `db_con`, e.g. an
+    in-memory database for tests, that single connection is used for everything, queued rows
+    are written by whichever thread triggers the flush and queries flush first so that they see
+    every row stored so far. Call `close()` before exiting to commit the queued rows and close
+    the connections.
+
+    Raw blink_history rows older than `retention_days` are deleted in batches by the writer
+    thread when it is idle, the blinks they held remain counted in the rollup tables. The freed
+    pages are then returned to the file system with an incremental vacuum. When a migration adds
+    rollups to a database already holding blinks, the writer thread catches them up first, so
+    opening the database does not wait for it. Without a writer thread it is done on opening.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
                  db_path: Optional[Path] = None,
-                 db_con: Optional[sqlite3.Connection] = None) -> None:
+                 db_con: Optional[sqlite3.Connection] = None,
+                 flush_max_rows: int = DEFAULT_FLUSH_MAX_ROWS,
+                 flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+                 connection_profile: ConnectionProfile = DEFAULT_CONNECTION_PROFILE,
+                 retention_days: Optional[float] = DEFAULT_RETENTION_DAYS) -> None:
         """Create the SQLite3 Database and table if not exist
 
         :param db_path: if db_con not provided, provide a path to where to store the database
         :param db_con: Optionally, a direct connection object to a database can be provided
         instead of the path to the database itself, useful for testing.
+        :param flush_max_rows: number of queued rows which triggers a flush
+        :param flush_interval_ms: age of the oldest queued row which triggers a flush
+        :param connection_profile: SQLite settings applied to every connection
+        :param retention_days: age in days after which raw blink rows are deleted, None to keep
+          them forever
         """
+        self.retention_days = retention_days
+        self.flush_max_rows = flush_max_rows
+        self.flush_interval_ms = flush_interval_ms
+        self.connection_profile = connection_profile
+        # Maps an INSERT statement to the rows queued for it
+        self._pending_writes: dict[str, list[tuple[Any, ...]]] = {}
+        self._pending_row_count = 0
+        self._oldest_pending_write_time: Optional[float] = None
+        self._queue_lock = threading.Lock()
+        # Serialises flushes, which may come from both the GUI and the inference thread
+        self._flush_lock = threading.Lock()
+        # Called with the timestamp of each blink stored with blink_marker = 1
+        self._blink_listeners: list[Callable[[float], None]] = []
         super().__init__(db_path, db_con)
+        apply_connection_profile(self.db_con, connection_profile)
+        # Before the writer thread starts, so that nothing else uses the database yet
+        self.schema_version = migrate(self.db_con)
+        self._db_path = db_path if db_con is None else None
+        # A connection given by the caller is left open by `close()`
+        self._owns_db_con = db_con is None
+        self._reader_local = threading.local()
+        self._reader_cons: list[sqlite3.Connection] = []
+        self._writer: Optional[DatabaseWriter] = None
+        if self._db_path is not None:
+            # The backfill of the migrations is a maintenance step, run it straight away
+            maintenance_delay_s = (0.0 if has_pending_backfills(self.db_con)
+                                   else MAINTENANCE_STARTUP_DELAY_S)
+            self._writer = DatabaseWriter(
+                self._create_writer_connection, flush_max_rows, flush_interval_ms,
+                self._run_maintenance_step, DEFAULT_MAINTENANCE_INTERVAL_S, maintenance_delay_s)
+            self._writer.start()
+        else:
+            run_backfills(self.db_con)
+
+    def _create_writer_connection(self) -> sqlite3.Connection:
+        """Create the connection used by the writer thread"""
+        db_con = sqlite3.connect(self._db_path)  # type: ignore[arg-type]
+        apply_connection_profile(db_con, self.connection_profile)
+        return db_con
+
+    def _run_maintenance_step(self, db_con: sqlite3.Connection) -> bool:
+        """Run the pending backfills of the migrations, or delete a batch of expired raw blink
+        rows, or once none are left, reclaim the space they used
+
+        :param db_con: the write connection
+        :return: whether more work remains
+        """
+        if has_pending_backfills(db_con):
+            # Raw rows are only deleted once they are counted in the rollups
+            run_backfills(db_con)
+            return True
+        if self.retention_days is not None:
+            cutoff = time.time() - self.retention_days * 24 * 60 * 60
+            # Rows are inserted in time order, so only the oldest rows need to be looked at
+            # rather than scanning the whole table, which has no index on blink_time alone
+            with db_con:
+                deleted = db_con.execute(
+                    """
+                    DELETE FROM blink_history WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, blink_time FROM blink_history
+                            ORDER BY rowid ASC LIMIT ?)
+                        WHERE blink_time < ?);
+                    """, (MAINTENANCE_BATCH_ROWS, cutoff)).rowcount
+            if deleted:
+                LOGGER.info("Deleted %s blink rows older than %s days", deleted,
+                            self.retention_days)
+            if deleted == MAINTENANCE_BATCH_ROWS:
+                return True
+        if db_con.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            # Set by the migrations, but only takes effect after a full VACUUM, which is needed
+            # once per database. It rewrites the whole file, so it is done here when idle rather
+            # than when the database is opened.
+            LOGGER.info("Enabling incremental auto vacuum of the database")
+            db_con.executescript(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}; VACUUM;")
+            return False
+        free_pages = db_con.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages:
+            # Each step of the statement frees one page, execute() would only run the first
+            db_con.executescript(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES});")
+            LOGGER.debug("Incremental vacuum of %s free pages",
+                         min(free_pages, INCREMENTAL_VACUUM_PAGES))
+        return bool(free_pages > INCREMENTAL_VACUUM_PAGES)
+
+    def run_maintenance(self) -> None:
+        """Apply the retention policy and reclaim the free space immediately, on the calling
+        thread. The writer thread already does this periodically when it is idle.
+        """
+        self.flush()
+        if self._writer is not None:
+            with closing(self._create_writer_connection()) as db_con:
+                while self._run_maintenance_step(db_con):
+                    pass
+            return
+        with self._flush_lock:
+            while self._run_maintenance_step(self.db_con):
+                pass
+
+    def _read_con(self) -> sqlite3.Connection:
+        """Get the calling thread's read-only connection, creating it on first use
+
+        :return: the read-only connection, or the single shared connection if created from
+          `db_con`
+        """
+        if self._db_path is None:
+            assert isinstance(self.db_con, sqlite3.Connection)
+            return self.db_con
+        read_con: Optional[sqlite3.Connection] = getattr(self._reader_local, "db_con", None)
+        if read_con is None:
+            read_con = sqlite3.connect(f"{self._db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                       check_same_thread=False)
+            apply_connection_profile(read_con, self.connection_profile, read_only=True)
+            self._reader_local.db_con = read_con
+            with self._queue_lock:
+                self._reader_cons.append(read_con)
+        return read_con
+
+    def close(self) -> None:
+        """Commit every queued row, stop the writer thread and close the connections. When
+        created from a `db_con`, it is left open and rows stored afterwards are written through
+        it, otherwise the database can no longer be used.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+        with self._queue_lock:
+            for read_con in self._reader_cons:
+                read_con.close()
+            self._reader_cons.clear()
+        self._reader_local = threading.local()
+        self._db_path = None
+        if self._owns_db_con:
+            self.db_con.close()
+
+    def _queue_write(self, sql: str, row: tuple[Any, ...]) -> None:
+        """Queue a row to be inserted on the next flush, flushing if it is due
+
+        :param sql: INSERT statement with placeholders for the row
+        :param row: values to insert
+        """
+        writer = self._writer
+        if writer is not None:
+            writer.write(sql, row)
+            return
+        with self._queue_lock:
+            self._pending_writes.setdefault(sql, []).append(row)
+            self._pending_row_count += 1
+            if self._oldest_pending_write_time is None:
+                self._oldest_pending_write_time = time.monotonic()
+            flush_due = (
+                self._pending_row_count >= self.flush_max_rows
+                or time.monotonic() - self._oldest_pending_write_time
+                >= self.flush_interval_ms / 1000
+            )
+        if flush_due:
+            self.flush()
+
+    def _flush_before_read(self) -> None:
+        """Write the queued rows before a query if they are written through the shared
+        connection. With a writer thread, queries do not wait for it to commit, as it may be in
+        the middle of a batch or of a maintenance step.
+        """
+        if self._writer is None:
+            self.flush()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Write all queued rows to the database in a single transaction, waiting for the writer
+        thread to commit them if there is one
+
+        :param timeout: maximum number of seconds to wait for the writer thread, which may be
+          busy with a maintenance step, None waits indefinitely
+        """
+        writer = self._writer
+        if writer is not None:
+            writer.flush(timeout)
+            return
+        with self._flush_lock:
+            with self._queue_lock:
+                pending_writes = self._pending_writes
+                row_count = self._pending_row_count
+                self._pending_writes = {}
+                self._pending_row_count = 0
+                self._oldest_pending_write_time = None
+            if not pending_writes:
+                return
+            with self.db_con:
+                for sql, rows in pending_writes.items():
+                    self.db_con.executemany(sql, rows)
+        LOGGER.debug("Flushed %s rows to the database", row_count)
+
+    def store_blink(self,  # pylint: disable=too-many-arguments
+                    blink_time: float,
+                    blink_value: int,
+                    left_ear: float,
+                    right_ear: float,
+                    blink_marker: int) -> None:
+        """Queue one frame's blink data to be stored in the blink_history table, overrides
+        BlinkHistory.store_blink() which commits every row
+
+        :param blink_time: unix timestamp of the frame
+        :param blink_value: 1 if the eyes are closed in this frame, -1 otherwise
+        :param left_ear: EAR of the left eye
+        :param right_ear: EAR of the right eye
+        :param blink_marker: 1 if a blink was detected at this frame, 0 otherwise
+        """
+        self._queue_write(INSERT_BLINK_SQL,
+                          (blink_time, blink_value, left_ear, right_ear, blink_marker))
+        if blink_marker == 1:
+            for listener in self._blink_listeners:
+                listener(blink_time)
+
+    def add_blink_listener(self, listener: Callable[[float], None]) -> None:
+        """Call a function for each blink stored with blink_marker = 1, i.e. each blink counted
+        in the rollup tables, so that live views count the same blinks as the stats queries
+
+        :param listener: called with the timestamp of the blink, on the thread storing it
+        """
+        self._blink_listeners.append(listener)
+
+    def write_blink_history(self,  # pylint: disable=too-many-arguments
+                            blink_time: float,
+                            blink_value: int,
+                            left_ear: float,
+                            right_ear: float,
+                            blink_marker: int) -> None:
+        """Queue one frame's blink data, see `store_blink()`. Overrides
+        BlinkHistory.write_blink_history(), which commits every row on the shared connection, so
+        that the frames stored by the submodule's FilteredMediaPipeAPI are queued whichever of the
+        two methods it calls.
+
+        :param blink_time: unix timestamp of the frame
+        :param blink_value: 1 if the eyes are closed in this frame, -1 otherwise
+        :param left_ear: EAR of the left eye
+        :param right_ear: EAR of the right eye
+        :param blink_marker: 1 if a blink was detected at this frame, 0 otherwise
+        """
+        self.store_blink(blink_time, blink_value, left_ear, right_ear, blink_marker)
 
     def _display_all_rows(self) -> Any:
         """A debugging function to display all rows of DB up to max of 100"""
-        with self.db_con:
-            result = self.db_con.execute("SELECT * FROM blink_history LIMIT 100").fetchall()
+        self.flush()
+        with self._read_con() as db_con:
+            result = db_con.execute("SELECT * FROM blink_history LIMIT 100").fetchall()
         return result
 
-    def query_raw_blink_history_no_grouping(self, since: float) \
-            -> dict[str, List[float | int]]:
+    @overload
+    def query_raw_blink_history_no_grouping(self, since: float,
+                                            as_array: Literal[False] = False) -> BlinkSeries:
+        ...
+
+    @overload
+    def query_raw_blink_history_no_grouping(self, since: float,
+                                            as_array: Literal[True]) -> BlinkArrays:
+        ...
+
+    def query_raw_blink_history_no_grouping(self, since: float, as_array: bool = False) \
+            -> Union[BlinkSeries, BlinkArrays]:
         """Fetch the last blink history (blink_marker) from since provided timestamp,
         with returning the value 1 to represent a blink occurs
 
@@ -43,128 +456,287 @@ class BlinkHistoryDryEyeDefender(BlinkHistory):
         :return: list of tuples, each is an utc datetime string e.g.
          [('2023-01-01 12:59:00', 1), ('2023-01-01 13:00:14', 1),] where 1 is always the value
          for each blink that occurred at that timestamp.
+        :param as_array: return float64 and int32 arrays instead of lists
         """
-        with self.db_con:
-            cursor = self.db_con.execute(
-                """
+        return self.query_blink_rate(since, resolution=RAW_RESOLUTION_S, as_array=as_array)
+
+    @staticmethod
+    def _rollup_query(since: float,  # pylint: disable=too-many-arguments
+                      until: Optional[float],
+                      resolution: int,
+                      tz_offset_s: Optional[int],
+                      values: str) -> tuple[str, list[float | int]]:
+        """Build the query aggregating the coarsest rollup tier suitable for the resolution and
+        timezone offset into bins, see `query_blink_rate()`
+
+        :param since: Only consider timestamps after this, a unix timestamp
+        :param until: Only consider timestamps before this, a unix timestamp, None for no limit
+        :param resolution: width of each bin in seconds, a multiple of 60
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, None for local
+        :param values: SQL expression of the values selected for each bin after its start, in
+         which "{active_minutes}" is replaced by the tier's active minutes expression
+        :return: the query and its parameters
+        :raises ValueError: if the resolution is not a whole number of minutes
+        """
+        if resolution < ROLLUP_TIERS[-1].seconds or resolution % ROLLUP_TIERS[-1].seconds:
+            raise ValueError(f"Unsupported resolution of {resolution} seconds, rates are "
+                             f"aggregated over a whole number of minutes")
+        if tz_offset_s is None:
+            tz_offset_s = local_utc_offset_s()
+        tz_offset_s = round(tz_offset_s / 60) * 60
+        tier = next(tier for tier in ROLLUP_TIERS
+                    if resolution % tier.seconds == 0 and tz_offset_s % tier.seconds == 0)
+        # Integer division of the local time of each tier bin gives the local bin number
+        bucket = f"({tier.key} * {tier.seconds} + {tz_offset_s}) / {resolution}"
+        query = f"""
+            SELECT ({bucket}) * {float(resolution)} - {tz_offset_s} AS bucket_start,
+                   {values.format(active_minutes=tier.active_minutes)}
+            FROM {tier.table}
+            WHERE {tier.key} >= ?
+            """
+        params: list[float | int] = [int(since // tier.seconds)]
+        if until is not None:
+            query += f" AND {tier.key} <= ?"
+            params.append(int(until // tier.seconds))
+        query += f" GROUP BY {bucket} ORDER BY bucket_start ASC;"
+        return query, params
+
+    @overload
+    def query_blink_rate(self,  # pylint: disable=too-many-arguments
+                         since: float,
+                         until: Optional[float] = None,
+                         resolution: int = 60,
+                         as_array: Literal[False] = False,
+                         tz_offset_s: Optional[int] = None) -> BlinkSeries:
+        ...
+
+    @overload
+    def query_blink_rate(self,  # pylint: disable=too-many-arguments
+                         since: float,
+                         until: Optional[float] = None,
+                         resolution: int = 60,
+                         *,
+                         as_array: Literal[True],
+                         tz_offset_s: Optional[int] = None) -> BlinkArrays:
+        ...
+
+    @overload
+    def query_blink_rate(self,  # pylint: disable=too-many-arguments
+                         since: float,
+                         until: Optional[float] = None,
+                         resolution: int = 60,
+                         as_array: bool = False,
+                         tz_offset_s: Optional[int] = None) -> Union[BlinkSeries, BlinkArrays]:
+        ...
+
+    def query_blink_rate(self,  # pylint: disable=too-many-arguments
+                         since: float,
+                         until: Optional[float] = None,
+                         resolution: int = 60,
+                         as_array: bool = False,
+                         tz_offset_s: Optional[int] = None) -> Union[BlinkSeries, BlinkArrays]:
+        """Fetch the blink rate between two timestamps in bins of `resolution` seconds, read from
+        the coarsest tier (raw, minute, hour or day) whose bins divide the resolution, so the
+        number of rows read depends on the number of bins rather than on the history length.
+        Bins are aligned to the local timezone, e.g. daily bins start at local midnight. `since`
+        and `until` are applied at the granularity of the tier read, so the whole minute, hour or
+        day containing them is counted, and the first and last bins may only be partly counted.
+
+        :param since: Only consider timestamps after this, a unix timestamp
+        :param until: Only consider timestamps before this, a unix timestamp, None for no limit
+        :param resolution: width of each bin in seconds, a multiple of 60. Below 60 seconds, the
+         raw blinks are returned with the value 1 each instead of a rate.
+        :param as_array: return float64 arrays (int32 values for raw blinks) instead of lists
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, rounded to the
+         minute, defaults to the current local offset, which `local_utc_offset_s()` applies to
+         the whole history, i.e. bins before a daylight saving time change are off by an hour
+         from the local time of then. The hour and day tiers are only used when
+         the offset is a whole number of hours or days, otherwise a finer tier is aggregated.
+        :return: dict of "timestamps", the unix timestamp of the start of each bin, and "values",
+         the mean number of blinks per minute in that bin, averaged over minutes with blinks,
+         e.g. [2.1, 3.5]. Bins without blinks are omitted.
+        :raises ValueError: if the resolution is at least 60 seconds but not a multiple of 60
+        """
+        self._flush_before_read()
+        if resolution < ROLLUP_TIERS[-1].seconds:
+            query = """
                 SELECT blink_time, 1
                 FROM blink_history
                 WHERE blink_marker = 1 AND blink_time >= ?
-                ORDER BY blink_time ASC;
-                """, (since,))
-            rows = cursor.fetchall()
-        x_axis = [i[0] for i in rows]
-        y_axis = [i[1] for i in rows]
-        return {"timestamps": x_axis, "values": y_axis}
-
-    def query_blink_history_groupby_minute_since(self, since: float) \
-            -> dict[str, List[float | int]]:
+                """
+            params: list[float | int] = [since]
+            if until is not None:
+                query += " AND blink_time <= ?"
+                params.append(until)
+            query += " ORDER BY blink_time ASC;"
+            value_dtype: Any = np.int32
+        else:
+            query, params = self._rollup_query(
+                since, until, resolution, tz_offset_s,
+                "SUM(blink_count) * 1.0 / SUM({active_minutes})")
+            value_dtype = np.float64
+        with self._read_con() as db_con:
+            return fetch_series(db_con.execute(query, params), as_array, value_dtype)
+
+    def query_blink_counts(self,
+                           since: float,
+                           until: Optional[float] = None,
+                           resolution: int = 60,
+                           tz_offset_s: Optional[int] = None) -> list[tuple[float, int, int]]:
+        """Fetch the components of the blink rate bins, see `query_blink_rate()`, so that a rate
+        can be updated as new blinks come in
+
+        :param since: Only consider timestamps after this, a unix timestamp
+        :param until: Only consider timestamps before this, a unix timestamp, None for no limit
+        :param resolution: width of each bin in seconds, a multiple of 60
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, defaults to the
+         current local offset
+        :return: list of (unix timestamp of the start of the bin, number of blinks, number of
+         minutes with blinks) for each bin with blinks
+        :raises ValueError: if the resolution is not a multiple of 60 seconds
+        """
+        self._flush_before_read()
+        query, params = self._rollup_query(since, until, resolution, tz_offset_s,
+                                           "SUM(blink_count), SUM({active_minutes})")
+        with self._read_con() as db_con:
+            rows: list[tuple[float, int, int]] = db_con.execute(query, params).fetchall()
+        return rows
+
+    @overload
+    def query_blink_history_groupby_minute_since(self,
+                                                 since: float,
+                                                 as_array: Literal[False] = False) \
+            -> BlinkSeries:
+        ...
+
+    @overload
+    def query_blink_history_groupby_minute_since(self,
+                                                 since: float,
+                                                 as_array: Literal[True]) -> BlinkArrays:
+        ...
+
+    def query_blink_history_groupby_minute_since(self, since: float, as_array: bool = False) \
+            -> Union[BlinkSeries, BlinkArrays]:
         """Fetch the last blink history (blink_marker) from since provided timestamp,
-        groupby minutes
+        groupby minutes, see `query_blink_rate()`
 
         :param since: Only consider timestamps after this, a unix timestamp
-        :return: list of tuples, each is an utc datetime string e.g.
-         [('2023-01-01 12:59', 2), ('2023-01-01 13:00', 3), ('2023-01-01 13:01', 5), ] followed by
-         the number of blinks that minute bin.
+        :return: dict of "timestamps", the unix timestamp of the start of each UTC minute bin
+         e.g. [1672577940.0, 1672578000.0], and "values", the number of blinks in that minute
+         bin, e.g. [2.0, 3.0]. Minutes without blinks are omitted.
+        :param as_array: return float64 arrays instead of lists
         """
-        with self.db_con:
-            cursor = self.db_con.execute(
-                """
-                SELECT strftime('%Y-%m-%d %H:%M', blink_time, 'unixepoch') AS minute_utc,
-                       COUNT(*) AS events_per_minute
-                FROM blink_history
-                WHERE blink_marker = 1 AND blink_time >= ?
-                GROUP BY minute_utc ORDER BY minute_utc ASC;
-                """, (since,))
-            rows = cursor.fetchall()
-        x_axis = [datetime.strptime(i[0], "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
-                  for i in rows]
-        y_axis = [i[1] for i in rows]
-        return {"timestamps": x_axis, "values": y_axis}
-
-    def query_blink_history_groupby_hour_since(self, since: float) -> dict[str, List[float | int]]:
+        return self.query_blink_rate(since, resolution=60, as_array=as_array)
+
+    @overload
+    def query_blink_history_groupby_hour_since(self,
+                                               since: float,
+                                               as_array: Literal[False] = False,
+                                               tz_offset_s: Optional[int] = None) \
+            -> BlinkSeries:
+        ...
+
+    @overload
+    def query_blink_history_groupby_hour_since(self,
+                                               since: float,
+                                               as_array: Literal[True],
+                                               tz_offset_s: Optional[int] = None) \
+            -> BlinkArrays:
+        ...
+
+    def query_blink_history_groupby_hour_since(self,
+                                               since: float,
+                                               as_array: bool = False,
+                                               tz_offset_s: Optional[int] = None) \
+            -> Union[BlinkSeries, BlinkArrays]:
         """Fetch the last blink history (blink_marker) from since provided timestamp,
-        groupby minutes as a subquery, then aggregate that as a mean over hourly bins.
+        aggregated as the mean blinks per minute over hourly bins, see `query_blink_rate()`
 
         :param since: Only consider timestamps after this, a unix timestamp
-        :return: list of tuples, each is an utc datetime string e.g.
-         [('2023-01-01 12:00', 2.1), ('2023-01-01 13:00', 3.5), ('2023-01-01 14:00', 5.2),]
-          followed by the mean number of blinks that hourly bin, averaged over minute bins.
-        """
-        with self.db_con:
-            cursor = self.db_con.execute(
-                """SELECT strftime('%Y-%m-%d %H:00', minute_utc) AS hour_utc,
-               AVG(events_per_minute) AS mean_events_per_hour
-        FROM (
-            SELECT strftime('%Y-%m-%d %H:%M', blink_time, 'unixepoch') AS minute_utc,
-                   COUNT(*) AS events_per_minute
-            FROM blink_history
-            WHERE blink_marker = 1 AND blink_time >= ?
-            GROUP BY minute_utc
-        ) AS subquery
-        GROUP BY hour_utc
-        ORDER BY hour_utc ASC;""", (since,))
-            rows = cursor.fetchall()
-        x_axis = [datetime.strptime(i[0], "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
-                  for i in rows]
-        y_axis = [i[1] for i in rows]
-        return {"timestamps": x_axis, "values": y_axis}
-
-    def query_blink_history_groupby_day_since(self, since: float) -> dict[str, List[float | int]]:
+        :return: dict of "timestamps", the unix timestamp of the start of each local hour bin
+         e.g. [1672574400.0, 1672578000.0], and "values", the mean number of blinks per minute
+         in that hourly bin, averaged over minute bins with blinks, e.g. [2.1, 3.5].
+        :param as_array: return float64 arrays instead of lists
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, defaults to the
+         current local offset
+        """
+        return self.query_blink_rate(since, resolution=60 * 60, as_array=as_array,
+                                     tz_offset_s=tz_offset_s)
+
+    @overload
+    def query_blink_history_groupby_day_since(self,
+                                              since: float,
+                                              as_array: Literal[False] = False,
+                                              tz_offset_s: Optional[int] = None) \
+            -> BlinkSeries:
+        ...
+
+    @overload
+    def query_blink_history_groupby_day_since(self,
+                                              since: float,
+                                              as_array: Literal[True],
+                                              tz_offset_s: Optional[int] = None) \
+            -> BlinkArrays:
+        ...
+
+    def query_blink_history_groupby_day_since(self,
+                                              since: float,
+                                              as_array: bool = False,
+                                              tz_offset_s: Optional[int] = None) \
+            -> Union[BlinkSeries, BlinkArrays]:
         """Fetch the last blink history (blink_marker) from since provided timestamp,
-        groupby minutes as a subquery, then aggregate that as a mean over daily bins.
+        aggregated as the mean blinks per minute over daily bins, see `query_blink_rate()`
 
         :param since: Only consider timestamps after this, a unix timestamp
-        :return: list of tuples, each is an utc datetime string e.g.
-         [('2023-01-01 00:00', 2.1), ('2023-01-02 00:00', 3.5), ('2023-01-03 00:00', 5.2),]
-          followed by the mean number of blinks that daily bin, averaged over minute bins.
-        """
-        with self.db_con:
-            cursor = self.db_con.execute(
-                """SELECT strftime('%Y-%m-%d 00:00', minute_utc) AS day_utc,
-               AVG(events_per_minute) AS mean_events_per_hour
-        FROM (
-            SELECT strftime('%Y-%m-%d %H:%M', blink_time, 'unixepoch') AS minute_utc,
-                   COUNT(*) AS events_per_minute
-            FROM blink_history
-            WHERE blink_marker = 1 AND blink_time >= ?
-            GROUP BY minute_utc
-        ) AS subquery
-        GROUP BY day_utc
-        ORDER BY day_utc ASC;""", (since,))
-            rows = cursor.fetchall()
-        x_axis = [datetime.strptime(i[0], "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
-                  for i in rows]
-        y_axis = [i[1] for i in rows]
-        return {"timestamps": x_axis, "values": y_axis}
+        :return: dict of "timestamps", the unix timestamp of the start of each local day bin
+         e.g. [1672531200.0, 1672617600.0], and "values", the mean number of blinks per minute
+         in that daily bin, averaged over minute bins with blinks, e.g. [2.1, 3.5].
+        :param as_array: return float64 arrays instead of lists
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, defaults to the
+         current local offset. A single offset applies to the whole history, so across a
+         daylight saving time change the day bins before it are shifted by an hour from the
+         local midnight of the time.
+        """
+        return self.query_blink_rate(since, resolution=24 * 60 * 60, as_array=as_array,
+                                     tz_offset_s=tz_offset_s)
 
     def store_event(self,
                     timestamp: float,
                     event_type: EventTypes,
                     event_numerical_metadata: Optional[float] = None,
                     event_textual_metadata: Optional[float] = None) -> None:
-        """Store an event into the events table of the database
+        """Queue an event to be stored into the events table of the database. A
+        SOFTWARE_SHUTDOWN event flushes all queued rows immediately.
 
         :param timestamp: unix timestamp of the event
         :param event_type: The event name ENUM
         :param event_numerical_metadata: Optional numerical metadata to store with the event
         :param event_textual_metadata: Optional textual metadata to store with the event
         """
-        with self.db_con:
-            self.db_con.execute(
-                """INSERT INTO events(timestamp, event_type_id,
-                 event_numerical_metadata, event_textual_metadata) VALUES(?,?,?,?)""", (
-                    timestamp,
-                    event_type.value,
-                    event_numerical_metadata,
-                    event_textual_metadata
-                ))
-        LOGGER.info("Wrote to database event_type: %s at %s with numerical metadata: %s and "
-                    "textual metadata: %s", event_type,
+        self._queue_write(INSERT_EVENT_SQL, (
+            timestamp,
+            event_type.value,
+            event_numerical_metadata,
+            event_textual_metadata
+        ))
+        LOGGER.info("Queued database write of event_type: %s at %s with numerical metadata: %s "
+                    "and textual metadata: %s", event_type,
                     timestamp, event_numerical_metadata, event_textual_metadata)
+        if event_type == EventTypes.SOFTWARE_SHUTDOWN:
+            self.flush()
+
+    @overload
+    def query_events(self, since: float, event_type_list: list[EventTypes],
+                     as_array: Literal[False] = False) -> BlinkSeries:
+        ...
+
+    @overload
+    def query_events(self, since: float, event_type_list: list[EventTypes],
+                     as_array: Literal[True]) -> BlinkArrays:
+        ...
 
-    def query_events(self, since: float, event_type_list: list[EventTypes]) \
-            -> dict[str, List[float | int]]:
+    def query_events(self, since: float, event_type_list: list[EventTypes],
+                     as_array: bool = False) -> Union[BlinkSeries, BlinkArrays]:
         """Fetch the events since the `since` timestamp, and return a list of tuples
         with the first item being the timestamp and the second being the integer 1 representing
         an event occurring
@@ -173,8 +745,10 @@ class BlinkHistoryDryEyeDefender(BlinkHistory):
         :return: list of tuples, each is a utc datetime string e.g.
          [('2023-01-01 12:59:00', 1), ('2023-01-01 13:00:14', 1),] where 1 is a notification
          event
+        :param as_array: return float64 and int32 arrays instead of lists
         """
-        with self.db_con:
+        self._flush_before_read()
+        with self._read_con() as db_con:
             query = f"""
                 SELECT timestamp, 1
                 FROM events
@@ -182,15 +756,9 @@ class BlinkHistoryDryEyeDefender(BlinkHistory):
                 ORDER BY timestamp ASC;
             """
             params = [i.value for i in event_type_list] + [since]
-            cursor = self.db_con.execute(query, params)
-            rows = cursor.fetchall()
-        x_axis = [i[0] for i in rows]
-        y_axis = [i[1] for i in rows]
-        return {"timestamps": x_axis, "values": y_axis}
+            return fetch_series(db_con.execute(query, params), as_array, np.int32)
 
     # _create_db() from BlinkHistory()
-    # store_blink() from BlinkHistory()
-    # write_blink_history() from BlinkHistory()
     # get_blink_history_count() from BlinkHistory()
     # reset_create_db() from BlinkHistory()
     # fetch_last_n_blink() from BlinkHistory()
@@ -0,0 +1,163 @@
+"""Single background thread owning the write connection to the blink database
+
+Rows are queued by any thread and committed by the writer in batches, so neither the inference
+thread nor the GUI thread ever waits on a database write or on a long read holding a lock. When
+nothing is queued, the writer also runs the periodic database maintenance.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# Queued in place of a row to make the writer commit and exit
+_STOP = object()
+# Delay before the first maintenance run, so that it does not compete with the startup
+MAINTENANCE_STARTUP_DELAY_S = 60.0
+# Pause between two maintenance steps when more work remains, leaving room for the readers
+MAINTENANCE_STEP_DELAY_S = 0.1
+
+
+class DatabaseWriter(threading.Thread):
+    """Thread consuming a queue of rows to insert and committing them in batches"""
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 connection_factory: Callable[[], sqlite3.Connection],
+                 flush_max_rows: int,
+                 flush_interval_ms: int,
+                 maintenance: Optional[Callable[[sqlite3.Connection], bool]] = None,
+                 maintenance_interval_s: float = 3600.0,
+                 maintenance_delay_s: float = MAINTENANCE_STARTUP_DELAY_S) -> None:
+        """Create the writer, call `start()` to begin consuming the queue
+
+        :param connection_factory: creates the write connection, called on the writer thread
+        :param flush_max_rows: commit once this many rows are pending
+        :param flush_interval_ms: commit once the oldest pending row is this old
+        :param maintenance: called with the write connection when no rows are pending, should
+          do a bounded amount of work and return whether more work remains, in which case it is
+          called again as soon as the writer is idle
+        :param maintenance_interval_s: seconds between two maintenance runs once no work remains
+        :param maintenance_delay_s: seconds before the first maintenance run
+        """
+        super().__init__(name="DatabaseWriter", daemon=True)
+        self.connection_factory = connection_factory
+        self.flush_max_rows = flush_max_rows
+        self.flush_interval_ms = flush_interval_ms
+        self.maintenance = maintenance
+        self.maintenance_interval_s = maintenance_interval_s
+        self._next_maintenance_time = time.monotonic() + maintenance_delay_s
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+
+    def write(self, sql: str, row: tuple[Any, ...]) -> None:
+        """Queue a row to be inserted, returns immediately
+
+        :param sql: INSERT statement with placeholders for the row
+        :param row: values to insert
+        """
+        self._queue.put((sql, row))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every row queued so far has been committed
+
+        :param timeout: maximum number of seconds to wait, None waits indefinitely
+        """
+        if not self.is_alive():
+            return
+        committed = threading.Event()
+        self._queue.put(committed)
+        if not committed.wait(timeout):
+            LOGGER.warning("Timed out waiting for the database writer to commit")
+
+    def stop(self) -> None:
+        """Commit every queued row and stop the thread"""
+        if not self.is_alive():
+            return
+        self._queue.put(_STOP)
+        self.join()
+
+    @staticmethod
+    def _commit(db_con: sqlite3.Connection, pending_writes: dict[str, list[tuple[Any, ...]]]) \
+            -> None:
+        """Insert the pending rows in a single transaction
+
+        :param db_con: the write connection
+        :param pending_writes: maps an INSERT statement to the rows to insert with it
+        """
+        if not pending_writes:
+            return
+        try:
+            with db_con:
+                for sql, rows in pending_writes.items():
+                    db_con.executemany(sql, rows)
+        except sqlite3.Error:
+            LOGGER.exception("Failed to write %s batches to the database", len(pending_writes))
+        pending_writes.clear()
+
+    def _get_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """Seconds to wait for the next queued item before committing or running maintenance
+
+        :param deadline: monotonic time at which the pending rows must be committed, if any
+        :return: the timeout, None to wait indefinitely
+        """
+        if deadline is not None:
+            return max(deadline - time.monotonic(), 0)
+        if self.maintenance is None:
+            return None
+        return max(self._next_maintenance_time - time.monotonic(), 0)
+
+    def _run_maintenance(self, db_con: sqlite3.Connection) -> None:
+        """Run one maintenance step and schedule the next one
+
+        :param db_con: the write connection
+        """
+        assert self.maintenance is not None
+        try:
+            more_work = self.maintenance(db_con)
+        except sqlite3.Error:
+            LOGGER.exception("Database maintenance failed")
+            more_work = False
+        delay_s = MAINTENANCE_STEP_DELAY_S if more_work else self.maintenance_interval_s
+        self._next_maintenance_time = time.monotonic() + delay_s
+
+    def run(self) -> None:
+        """Consume the queue until stopped, committing when a batch is full or old enough and
+        running the maintenance when idle
+        """
+        LOGGER.info("Starting database writer")
+        db_con = self.connection_factory()
+        pending_writes: dict[str, list[tuple[Any, ...]]] = {}
+        row_count = 0
+        deadline: Optional[float] = None
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self._get_timeout(deadline))
+                except queue.Empty:
+                    if deadline is None:
+                        # Idle with nothing pending, maintenance is due
+                        self._run_maintenance(db_con)
+                        continue
+                    item = None
+                if isinstance(item, tuple):
+                    sql, row = item
+                    pending_writes.setdefault(sql, []).append(row)
+                    row_count += 1
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval_ms / 1000
+                    if row_count < self.flush_max_rows:
+                        continue
+                # The batch is full, old enough, or a flush or stop was requested
+                self._commit(db_con, pending_writes)
+                LOGGER.debug("Database writer committed %s rows", row_count)
+                row_count = 0
+                deadline = None
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is _STOP:
+                    break
+        finally:
+            db_con.close()
+            LOGGER.info("Database writer stopped")
@@ -0,0 +1,146 @@
+"""Track the face region of interest so inference only processes the pixels around the face"""
+import logging
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+# Fraction of the face bounding box size added on each side of the crop
+DEFAULT_MARGIN = 0.3
+# Run inference on the full frame every this many frames to re-acquire a face that moved fast
+DEFAULT_FULL_FRAME_INTERVAL = 30
+# Crops smaller than this (in pixels) are too small for the landmark model
+MIN_ROI_SIZE_PX = 64
+
+Roi = Tuple[int, int, int, int]  # (x_min, y_min, x_max, y_max) in full frame pixels
+
+
+def landmarks_to_array(landmarks: Any) -> Optional[np.ndarray]:
+    """Convert face landmarks to a (N, 2) array of normalised (x, y) coordinates
+
+    :param landmarks: MediaPipe style landmarks, either a sequence of objects with `x` and `y`
+      attributes or an array-like of shape (N, 2+), or (faces, N, 2+) in which case the first
+      face is used. Coordinates are normalised to [0, 1] relative to the processed image.
+    :return: array of landmarks or None if there are no landmarks
+    """
+    if landmarks is None or len(landmarks) == 0:
+        return None
+    if hasattr(landmarks[0], "x"):
+        return np.array([[landmark.x, landmark.y] for landmark in landmarks], dtype=np.float32)
+    array = np.asarray(landmarks, dtype=np.float32)
+    if array.ndim == 3:
+        array = array[0]
+    return array[:, :2]
+
+
+class FaceRoiTracker:
+    """Crop each frame around the last detected face, falling back to the full frame
+    periodically or when the face is lost
+    """
+
+    def __init__(self,
+                 margin: float = DEFAULT_MARGIN,
+                 full_frame_interval: int = DEFAULT_FULL_FRAME_INTERVAL) -> None:
+        """Create the tracker, the first frame is always processed in full
+
+        :param margin: fraction of the face size added on each side of the crop
+        :param full_frame_interval: process the full frame every this many frames
+        """
+        self.margin = margin
+        self.full_frame_interval = full_frame_interval
+        self.roi: Optional[Roi] = None
+        self._frames_since_full_frame = 0
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Optional[Roi]]:
+        """Crop the frame to the tracked face
+
+        :param frame: full camera frame
+        :return: (image to run inference on, roi it was cropped to or None if full frame)
+        """
+        if self.roi is None or self._frames_since_full_frame >= self.full_frame_interval:
+            self._frames_since_full_frame = 0
+            return frame, None
+        self._frames_since_full_frame += 1
+        x_min, y_min, x_max, y_max = self.roi
+        return np.ascontiguousarray(frame[y_min:y_max, x_min:x_max]), self.roi
+
+    def update(self,
+               landmarks: Any,
+               roi: Optional[Roi],
+               frame_shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """Remap the landmarks detected in the cropped image to full frame coordinates and update
+        the tracked region from them
+
+        :param landmarks: landmarks detected in the image returned by `crop()`, see
+          `landmarks_to_array()`
+        :param roi: roi returned by `crop()` alongside the image
+        :param frame_shape: shape of the full frame
+        :return: (N, 2) landmarks normalised to the full frame, or None if no face was found
+        """
+        landmarks_array = landmarks_to_array(landmarks)
+        if landmarks_array is None:
+            if self.roi is not None:
+                LOGGER.debug("Face lost, falling back to full frame inference")
+            self.roi = None
+            return None
+        landmarks_array = self._remap_landmarks(landmarks_array, roi, frame_shape)
+        new_roi = self._bounding_roi(landmarks_array, frame_shape)
+        if min(new_roi[2] - new_roi[0], new_roi[3] - new_roi[1]) < MIN_ROI_SIZE_PX:
+            self.roi = None
+        else:
+            self.roi = new_roi
+        return landmarks_array
+
+    @staticmethod
+    def _remap_landmarks(landmarks: np.ndarray,
+                         roi: Optional[Roi],
+                         frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Convert landmarks normalised to the cropped image to landmarks normalised to the full
+        frame
+
+        :param landmarks: (N, 2) landmarks normalised to the image returned by `crop()`
+        :param roi: roi returned by `crop()` alongside the image
+        :param frame_shape: shape of the full frame
+        :return: (N, 2) landmarks normalised to the full frame
+        """
+        if roi is None:
+            return landmarks
+        frame_height, frame_width = frame_shape[:2]
+        x_min, y_min, x_max, y_max = roi
+        pixels = landmarks.astype(np.float64) * [x_max - x_min, y_max - y_min] + [x_min, y_min]
+        return pixels / [frame_width, frame_height]
+
+    def _bounding_roi(self, landmarks: np.ndarray, frame_shape: Tuple[int, ...]) -> Roi:
+        """Get the bounding box of the landmarks enlarged by the margin, clamped to the frame
+
+        :param landmarks: (N, 2) landmarks normalised to the full frame
+        :param frame_shape: shape of the full frame
+        :return: the roi in full frame pixels
+        """
+        frame_height, frame_width = frame_shape[:2]
+        pixels = landmarks * [frame_width, frame_height]
+        (face_x_min, face_y_min), (face_x_max, face_y_max) = pixels.min(0), pixels.max(0)
+        margin_x = (face_x_max - face_x_min) * self.margin
+        margin_y = (face_y_max - face_y_min) * self.margin
+        return (max(int(face_x_min - margin_x), 0),
+                max(int(face_y_min - margin_y), 0),
+                min(int(face_x_max + margin_x), frame_width),
+                min(int(face_y_max + margin_y), frame_height))
+
+    @staticmethod
+    def remap_image(frame: np.ndarray, image: np.ndarray, roi: Optional[Roi]) -> np.ndarray:
+        """Paste an image produced from the cropped region (e.g. the annotated debug image) back
+        into the full frame
+
+        :param frame: full camera frame
+        :param image: image of the same size as the crop
+        :param roi: roi returned by `crop()` alongside the cropped image
+        :return: full frame sized image
+        """
+        if roi is None:
+            return image
+        x_min, y_min, x_max, y_max = roi
+        full_image = frame.copy()
+        full_image[y_min:y_max, x_min:x_max] = image
+        return full_image
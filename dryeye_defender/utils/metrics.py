@@ -0,0 +1,413 @@
+"""Counters and rolling latency histograms of the inference pipeline
+
+Each metric is updated by a single thread without locking, e.g. the frame timings by the
+inference thread and the dropped ticks by the GUI thread: updates only assign whole values, so
+a reader on another thread sees each value either before or after an update, at worst one
+sample stale across values. The metrics can be read from code with `MetricsRegistry.snapshot()`,
+or exported in the Prometheus text format or as JSON, periodically to a file with
+`MetricsFileExporter`.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the cumulative histogram buckets, from 1 ms to 2.5 s
+DEFAULT_LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Number of most recent samples the rolling percentiles are computed over
+DEFAULT_WINDOW_SIZE = 1024
+SUMMARY_PERCENTILES = (50, 90, 99)
+# Sliding windows in seconds the event rates are reported over
+DEFAULT_RATE_WINDOWS_S = (1.0, 10.0, 60.0)
+# Number of most recent events kept to compute the rates, e.g. 60 s at 130 FPS
+DEFAULT_RATE_CAPACITY = 8192
+DEFAULT_METRICS_PREFIX = "dryeye_defender_"
+DEFAULT_EXPORT_INTERVAL_S = 10.0
+METRICS_FORMATS = ("prometheus", "json")
+
+
+class Counter:
+    """Monotonic counter, incremented by a single thread"""
+
+    def __init__(self, name: str, description: str) -> None:
+        """Create the counter at 0
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        """
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """Increment the counter
+
+        :param amount: value to add
+        """
+        self.value += amount
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the current value
+
+        :return: dict with the "value"
+        """
+        return {"value": self.value}
+
+
+class RollingHistogram:
+    """Latency distribution, with percentiles over the last `window_size` samples and
+    cumulative bucket counts over all samples, observed by a single thread
+    """
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_S,
+                 window_size: int = DEFAULT_WINDOW_SIZE) -> None:
+        """Create the empty histogram
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        :param buckets: sorted upper bounds of the buckets in seconds, a +Inf bucket is added
+        :param window_size: number of most recent samples the percentiles are computed over
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        # The last count is the +Inf bucket
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._window = np.zeros(window_size)
+
+    def observe(self, value: float) -> None:
+        """Record a sample
+
+        :param value: duration in seconds
+        """
+        self._window[self.count % len(self._window)] = value
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def window(self) -> np.ndarray:
+        """Get the most recent samples, in no particular order
+
+        :return: copy of up to `window_size` samples in seconds
+        """
+        return self._window[:min(self.count, len(self._window))].copy()
+
+    def percentiles(self, percentiles: Sequence[float] = SUMMARY_PERCENTILES) \
+            -> dict[str, float]:
+        """Compute percentiles of the most recent samples
+
+        :param percentiles: percentiles to compute, between 0 and 100
+        :return: dict of e.g. "p50" to the value in seconds, empty if there are no samples
+        """
+        samples = self.window()
+        if samples.size == 0:
+            return {}
+        return {f"p{percentile:g}": float(value)
+                for percentile, value in zip(percentiles, np.percentile(samples, percentiles))}
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the current state
+
+        :return: dict of the "count" and "sum" of all samples, the cumulative "buckets" counts by
+          upper bound and the rolling "percentiles"
+        """
+        cumulative_counts = np.cumsum(self.bucket_counts).tolist()
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative_counts)),
+            "percentiles": self.percentiles(),
+        }
+
+
+class RateMeter:
+    """Rate of events, e.g. processed frames, over sliding windows, marked by a single thread"""
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 windows_s: Sequence[float] = DEFAULT_RATE_WINDOWS_S,
+                 capacity: int = DEFAULT_RATE_CAPACITY) -> None:
+        """Create the meter without events
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        :param windows_s: sliding windows in seconds reported by `snapshot()`
+        :param capacity: number of most recent events kept, rates over windows holding more
+          events are computed over the period covered by the kept events
+        """
+        self.name = name
+        self.description = description
+        self.windows_s = tuple(windows_s)
+        self.count = 0
+        # Monotonic time of the first event since the last reset
+        self.start_time: Optional[float] = None
+        self._times = np.zeros(capacity)
+
+    def reset(self) -> None:
+        """Forget the past events, e.g. when the events are paused, so that the pause is not
+        counted as a low rate. Must not be called while events are being marked.
+        """
+        self.count = 0
+        self.start_time = None
+
+    def mark(self, event_time: Optional[float] = None) -> None:
+        """Record an event
+
+        :param event_time: `time.monotonic()` time of the event, defaults to now
+        """
+        if event_time is None:
+            event_time = time.monotonic()
+        if self.start_time is None:
+            self.start_time = event_time
+        self._times[self.count % len(self._times)] = event_time
+        self.count += 1
+
+    def history_s(self, now: Optional[float] = None) -> float:
+        """Get how long events have been recorded for
+
+        :param now: `time.monotonic()` time to measure up to, defaults to now
+        :return: seconds since the first event, 0 if there are none
+        """
+        start_time = self.start_time
+        if start_time is None:
+            return 0.0
+        return (time.monotonic() if now is None else now) - start_time
+
+    def rate(self, window_s: float, now: Optional[float] = None) -> float:
+        """Compute the rate of events over the last `window_s` seconds, or since the first event
+        if it is more recent
+
+        :param window_s: length of the sliding window in seconds
+        :param now: `time.monotonic()` time the window ends at, defaults to now
+        :return: events per second, 0 if there are no events
+        """
+        if now is None:
+            now = time.monotonic()
+        count = self.count
+        times = self._times[:min(count, len(self._times))]
+        window_start = now - min(window_s, self.history_s(now))
+        if count > len(times):
+            # Older events were overwritten, so only the period covered by the kept ones is known
+            window_start = max(window_start, float(times.min()))
+        period_s = now - window_start
+        if period_s <= 0:
+            return 0.0
+        return int(np.count_nonzero(times >= window_start)) / period_s
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the current state
+
+        :return: dict of the "count" of events and the "rates" in events per second over each
+          window, keyed by e.g. "10s"
+        """
+        now = time.monotonic()
+        return {
+            "count": self.count,
+            "rates": {f"{window_s:g}s": self.rate(window_s, now) for window_s in self.windows_s},
+        }
+
+
+Metric = Union[Counter, RollingHistogram, RateMeter]
+
+
+class MetricsRegistry:
+    """Named set of metrics, exported together"""
+
+    def __init__(self, prefix: str = DEFAULT_METRICS_PREFIX) -> None:
+        """Create an empty registry
+
+        :param prefix: prepended to the names of the metrics when exported to Prometheus
+        """
+        self.prefix = prefix
+        self._metrics: "OrderedDict[str, Metric]" = OrderedDict()
+        # Only guards registering metrics, not updating them
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        """Add a metric, or get the existing one of the same name and type
+
+        :param metric: the new metric
+        :return: the registered metric
+        """
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if not isinstance(existing, type(metric)):
+            raise ValueError(f"Metric {metric.name} is already registered as a "
+                             f"{type(existing).__name__}")
+        return existing
+
+    def counter(self, name: str, description: str) -> Counter:
+        """Get the counter of this name, creating it if needed
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        :return: the counter
+        """
+        counter = self._register(Counter(name, description))
+        assert isinstance(counter, Counter)
+        return counter
+
+    def histogram(self, name: str, description: str, **kwargs: Any) -> RollingHistogram:
+        """Get the histogram of this name, creating it if needed
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        :param kwargs: passed to `RollingHistogram` when creating it
+        :return: the histogram
+        """
+        histogram = self._register(RollingHistogram(name, description, **kwargs))
+        assert isinstance(histogram, RollingHistogram)
+        return histogram
+
+    def rate_meter(self, name: str, description: str, **kwargs: Any) -> RateMeter:
+        """Get the rate meter of this name, creating it if needed
+
+        :param name: name of the metric
+        :param description: help text of the metric
+        :param kwargs: passed to `RateMeter` when creating it
+        :return: the rate meter
+        """
+        rate_meter = self._register(RateMeter(name, description, **kwargs))
+        assert isinstance(rate_meter, RateMeter)
+        return rate_meter
+
+    def get(self, name: str) -> Optional[Metric]:
+        """Get a metric by name
+
+        :param name: name of the metric
+        :return: the metric, None if there is no metric of that name
+        """
+        return self._metrics.get(name)
+
+    def metrics(self) -> list[Metric]:
+        """Get the registered metrics
+
+        :return: the metrics, in registration order
+        """
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Get the current state of every metric
+
+        :return: dict of the name of each metric to its snapshot
+        """
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+    def to_json(self) -> str:
+        """Export the metrics as JSON
+
+        :return: the snapshot of every metric as a JSON object
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Export the metrics in the Prometheus text format. The rolling percentiles of each
+        histogram are exported as a separate gauge, `<name>_rolling` with a quantile label, and
+        rate meters as a gauge with a window label.
+
+        :return: the text of the exposition
+        """
+        lines = []
+        for metric in self.metrics():
+            name = self.prefix + metric.name
+            snapshot = metric.snapshot()
+            lines.append(f"# HELP {name} {metric.description}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {snapshot['value']}")
+                continue
+            if isinstance(metric, RateMeter):
+                lines.append(f"# TYPE {name} gauge")
+                for window, rate in snapshot["rates"].items():
+                    lines.append(f'{name}{{window="{window}"}} {rate}')
+                continue
+            lines.append(f"# TYPE {name} histogram")
+            for upper_bound, count in snapshot["buckets"].items():
+                lines.append(f'{name}_bucket{{le="{upper_bound}"}} {count}')
+            lines.append(f"{name}_sum {snapshot['sum']}")
+            lines.append(f"{name}_count {snapshot['count']}")
+            lines.append(f"# HELP {name}_rolling {metric.description}, over the last "
+                         f"{len(metric.window())} samples")
+            lines.append(f"# TYPE {name}_rolling gauge")
+            for percentile, value in snapshot["percentiles"].items():
+                lines.append(f'{name}_rolling{{quantile="{float(percentile[1:]) / 100:g}"}} '
+                             f"{value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path, metrics_format: str = "prometheus") -> None:
+        """Write the metrics to a file, replacing it atomically so that readers never see a
+        partial file
+
+        :param path: file to write
+        :param metrics_format: "prometheus" or "json"
+        """
+        text = self.to_json() + "\n" if metrics_format == "json" else self.to_prometheus()
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+class MetricsFileExporter(threading.Thread):
+    """Thread dumping a registry to a file periodically, and once more when stopped"""
+
+    def __init__(self,
+                 registry: MetricsRegistry,
+                 path: Path,
+                 interval_s: float = DEFAULT_EXPORT_INTERVAL_S,
+                 metrics_format: Optional[str] = None) -> None:
+        """Create the exporter, call `start()` to begin exporting
+
+        :param registry: metrics to export
+        :param path: file the metrics are written to
+        :param interval_s: seconds between two dumps
+        :param metrics_format: "prometheus" or "json", defaults to "json" for a .json file and
+          "prometheus" otherwise
+        """
+        super().__init__(name="MetricsFileExporter", daemon=True)
+        if metrics_format is None:
+            metrics_format = "json" if path.suffix.lower() == ".json" else "prometheus"
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format {metrics_format}, "
+                             f"expected one of {METRICS_FORMATS}")
+        self.registry = registry
+        self.path = path
+        self.interval_s = interval_s
+        self.metrics_format = metrics_format
+        self._stop_event = threading.Event()
+
+    def _dump(self) -> None:
+        """Write the metrics, logging rather than raising on failure"""
+        try:
+            self.registry.dump(self.path, self.metrics_format)
+        except OSError:
+            LOGGER.exception("Failed to write the metrics to %s", self.path)
+
+    def run(self) -> None:
+        """Dump the metrics every `interval_s` until stopped"""
+        LOGGER.info("Exporting metrics to %s every %s s", self.path, self.interval_s)
+        while not self._stop_event.wait(self.interval_s):
+            self._dump()
+        self._dump()
+
+    def stop(self) -> None:
+        """Write the metrics a last time and stop the thread"""
+        if not self.is_alive():
+            return
+        self._stop_event.set()
+        self.join()
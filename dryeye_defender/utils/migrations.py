@@ -0,0 +1,224 @@
+"""Versioned schema migrations for the blink database
+
+The tables themselves are created by `BlinkHistory._create_db()` from the submodule, the
+migrations here add what the DryEye Defender software needs on top of them. The schema version
+is recorded with `PRAGMA user_version`, so each migration runs exactly once per database.
+
+Catching up with the rows stored before a migration can take long on a large history, so the
+statements doing it are not run by `migrate()`, which runs before the window is shown, but
+recorded in the pending_backfill table and run later by `run_backfills()`, e.g. by the writer
+thread.
+"""
+import logging
+import sqlite3
+import time
+from typing import List, NamedTuple, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Value of PRAGMA auto_vacuum for incremental mode
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class Migration(NamedTuple):
+    """SQL statements upgrading the schema to `version`, applied in a single transaction.
+    `backfill` statements catch up with the existing rows, see `run_backfills()`. As rows may be
+    stored between the migration and its backfill, they must recompute what they fill rather
+    than add to it.
+    """
+
+    version: int
+    description: str
+    statements: List[str]
+    backfill: Tuple[str, ...] = ()
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Covering indexes for the stats queries",
+        [
+            # Covers query_raw_blink_history_no_grouping() and the groupby queries
+            """CREATE INDEX IF NOT EXISTS idx_blink_history_blink_time_marked
+            ON blink_history (blink_time, blink_marker) WHERE blink_marker = 1""",
+            # Covers query_events()
+            """CREATE INDEX IF NOT EXISTS idx_events_event_type_id_timestamp
+            ON events (event_type_id, timestamp)""",
+        ],
+    ),
+    Migration(
+        2,
+        "Per-minute blink count rollup maintained by a trigger",
+        [
+            # minute is the unix timestamp divided by 60, i.e. the number of the UTC minute
+            """CREATE TABLE IF NOT EXISTS blink_minute_rollup
+            (minute INTEGER PRIMARY KEY,
+            blink_count INTEGER NOT NULL)""",
+            # Keep it up to date as blinks are written, whichever connection writes them
+            """CREATE TRIGGER IF NOT EXISTS trg_blink_history_minute_rollup
+            AFTER INSERT ON blink_history
+            WHEN NEW.blink_marker = 1
+            BEGIN
+                INSERT INTO blink_minute_rollup(minute, blink_count)
+                VALUES (CAST(NEW.blink_time / 60 AS INTEGER), 1)
+                ON CONFLICT(minute) DO UPDATE SET blink_count = blink_count + 1;
+            END""",
+        ],
+        backfill=(
+            # Catch up with the blinks stored before the rollup existed
+            """INSERT OR REPLACE INTO blink_minute_rollup(minute, blink_count)
+            SELECT CAST(blink_time / 60 AS INTEGER) AS minute, COUNT(*)
+            FROM blink_history
+            WHERE blink_marker = 1
+            GROUP BY minute""",
+        ),
+    ),
+    Migration(
+        3,
+        "Hourly and daily blink count rollups maintained from the minute rollup",
+        [
+            # hour and day are the number of the UTC hour and day since the unix epoch,
+            # active_minutes is the number of minutes with at least one blink
+            """CREATE TABLE IF NOT EXISTS blink_hour_rollup
+            (hour INTEGER PRIMARY KEY,
+            blink_count INTEGER NOT NULL,
+            active_minutes INTEGER NOT NULL)""",
+            """CREATE TRIGGER IF NOT EXISTS trg_blink_minute_rollup_insert_hour
+            AFTER INSERT ON blink_minute_rollup
+            BEGIN
+                INSERT INTO blink_hour_rollup(hour, blink_count, active_minutes)
+                VALUES (NEW.minute / 60, NEW.blink_count, 1)
+                ON CONFLICT(hour) DO UPDATE SET
+                    blink_count = blink_count + excluded.blink_count,
+                    active_minutes = active_minutes + 1;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_blink_minute_rollup_update_hour
+            AFTER UPDATE OF blink_count ON blink_minute_rollup
+            BEGIN
+                UPDATE blink_hour_rollup
+                SET blink_count = blink_count + NEW.blink_count - OLD.blink_count
+                WHERE hour = NEW.minute / 60;
+            END""",
+            """CREATE TABLE IF NOT EXISTS blink_day_rollup
+            (day INTEGER PRIMARY KEY,
+            blink_count INTEGER NOT NULL,
+            active_minutes INTEGER NOT NULL)""",
+            """CREATE TRIGGER IF NOT EXISTS trg_blink_minute_rollup_insert_day
+            AFTER INSERT ON blink_minute_rollup
+            BEGIN
+                INSERT INTO blink_day_rollup(day, blink_count, active_minutes)
+                VALUES (NEW.minute / 1440, NEW.blink_count, 1)
+                ON CONFLICT(day) DO UPDATE SET
+                    blink_count = blink_count + excluded.blink_count,
+                    active_minutes = active_minutes + 1;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS trg_blink_minute_rollup_update_day
+            AFTER UPDATE OF blink_count ON blink_minute_rollup
+            BEGIN
+                UPDATE blink_day_rollup
+                SET blink_count = blink_count + NEW.blink_count - OLD.blink_count
+                WHERE day = NEW.minute / 1440;
+            END""",
+        ],
+        backfill=(
+            # Run after the minute rollup's backfill, whose inserts also reach these tables
+            # through the triggers, hence the replace
+            """INSERT OR REPLACE INTO blink_hour_rollup(hour, blink_count, active_minutes)
+            SELECT minute / 60 AS hour, SUM(blink_count), COUNT(*)
+            FROM blink_minute_rollup
+            GROUP BY hour""",
+            """INSERT OR REPLACE INTO blink_day_rollup(day, blink_count, active_minutes)
+            SELECT minute / 1440 AS day, SUM(blink_count), COUNT(*)
+            FROM blink_minute_rollup
+            GROUP BY day""",
+        ),
+    ),
+    Migration(
+        4,
+        "Incremental auto vacuum, so that the space of expired rows is reclaimed in small steps",
+        [
+            # Only takes effect once a full VACUUM has rewritten the file, which can take minutes
+            # on a large history, so it is left to the maintenance of the writer thread, see
+            # `BlinkHistoryDryEyeDefender._run_maintenance_step()`
+            f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}",
+        ],
+    ),
+]
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1].version
+# Versions of the migrations whose backfill has not been run yet
+CREATE_PENDING_BACKFILL_SQL = """CREATE TABLE IF NOT EXISTS pending_backfill
+(version INTEGER PRIMARY KEY)"""
+
+
+def get_schema_version(db_con: sqlite3.Connection) -> int:
+    """Get the schema version recorded in the database
+
+    :param db_con: connection to the database
+    :return: the version of the last migration applied, 0 if none
+    """
+    version = db_con.execute("PRAGMA user_version").fetchone()[0]
+    assert isinstance(version, int)
+    return version
+
+
+def migrate(db_con: sqlite3.Connection) -> int:
+    """Apply the migrations which have not been applied to the database yet, recording their
+    backfill to be run by `run_backfills()` if the database already holds blinks
+
+    :param db_con: connection to the database, which must not be used by another thread
+    :return: the schema version after migrating
+    """
+    version = get_schema_version(db_con)
+    # A new database has no rows to catch up with
+    has_blinks = db_con.execute("SELECT 1 FROM blink_history LIMIT 1").fetchone() is not None
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        LOGGER.info("Migrating database schema to version %s: %s",
+                    migration.version, migration.description)
+        with db_con:
+            # DDL statements do not open a transaction implicitly
+            db_con.execute("BEGIN")
+            for statement in migration.statements:
+                db_con.execute(statement)
+            if migration.backfill and has_blinks:
+                db_con.execute(CREATE_PENDING_BACKFILL_SQL)
+                db_con.execute("INSERT OR IGNORE INTO pending_backfill(version) VALUES (?)",
+                               (migration.version,))
+            db_con.execute(f"PRAGMA user_version = {migration.version}")
+        version = migration.version
+    return version
+
+
+def has_pending_backfills(db_con: sqlite3.Connection) -> bool:
+    """Whether the backfill of a migration still has to be run, see `run_backfills()`
+
+    :param db_con: connection to the database
+    :return: True if a backfill is pending
+    """
+    if db_con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                      "AND name = 'pending_backfill'").fetchone() is None:
+        return False
+    return db_con.execute("SELECT 1 FROM pending_backfill LIMIT 1").fetchone() is not None
+
+
+def run_backfills(db_con: sqlite3.Connection) -> None:
+    """Run the pending backfills of the applied migrations, in order, each in a single
+    transaction. Until then the rollups miss the blinks stored before they were created.
+
+    :param db_con: connection to the database, which must not be used by another thread
+    """
+    if not has_pending_backfills(db_con):
+        return
+    migrations = {migration.version: migration for migration in MIGRATIONS}
+    versions = [row[0] for row in db_con.execute(
+        "SELECT version FROM pending_backfill ORDER BY version")]
+    for version in versions:
+        time_start = time.perf_counter()
+        with db_con:
+            db_con.execute("BEGIN")
+            for statement in migrations[version].backfill:
+                db_con.execute(statement)
+            db_con.execute("DELETE FROM pending_backfill WHERE version = ?", (version,))
+        LOGGER.info("Ran the backfill of schema version %s in %.2f s", version,
+                    time.perf_counter() - time_start)
@@ -1,15 +1,41 @@
 """Utils functions"""
+from collections import OrderedDict
 from pathlib import Path
 import logging
 import os
 import sys
-from typing import List, Any
+from typing import List, Any, NamedTuple, Sequence
 
 import cv2
+import numpy as np
+from PySide6.QtGui import QImage
 
 LOGGER = logging.getLogger(__name__)
 
 
+class CaptureProfile(NamedTuple):
+    """Capture settings requested from a camera in `BlinkModelThread.init_cap`"""
+
+    width: int
+    height: int
+    fps: int
+    fourcc: str
+    buffer_size: int
+
+
+# A profile of None leaves the capture device with the settings its driver picks by default
+CAPTURE_PROFILES = OrderedDict(
+    [
+        ("Camera Default", None),
+        ("640x480 MJPG 30fps", CaptureProfile(640, 480, 30, "MJPG", 1)),
+        ("640x480 YUYV 30fps", CaptureProfile(640, 480, 30, "YUYV", 1)),
+        ("1280x720 MJPG 30fps", CaptureProfile(1280, 720, 30, "MJPG", 1)),
+        ("1920x1080 MJPG 30fps", CaptureProfile(1920, 1080, 30, "MJPG", 1)),
+    ]
+)
+DEFAULT_CAPTURE_PROFILE_NAME = "Camera Default"
+
+
 def find_data_file(filename: str, submodule: bool = False) -> str:
     """Search where the file is, depending if the app is compiled(frozen) or not
 
@@ -39,6 +65,16 @@ def find_data_file(filename: str, submodule: bool = False) -> str:
     return path
 
 
+def env_flag(name: str) -> bool:
+    """Read a boolean flag from an environment variable
+
+    :param name: name of the environment variable
+    :return: True if it is set to "1", "true" or "yes" (case insensitive), False otherwise,
+      e.g. if it is unset, empty, "0" or "false"
+    """
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes")
+
+
 def get_saved_data_path() -> Path:
     """Get the path where the data is saved.
     If running os.environ["CI_TESTS"] then simply return "/tmp/saved_blink.db"
@@ -76,12 +112,14 @@ def get_saved_data_path() -> Path:
     return database_path
 
 
-def get_cap_indexes() -> List[str]:
+def get_cap_indexes(known_working: Sequence[int] = ()) -> List[str]:
     """Test the ports and returns a tuple with the available ports and the ones that are working.
 
     TODO: Use device names:
     https://abhitronix.github.io/deffcode/v0.2.5-stable/recipes/basic/decode-camera-devices/
 
+    :param known_working: ports already opened by the application, which are reported as
+      working without being opened again, as some platforms do not allow opening a camera twice
     :return: List of indexes that are available for reading, in str format
     """
     # non_working_ports = []
@@ -89,6 +127,10 @@ def get_cap_indexes() -> List[str]:
     working_ports: List[str] = []
     # available_ports = []
     for dev_port in range(6):  # if there are more than 5 non working ports stop the testing.
+        if dev_port in known_working:
+            LOGGER.info("Port %s is already open.", dev_port)
+            working_ports.append(str(dev_port))
+            continue
         camera = cv2.VideoCapture(dev_port)  # pylint: disable=no-member
         if not camera.isOpened():
             # non_working_ports.append(dev_port)
@@ -101,11 +143,74 @@ def get_cap_indexes() -> List[str]:
                 LOGGER.info("Port %s is working and reads images (%s x %s)", dev_port, h, w)
                 working_ports.append(str(dev_port))
             else:
-                LOGGER.info("Port %s for camera ( %s x %s) is present but does not reads.")
+                LOGGER.info("Port %s for camera ( %s x %s) is present but does not reads.",
+                            dev_port, h, w)
                 # available_ports.append(dev_port)
+        camera.release()
     return working_ports
 
 
+def apply_capture_profile(cap: cv2.VideoCapture, profile: CaptureProfile) -> bool:
+    """Request the settings of the profile from an opened capture device
+
+    :param cap: opened capture device
+    :param profile: settings to request
+    :return: True if the device reports using the requested resolution and format
+    """
+    # pylint: disable=no-member
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter.fourcc(*profile.fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+    cap.set(cv2.CAP_PROP_FPS, profile.fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, profile.buffer_size)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fourcc_code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    fourcc = "".join(chr((fourcc_code >> 8 * i) & 0xFF) for i in range(4))
+    # Some backends do not report the format, in which case only the resolution is checked
+    supported = (width, height) == (profile.width, profile.height) and (
+        fourcc_code == 0 or fourcc == profile.fourcc)
+    LOGGER.info("Capture profile %s: device reports %sx%s %s, supported: %s",
+                profile, width, height, fourcc, supported)
+    return supported
+
+
+def probe_capture_profiles(input_device: int) -> List[str]:
+    """Find which of the CAPTURE_PROFILES a camera supports. The camera must not be in use.
+
+    :param input_device: index of the camera to probe
+    :return: names of the supported profiles, always including DEFAULT_CAPTURE_PROFILE_NAME
+    """
+    supported_profiles = [DEFAULT_CAPTURE_PROFILE_NAME]
+    camera = cv2.VideoCapture(input_device)  # pylint: disable=no-member
+    if not camera.isOpened():
+        LOGGER.info("Port %s is not working, cannot probe capture profiles.", input_device)
+        return supported_profiles
+    for name, profile in CAPTURE_PROFILES.items():
+        if profile is not None and apply_capture_profile(camera, profile):
+            supported_profiles.append(name)
+    camera.release()
+    return supported_profiles
+
+
+def bgr_array_to_qimage(img: np.ndarray) -> QImage:
+    """Convert a BGR uint8 image, as produced by OpenCV, to a QImage.
+
+    The pixels are copied once, straight into the buffer of a QImage which owns it, without
+    converting the colour order. Unlike a QPixmap, the QImage can be created on any thread and
+    sent to the GUI thread, which converts it with QPixmap.fromImage.
+
+    :param img: (height, width, 3) BGR image
+    :return: image owning a copy of the pixels
+    """
+    height, width = img.shape[:2]
+    image = QImage(width, height, QImage.Format.Format_BGR888)
+    # Rows of the QImage buffer are padded to a multiple of 4 bytes
+    buffer = np.frombuffer(image.bits(), np.uint8).reshape(height, image.bytesPerLine())
+    buffer[:, :width * 3] = img.reshape(height, width * 3)
+    return image
+
+
 def update_font(instance_self: Any,
                 font_family: str = "AvenirNext LT Pro Bold",
                 font_size: int = 15) -> None:
@@ -0,0 +1,42 @@
+"""Thread running a slow initialisation step, e.g. probing cameras, off the GUI thread"""
+import logging
+from typing import Any, Callable, Optional
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BackgroundTask(QThread):
+    """Runs a function once on its own thread and emits its result, so that the window can be
+    shown and stay responsive while it runs. The signals are delivered on the thread of the
+    receiver, e.g. the GUI thread.
+    """
+    result_ready = Signal(object)
+    failed = Signal()
+
+    def __init__(self,
+                 function: Callable[..., Any],
+                 *args: Any,
+                 parent: Optional[QObject] = None) -> None:
+        """Create the task, call `start()` to run it
+
+        :param function: the function to run
+        :param args: arguments of the function
+        :param parent: parent of the thread, defaults to None. The thread must be finished
+          before its parent is destroyed, see `wait()`.
+        """
+        super().__init__(parent)
+        self.function = function
+        self.args = args
+
+    def run(self) -> None:
+        """Run the function and emit `result_ready` with its result, or `failed` if it raised"""
+        LOGGER.info("Running %s in the background", getattr(self.function, "__name__", "task"))
+        try:
+            result = self.function(*self.args)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Background task %s failed", self.function)
+            self.failed.emit()
+            return
+        self.result_ready.emit(result)
@@ -5,29 +5,78 @@ This module uses MediaPipe (https://github.com/google/mediapipe)
 for facial landmark detection.
 """
 import logging
+import threading
 import time
-from typing import Optional
+from typing import Any, List, Optional
 
 import cv2
 from blinkdetector.api.filtered_mediapipe_api import FilteredMediaPipeAPI
-from PIL import Image
-from PIL.ImageQt import ImageQt
 from PySide6.QtCore import QObject, QThread, Signal, Slot
-from PySide6.QtGui import QPixmap
+from PySide6.QtGui import QImage
 
 from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
-from dryeye_defender.utils.utils import find_data_file
+from dryeye_defender.utils.face_roi import FaceRoiTracker
+from dryeye_defender.utils.metrics import MetricsRegistry
+from dryeye_defender.utils.utils import (
+    CaptureProfile,
+    apply_capture_profile,
+    bgr_array_to_qimage,
+    find_data_file,
+    probe_capture_profiles,
+)
+from dryeye_defender.widgets.components.frame_grabber import CAMERA_RETRY_DELAY_S, FrameGrabber
 
 LOGGER = logging.getLogger(__name__)
+# Maps id(subscriber) to (refresh rate in Hz, (width, height) to fit images in or None)
+DebugSubscribers = dict[int, tuple[float, Optional[tuple[int, int]]]]
+DEFAULT_TARGET_FPS = 30.0
+# Below this effective frame rate, blinks (100 to 400 ms long) may fall between two frames, so
+# a lack of blink can no longer be told apart from missed blinks
+MIN_TRUSTED_FPS = 5.0
+# When the configured frame rate is itself low, e.g. in a power saving mode or when the
+# adaptive scheduler backs off, the lack of blink is trusted down to this fraction of it instead
+TRUSTED_FRACTION_OF_TARGET_FPS = 0.5
+# Minimum number of seconds between two `tick_stats_updated` signals
+TICK_STATS_INTERVAL_S = 1.0
 
 
-class BlinkModelThread(QThread):
+class BlinkModelThread(QThread):  # pylint: disable=too-many-instance-attributes
     """Thread doing the inference of the model and outputting if blink is detected
     callable maximum one at a time
+
+    The thread works in one of two modes:
+    - single frame: each `start_thread()` call (e.g. from a QTimer) runs `run()` for exactly one
+      frame, which is the historical behaviour.
+    - persistent: `start_continuous()` runs a long-lived frame loop paced to `target_fps` until
+      `stop_continuous()` is called, avoiding the thread start-up cost and dropped timer ticks.
+
+    In both modes `frame_processed` is emitted once per processed frame, preceded by
+    `update_frame_stats` with the timings and outputs of that frame. It is also emitted when a
+    frame could not be processed. `blink_detected` is emitted with the timestamp of each blink
+    the model stores with blink_marker = 1, i.e. each blink counted by the stats queries.
+
+    The debug outputs (`update_debug_img` and `update_ear_values`) are only produced while a
+    debug subscriber is registered (see `add_debug_subscriber()`) or if `debug` is set. The
+    debug images are throttled to the refresh rate of the subscriber's display and scaled to the
+    size it displays them at, so the GUI thread only has to convert them to a QPixmap and draw
+    them. The model itself only draws the annotated image on the frames where one is rendered.
+
+    The model is loaded on a background thread, `model_loaded` is emitted once it is loaded with
+    whether it succeeded. Frames wait for it, and so does accessing `model_api`.
+
+    The latency of each stage of the frames, the timer ticks requested, executed and dropped by
+    `start_thread()` and the effective frame rate are recorded in `metrics`. A summary of the
+    ticks and frame rate, see `tick_stats()`, is emitted by `tick_stats_updated` at most every
+    TICK_STATS_INTERVAL_S.
     """
     update_label_output = Signal(int)
-    update_debug_img = Signal(QPixmap)
+    update_debug_img = Signal(QImage)
     update_ear_values = Signal(float, float)
+    update_frame_stats = Signal(dict)
+    blink_detected = Signal(float)
+    tick_stats_updated = Signal(dict)
+    model_loaded = Signal(bool)
+    frame_processed = Signal()
 
     def __init__(self,  # pylint: disable=too-many-arguments
                  db_api: BlinkHistoryDryEyeDefender,
@@ -35,79 +84,470 @@ class BlinkModelThread(QThread):
                  thread_finished_slot: Slot,
                  minimum_duration_lack_of_blink_ms: int,
                  parent: Optional[QObject] = None,
-                 debug: bool = False) -> None:
+                 debug: bool = False,
+                 pipelined: bool = False,
+                 roi_tracking: bool = False) -> None:
         """Initialized the model and class variables,
         these variables are saved between inference and even on different thread
 
         :param db_api: database api with connection to DB
         :param parent: parent of the thread, defaults to None
         :param minimum_duration_lack_of_blink_ms: minimum duration of lack of blink to be considered
+        :param debug: if True, always emit the annotated image and EAR values, regardless of
+          whether a debug subscriber is registered
+        :param pipelined: if True, read camera frames on a separate capture thread so that
+          camera I/O overlaps inference, see `FrameGrabber`
+        :param roi_tracking: if True, run inference on a crop around the last detected face
+          instead of the full frame, see `FaceRoiTracker`
         """
         QThread.__init__(self, parent)
 
         LOGGER.info("init thread")
 
-        self.model_api = FilteredMediaPipeAPI(
-            db_api,
-            model_path=find_data_file(
-                "mediapipe/face_landmarker_v2_with_blendshapes.task", submodule=True),
-            debug=True)
+        # The model takes seconds to load, so it is loaded in the background, see `model_api`
+        self._model_api: Optional[FilteredMediaPipeAPI] = None
+        self._model_loaded_event = threading.Event()
+        # Guards the lack of blink threshold, which is set on the model once it is loaded
+        self._model_lock = threading.Lock()
+        self._lack_of_blink_threshold = minimum_duration_lack_of_blink_ms
+        self.debug = debug
+        threading.Thread(target=self._load_model, args=(db_api,), name="ModelLoader",
+                         daemon=True).start()
 
         self.cap: Optional[cv2.VideoCapture] = None  # pylint: disable=no-member
-        self.debug = debug
-        self.finished.connect(thread_finished_slot)
+        self.input_device = 0
+        self.capture_profile: Optional[CaptureProfile] = None
+        self.frame_grabber: Optional[FrameGrabber] = None
+        self.pipelined = pipelined
+        self.roi_tracker = FaceRoiTracker() if roi_tracking else None
+        # Replaced rather than modified, so the inference thread can read it without a lock
+        self._debug_subscribers: DebugSubscribers = {}
+        self._last_debug_img_time = 0.0
+        self.continuous = False
+        self.target_fps = DEFAULT_TARGET_FPS
+        self._stop_event = threading.Event()
+        # Guards self.cap so the camera can be switched while the persistent loop is reading
+        self._cap_lock = threading.Lock()
+        self.metrics = MetricsRegistry()
+        self._grab_latency = self.metrics.histogram(
+            "frame_grab_seconds", "Time waiting for a camera frame")
+        self._inference_latency = self.metrics.histogram(
+            "frame_inference_seconds", "Time computing the model on a frame")
+        self._frame_latency = self.metrics.histogram(
+            "frame_total_seconds", "Time processing a frame, from reading it to emitting outputs")
+        self._requested_ticks = self.metrics.counter(
+            "ticks_requested_total", "Timer ticks asking for a frame to be processed")
+        self._executed_ticks = self.metrics.counter(
+            "ticks_executed_total", "Timer ticks which started processing a frame")
+        self._dropped_ticks = self.metrics.counter(
+            "ticks_dropped_total", "Timer ticks skipped because a frame was still being processed")
+        self._frame_rate = self.metrics.rate_meter(
+            "frames_per_second", "Effective number of frames processed per second")
+        self._last_tick_stats_time = 0.0
+        self.frame_processed.connect(thread_finished_slot)
+        db_api.add_blink_listener(self.blink_detected.emit)
         self.update_label_output.connect(blink_value_updated_slot)
-        self.model_api.lack_of_blink_threshold = (
-            minimum_duration_lack_of_blink_ms
-        )
+
+    def _load_model(self, db_api: BlinkHistoryDryEyeDefender) -> None:
+        """Load the model, run on a background thread by `__init__()`
+
+        :param db_api: database api the model stores the blinks in
+        """
+        time_start = time.perf_counter()
+        try:
+            model_api = FilteredMediaPipeAPI(
+                db_api,
+                model_path=find_data_file(
+                    "mediapipe/face_landmarker_v2_with_blendshapes.task", submodule=True),
+                debug=self.debug)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Failed to load the blink detection model")
+            self._model_loaded_event.set()
+            self.model_loaded.emit(False)
+            return
+        with self._model_lock:
+            model_api.lack_of_blink_threshold = self._lack_of_blink_threshold
+            self._model_api = model_api
+        self._model_loaded_event.set()
+        LOGGER.info("Loaded the blink detection model in %.2f s", time.perf_counter() - time_start)
+        self.model_loaded.emit(True)
+
+    @property
+    def model_api(self) -> FilteredMediaPipeAPI:
+        """The blink detection model, waiting for it to finish loading if needed
+
+        :raises RuntimeError: if the model failed to load
+        """
+        self._model_loaded_event.wait()
+        if self._model_api is None:
+            raise RuntimeError("The blink detection model failed to load")
+        return self._model_api
+
+    def is_model_loading(self) -> bool:
+        """Whether the model is still loading, i.e. whether `model_api` would wait"""
+        return not self._model_loaded_event.is_set()
+
+    def is_model_loaded(self) -> bool:
+        """Whether the model finished loading successfully"""
+        return self._model_api is not None
+
+    @property
+    def lack_of_blink_threshold(self) -> int:
+        """Duration in seconds without blinks after which the model reports a lack of blink,
+        available without waiting for the model to load
+        """
+        return self._lack_of_blink_threshold
+
+    @lack_of_blink_threshold.setter
+    def lack_of_blink_threshold(self, value: int) -> None:
+        """Set the threshold on the model, or once it is loaded
+
+        :param value: duration in seconds
+        """
+        with self._model_lock:
+            self._lack_of_blink_threshold = value
+            if self._model_api is not None:
+                self._model_api.lack_of_blink_threshold = value
 
     def init_cap(self, input_device: int = 0) -> None:
-        """Initialise the capture device with the selected cam
+        """Initialise the capture device with the selected cam, requesting the settings of
+        `capture_profile` if one is set
 
         :param input_device: camera to choose, defaults to 0
         """
         LOGGER.info("Selecting camera index: %s", input_device)
+        with self._cap_lock:
+            self._release_cap()
+            self.input_device = input_device
+            self.cap = cv2.VideoCapture(input_device)  # pylint: disable=no-member
+            if self.capture_profile is not None:
+                if not apply_capture_profile(self.cap, self.capture_profile):
+                    LOGGER.warning("Camera %s does not support capture profile %s",
+                                   input_device, self.capture_profile)
+            if self.pipelined:
+                self.frame_grabber = FrameGrabber(self.cap)
+                self.frame_grabber.start()
+
+    def _release_cap(self) -> None:
+        """Stop the capture thread if any and release the capture device"""
+        if self.frame_grabber is not None:
+            self.frame_grabber.stop()
+            self.frame_grabber = None
         if self.cap is not None:
             self.cap.release()
-        self.cap = cv2.VideoCapture(input_device)  # pylint: disable=no-member
+            self.cap = None
+
+    def set_capture_profile(self, profile: Optional[CaptureProfile]) -> None:
+        """Reopen the current camera with new capture settings
+
+        :param profile: settings to request, or None to use the driver's defaults
+        """
+        LOGGER.info("Setting capture profile: %s", profile)
+        self.capture_profile = profile
+        self.init_cap(self.input_device)
+
+    def probe_capture_profiles(self) -> List[str]:
+        """Find which capture profiles the current camera supports. The camera is released while
+        probing and reopened afterwards.
+
+        :return: names of the supported profiles from `CAPTURE_PROFILES`
+        """
+        with self._cap_lock:
+            self._release_cap()
+            supported_profiles = probe_capture_profiles(self.input_device)
+        self.init_cap(self.input_device)
+        return supported_profiles
+
+    def is_cap_opened(self) -> bool:
+        """Whether a capture device is currently opened"""
+        with self._cap_lock:
+            return self.cap is not None and self.cap.isOpened()
+
+    def release_cap(self) -> None:
+        """Release the capture device, e.g. before the application exits"""
+        with self._cap_lock:
+            self._release_cap()
+
+    def _read_frame(self) -> tuple[bool, Any, float]:
+        """Read the next frame, from the capture thread's buffer if pipelined or directly from
+        the capture device otherwise
+
+        :return: (success, image, unix timestamp at which the frame was captured)
+        """
+        with self._cap_lock:
+            frame_grabber = self.frame_grabber
+            if frame_grabber is None:
+                if self.cap is None:
+                    # The camera is being switched or probed
+                    return False, None, time.time()
+                ret, img = self.cap.read()
+                return ret, img, time.time()
+        # Wait outside of the lock so that switching camera is not blocked by a slow camera
+        return frame_grabber.read()
+
+    def add_debug_subscriber(self,
+                             subscriber: QObject,
+                             refresh_rate_hz: float = 60.0,
+                             target_size: Optional[tuple[int, int]] = None) -> None:
+        """Start producing debug outputs for a visible consumer, e.g. the debug window.
+        Calling it again for the same subscriber updates its settings.
+
+        :param subscriber: the consumer, used as a key for `remove_debug_subscriber()`
+        :param refresh_rate_hz: refresh rate of the display showing the debug image, debug
+          images are not rendered more often than this
+        :param target_size: (width, height) the debug images are displayed at, images are
+          scaled to fit in it keeping their aspect ratio. None keeps the camera resolution.
+        """
+        LOGGER.info("Adding debug subscriber %s at %.1f Hz and size %s",
+                    subscriber, refresh_rate_hz, target_size)
+        debug_subscribers = dict(self._debug_subscribers)
+        debug_subscribers[id(subscriber)] = (refresh_rate_hz, target_size)
+        self._debug_subscribers = debug_subscribers
+
+    def remove_debug_subscriber(self, subscriber: QObject) -> None:
+        """Stop producing debug outputs for a consumer which is no longer visible
+
+        :param subscriber: the consumer passed to `add_debug_subscriber()`
+        """
+        LOGGER.info("Removing debug subscriber %s", subscriber)
+        debug_subscribers = dict(self._debug_subscribers)
+        debug_subscribers.pop(id(subscriber), None)
+        self._debug_subscribers = debug_subscribers
+
+    def _debug_img_due(self, debug_subscribers: DebugSubscribers) -> bool:
+        """Whether a debug image should be rendered for the current frame
+
+        :param debug_subscribers: the debug subscribers when the frame started
+        """
+        refresh_rates = [refresh_rate for refresh_rate, _ in debug_subscribers.values()]
+        if not refresh_rates:
+            return self.debug
+        now = time.perf_counter()
+        if now - self._last_debug_img_time < 1 / max(refresh_rates):
+            return False
+        self._last_debug_img_time = now
+        return True
+
+    @staticmethod
+    def _fit_debug_img(img: Any, debug_subscribers: DebugSubscribers) -> Any:
+        """Scale the debug image to fit the largest size requested by the debug subscribers,
+        keeping its aspect ratio
+
+        :param img: BGR debug image
+        :param debug_subscribers: the debug subscribers when the frame started
+        :return: the scaled image, or the image itself if no size was requested
+        """
+        target_sizes = [size for _, size in debug_subscribers.values() if size]
+        if not target_sizes:
+            return img
+        target_width = max(width for width, _ in target_sizes)
+        target_height = max(height for _, height in target_sizes)
+        img_height, img_width = img.shape[:2]
+        scale = min(target_width / img_width, target_height / img_height)
+        size = (max(round(img_width * scale), 1), max(round(img_height * scale), 1))
+        if size == (img_width, img_height):
+            return img
+        # pylint: disable=no-member
+        # INTER_AREA gives the best quality when shrinking, INTER_LINEAR when enlarging
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        return cv2.resize(img, size, interpolation=interpolation)
 
     def run(self) -> None:
-        """Run the thread, compute model and signal the image and output"""
+        """Run the thread, either for a single frame or as a persistent frame loop"""
+        if self.continuous:
+            self._run_frame_loop()
+            return
+        try:
+            self._process_frame()
+        except IOError:
+            LOGGER.warning("No output from camera, skipping this frame")
+
+    def _run_frame_loop(self) -> None:
+        """Process frames continuously until `stop_continuous()` is called, sleeping between
+        frames so that we do not exceed `target_fps`
+        """
+        LOGGER.info("Starting persistent frame loop at target FPS: %.1f", self.target_fps)
+        next_frame_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            try:
+                self._process_frame()
+            except IOError:
+                LOGGER.warning("No output from camera, retrying in %s s", CAMERA_RETRY_DELAY_S)
+                self._stop_event.wait(CAMERA_RETRY_DELAY_S)
+                next_frame_time = time.perf_counter()
+                continue
+            next_frame_time += 1 / self.target_fps
+            sleep_time = next_frame_time - time.perf_counter()
+            if sleep_time > 0:
+                self._stop_event.wait(sleep_time)
+            else:
+                # We are running behind the target FPS, so do not try to catch up with a burst
+                next_frame_time = time.perf_counter()
+        LOGGER.info("Persistent frame loop stopped")
+
+    def _process_frame(self) -> None:
+        """Grab a single frame, compute model and signal the image and output. `frame_processed`
+        is emitted even if the frame could not be processed, e.g. if the camera returned no
+        frame, so that the lack of blink check still runs on every tick.
+        """
+        try:
+            self._infer_frame()
+        finally:
+            self.frame_processed.emit()
+
+    def _infer_frame(self) -> None:
+        """Grab a single frame, compute model and signal the image and output, see
+        `_process_frame()`
+        """
         time_pre_read = time.time()
-        ret, img = self.cap.read()  # type: ignore[union-attr]
+        ret, img, frame_timestamp = self._read_frame()
         if not ret:
             raise IOError("No output from camera")
 
         time_start = time.time()
-        update_dict = self.model_api.update(img, blink_timestamp_s=time_start)
+        roi = None
+        if self.roi_tracker is not None:
+            inference_img, roi = self.roi_tracker.crop(img)
+        else:
+            inference_img = img
+        debug_subscribers = self._debug_subscribers
+        debug_img_due = self._debug_img_due(debug_subscribers)
+        model_api = self.model_api
+        # The model only draws the annotated image on the frames where it is displayed
+        model_api.debug = debug_img_due
+        update_dict = model_api.update(inference_img, blink_timestamp_s=frame_timestamp)
+        if self.roi_tracker is not None:
+            if "landmarks" in update_dict:
+                # Landmarks are remapped to the full frame, EAR values are unaffected by the crop
+                update_dict["landmarks"] = self.roi_tracker.update(
+                    update_dict["landmarks"], roi, img.shape)
+            else:
+                # Without landmarks the face can not be tracked, so every frame would be
+                # processed in full anyway
+                LOGGER.warning("The blink detector does not return face landmarks, disabling "
+                               "face ROI tracking")
+                self.roi_tracker = None
         time_grab_frame = time_start - time_pre_read
         time_compute_frame = time.time() - time_start
         # A signal used to notify other services of this frame's blink value
         self.update_label_output.emit(update_dict["blink_value"])
-        if self.debug:
-            annotated_img = cv2.cvtColor(  # pylint: disable=no-member
-                update_dict["img"], cv2.COLOR_BGR2RGB)  # pylint: disable=no-member
-            annotated_img = Image.fromarray(annotated_img).convert("RGB")
-            self.update_debug_img.emit(QPixmap.fromImage(ImageQt(annotated_img)))
+        if debug_img_due:
+            # Paste the annotated crop back into the full frame so the overlay stays aligned
+            self.update_debug_img.emit(bgr_array_to_qimage(self._fit_debug_img(
+                FaceRoiTracker.remap_image(img, update_dict["img"], roi), debug_subscribers)))
+        if self.debug or debug_subscribers:
             self.update_ear_values.emit(update_dict["left_ear"], update_dict["right_ear"])
         time_taken = time.time() - time_pre_read
-        LOGGER.info("inference took: %.6f s, FPS: %.1f. frame_grab took: %.6f s, FPS: %.1f. "
-                    "overall took: %.6f s, FPS: %.1f",
-                    time_compute_frame,
-                    1 / time_compute_frame,
-                    time_grab_frame,
-                    1 / time_grab_frame,
-                    time_taken,
-                    1 / time_taken)
+        self._grab_latency.observe(time_grab_frame)
+        self._inference_latency.observe(time_compute_frame)
+        self._frame_latency.observe(time_taken)
+        self._frame_rate.mark()
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("inference took: %.6f s, frame_grab took: %.6f s, overall took: %.6f s",
+                         time_compute_frame, time_grab_frame, time_taken)
+        self.update_frame_stats.emit({
+            "timestamp": frame_timestamp,
+            "grab_s": time_grab_frame,
+            "inference_s": time_compute_frame,
+            "total_s": time_taken,
+            "blink_value": update_dict["blink_value"],
+            "left_ear": update_dict["left_ear"],
+            "right_ear": update_dict["right_ear"],
+        })
+        if time.monotonic() - self._last_tick_stats_time >= TICK_STATS_INTERVAL_S:
+            self._last_tick_stats_time = time.monotonic()
+            self.tick_stats_updated.emit(self.tick_stats())
+
+    def tick_stats(self) -> dict[str, Any]:
+        """Get the number of timer ticks and the effective frame rate
+
+        :return: dict of the number of timer ticks "requested", "executed" and "skipped" since
+          the thread was created, always 0 for the persistent frame loop which does not use
+          ticks, and the effective frames per second "fps" over each sliding window, keyed by
+          e.g. "10s"
+        """
+        return {
+            "requested": self._requested_ticks.value,
+            "executed": self._executed_ticks.value,
+            "skipped": self._dropped_ticks.value,
+            "fps": self._frame_rate.snapshot()["rates"],
+        }
+
+    def reset_frame_rate(self) -> None:
+        """Forget the frames processed so far, to be called before (re)starting inference so
+        that the time it was stopped is not counted as a low frame rate
+        """
+        self._frame_rate.reset()
+
+    def effective_fps(self, window_s: float) -> float:
+        """Get the number of frames processed per second
+
+        :param window_s: length of the sliding window in seconds
+        :return: frames per second over the last `window_s` seconds, or since inference started
+          if more recent
+        """
+        return self._frame_rate.rate(window_s)
+
+    def min_trusted_fps(self) -> float:
+        """Get the effective frame rate below which a lack of blink is not trusted
+
+        :return: `MIN_TRUSTED_FPS`, or a fraction of `target_fps` if the frame rate configured
+          is too low to ever reach it
+        """
+        return min(MIN_TRUSTED_FPS, self.target_fps * TRUSTED_FRACTION_OF_TARGET_FPS)
+
+    def is_rate_trustworthy(self, window_s: float, min_fps: Optional[float] = None) -> bool:
+        """Whether enough frames were processed over a period to trust that no blink happened
+        during it
+
+        :param window_s: length of the period in seconds, e.g. the lack of blink threshold
+        :param min_fps: minimum effective frame rate to trust, defaults to `min_trusted_fps()`
+        :return: False if the effective frame rate over the period is below `min_fps`, True
+          otherwise, including when fewer than two frames were processed so far
+        """
+        if self._frame_rate.count < 2:
+            return True
+        if min_fps is None:
+            min_fps = self.min_trusted_fps()
+        return self._frame_rate.rate(window_s) >= min_fps
+
+    def start_continuous(self, target_fps: Optional[float] = None) -> None:
+        """Start the persistent frame loop, which runs until `stop_continuous()` is called
+
+        :param target_fps: maximum number of frames per second to process, defaults to the
+          current `target_fps`
+        """
+        if target_fps is not None:
+            self.target_fps = target_fps
+        if self.continuous and self.isRunning():
+            return
+        # Let any in-flight single frame finish before switching mode
+        self.wait()
+        self.reset_frame_rate()
+        self._stop_event.clear()
+        self.continuous = True
+        self.start()
+
+    @Slot()
+    def stop_continuous(self) -> None:
+        """Stop the persistent frame loop and wait for the current frame to finish"""
+        if not self.continuous:
+            return
+        self._stop_event.set()
+        self.wait()
+        self.continuous = False
 
     @Slot()
     def start_thread(self) -> None:
         """Slot that call the thread for inference"""
+        self._requested_ticks.inc()
         # The following line ensures we only have one thread processing a frame at a time
         if not self.isRunning():
             LOGGER.debug("starting thread for computing one frame")
+            self._executed_ticks.inc()
             self.start()
         else:
+            self._dropped_ticks.inc()
             LOGGER.debug(
                 "inference thread already running so skipping computing this frame"
             )
@@ -0,0 +1,87 @@
+"""Capture stage of the inference pipeline, reading camera frames on a background thread
+
+The inference thread takes the newest frame from a bounded ring buffer rather than blocking on
+`cv2.VideoCapture.read()`, so camera I/O and landmark inference overlap.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Optional, Tuple
+
+import cv2
+
+LOGGER = logging.getLogger(__name__)
+# How long `read()` waits for a new frame before reporting that the camera returned nothing
+DEFAULT_READ_TIMEOUT_S = 1.0
+# How long the capture loop backs off after the camera fails to return a frame
+CAMERA_RETRY_DELAY_S = 0.5
+
+
+class FrameGrabber:
+    """Continuously reads frames from a capture device on a background thread, keeping only the
+    newest frames in a bounded ring buffer
+    """
+
+    def __init__(self, cap: cv2.VideoCapture,  # pylint: disable=no-member
+                 buffer_size: int = 1) -> None:
+        """Create the capture stage, call `start()` to begin reading frames
+
+        :param cap: an opened capture device, it is only read from the capture thread
+        :param buffer_size: number of frames kept in the ring buffer, older frames are dropped
+        """
+        self.cap = cap
+        # Each entry is (frame index, capture unix timestamp, image)
+        self._frames: Deque[Tuple[int, float, Any]] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._frame_index = 0
+        self._last_read_index = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start reading frames on the capture thread"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameGrabber",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the capture thread and wait for it to exit"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _capture_loop(self) -> None:
+        """Read frames as fast as the camera provides them, overwriting the oldest frame"""
+        LOGGER.info("Starting frame grabber")
+        while not self._stop_event.is_set():
+            ret, img = self.cap.read()
+            if not ret:
+                LOGGER.warning("No output from camera, retrying in %s s", CAMERA_RETRY_DELAY_S)
+                self._stop_event.wait(CAMERA_RETRY_DELAY_S)
+                continue
+            with self._condition:
+                self._frame_index += 1
+                self._frames.append((self._frame_index, time.time(), img))
+                self._condition.notify_all()
+        LOGGER.info("Frame grabber stopped")
+
+    def _has_new_frame(self) -> bool:
+        """Whether a frame newer than the last one returned by `read()` is buffered"""
+        return bool(self._frames) and self._frames[-1][0] > self._last_read_index
+
+    def read(self, timeout: float = DEFAULT_READ_TIMEOUT_S) -> Tuple[bool, Any, float]:
+        """Return the newest frame that has not been returned yet, waiting if necessary
+
+        :param timeout: maximum number of seconds to wait for a new frame
+        :return: (success, image, unix timestamp at which the frame was captured), mirroring
+          `cv2.VideoCapture.read()` with the capture timestamp appended
+        """
+        with self._condition:
+            if not self._condition.wait_for(self._has_new_frame, timeout):
+                return False, None, 0.0
+            frame_index, timestamp, img = self._frames[-1]
+            self._last_read_index = frame_index
+        return True, img, timestamp
@@ -0,0 +1,15 @@
+"""A dropdown whose items can be computed lazily when it is opened"""
+from PySide6.QtCore import Signal
+from PySide6.QtWidgets import QComboBox
+
+
+class PopupComboBox(QComboBox):
+    """A QComboBox signalling when its list is about to be shown, so that its items can be
+    computed lazily"""
+
+    popup_about_to_show = Signal()
+
+    def showPopup(self) -> None:  # pylint: disable=invalid-name
+        """Emit `popup_about_to_show` then show the list"""
+        self.popup_about_to_show.emit()
+        super().showPopup()
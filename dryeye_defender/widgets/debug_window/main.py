@@ -1,8 +1,8 @@
 """Class for debug window"""
 import logging
 
-from PySide6.QtCore import Qt, Slot
-from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, QTimer, Slot
+from PySide6.QtGui import QCloseEvent, QHideEvent, QImage, QPixmap, QShowEvent
 from PySide6.QtWidgets import QLabel, QVBoxLayout, QWidget
 
 from dryeye_defender.widgets.debug_window.ear_graph import EarGraph
@@ -11,6 +11,7 @@ from dryeye_defender.widgets.components.blink_model_thread import BlinkModelThre
 LOGGER = logging.getLogger(__name__)
 MAX_CAMERA_VIEW_WIDTH = 600
 MAX_CAMERA_VIEW_HEIGHT = 800
+METRICS_REFRESH_INTERVAL_MS = 1000
 
 
 class DebugWindow(QWidget):
@@ -28,34 +29,80 @@ class DebugWindow(QWidget):
         LOGGER.info("init debug window")
         self.setGeometry(0, 0, 800, 1000)
 
+        self.blink_thread = thread
         thread.update_debug_img.connect(self._update_img)
         # Create a label for the display camera
         self.label = QLabel()
         self.label.setFixedSize(MAX_CAMERA_VIEW_HEIGHT, MAX_CAMERA_VIEW_WIDTH)
-        self.label.setScaledContents(True)
+        # Images arrive already scaled to the label's size by the thread
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.chart_view = EarGraph(thread=thread)
+        # Latency percentiles and counters of the pipeline, refreshed while the window is visible
+        self.metrics_label = QLabel()
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_REFRESH_INTERVAL_MS)
+        self.metrics_timer.timeout.connect(self._update_metrics)
 
         debug_layout.addWidget(self.chart_view)
         debug_layout.addWidget(self.label)
+        debug_layout.addWidget(self.metrics_label)
         self.setLayout(debug_layout)
 
-    @Slot(QPixmap)
-    def _update_img(self, image: QPixmap) -> None:
+    def showEvent(self, event: QShowEvent) -> None:  # pylint: disable=invalid-name
+        """Ask the thread to produce debug outputs while this window is visible
+
+        :param event: the show event
+        """
+        super().showEvent(event)
+        self.blink_thread.add_debug_subscriber(
+            self,
+            self.screen().refreshRate(),
+            (self.label.width(), self.label.height()),
+        )
+        self._update_metrics()
+        self.metrics_timer.start()
+
+    def hideEvent(self, event: QHideEvent) -> None:  # pylint: disable=invalid-name
+        """Stop the thread producing debug outputs once this window is hidden or closed
+
+        :param event: the hide event
+        """
+        self.blink_thread.remove_debug_subscriber(self)
+        self.metrics_timer.stop()
+        super().hideEvent(event)
+
+    def closeEvent(self, event: QCloseEvent) -> None:  # pylint: disable=invalid-name
+        """Stop the thread producing debug outputs once this window is closed, also done by
+        `hideEvent()` but closing as the application quits may not hide the window first
+
+        :param event: the close event
+        """
+        self.blink_thread.remove_debug_subscriber(self)
+        self.metrics_timer.stop()
+        super().closeEvent(event)
+
+    @Slot(QImage)
+    def _update_img(self, image: QImage) -> None:
         """Slot for updating the image on the window, called by the thread when finished
 
-        :param image: QPixMap of the current debug output
+        :param image: the current debug output, already scaled to fit the label. It is converted
+          to a QPixmap here as pixmaps can only be created on the GUI thread.
         """
-        ar_image = image.width() / image.height()
-        ar_label = MAX_CAMERA_VIEW_WIDTH / MAX_CAMERA_VIEW_HEIGHT
-
-        # If image aspect ratio is wider than label aspect ratio
-        # then scale by width, else by height
-        if ar_image > ar_label:
-            image = image.scaledToWidth(
-                MAX_CAMERA_VIEW_WIDTH, Qt.TransformationMode.SmoothTransformation
-            )
-        else:
-            image = image.scaledToHeight(
-                MAX_CAMERA_VIEW_HEIGHT, Qt.TransformationMode.SmoothTransformation
-            )
-        self.label.setPixmap(image)
+        self.label.setPixmap(QPixmap.fromImage(image))
+
+    @Slot()
+    def _update_metrics(self) -> None:
+        """Show the current latency percentiles, rates and counters of the thread's metrics"""
+        lines = []
+        for name, snapshot in self.blink_thread.metrics.snapshot().items():
+            if "percentiles" in snapshot:
+                percentiles = ", ".join(f"{percentile} {value * 1000:.1f} ms"
+                                        for percentile, value in snapshot["percentiles"].items())
+                lines.append(f"{name}: {percentiles or 'no samples'} ({snapshot['count']} total)")
+            elif "rates" in snapshot:
+                rates = ", ".join(f"{window} {rate:.1f}"
+                                  for window, rate in snapshot["rates"].items())
+                lines.append(f"{name}: {rates}")
+            else:
+                lines.append(f"{name}: {snapshot['value']}")
+        self.metrics_label.setText("\n".join(lines))
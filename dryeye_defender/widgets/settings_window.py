@@ -3,13 +3,16 @@
 from collections import OrderedDict
 import logging
 import os
+import threading
 import time
 from functools import partial
+from pathlib import Path
 from typing import List, Optional, Any, TypedDict, Union
 from playsound import playsound
 
-from PySide6.QtCore import QTimer, Slot, Qt
+from PySide6.QtCore import QTimer, Signal, Slot, Qt
 from PySide6.QtWidgets import (
+    QApplication,
     QComboBox,
     QGridLayout,
     QGroupBox,
@@ -26,18 +29,31 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QPainter, QColor, QPen, QFont, QPalette, QPixmap
 
 from blinkdetector.utils.database import EventTypes
+from dryeye_defender.utils.adaptive_scheduler import (
+    AdaptiveInferenceScheduler,
+    DEFAULT_CPU_BUDGET_PERCENT,
+)
 from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
 from dryeye_defender.utils.config import GREY
-from dryeye_defender.utils.utils import find_data_file, get_cap_indexes
+from dryeye_defender.utils.metrics import DEFAULT_EXPORT_INTERVAL_S, MetricsFileExporter
+from dryeye_defender.utils.utils import (
+    CAPTURE_PROFILES,
+    DEFAULT_CAPTURE_PROFILE_NAME,
+    env_flag,
+    find_data_file,
+    get_cap_indexes,
+)
 from dryeye_defender.utils.utils import get_saved_data_path
 from dryeye_defender.widgets.animated_blink_popup_window.animated_blink_reminder import (
     AnimatedBlinkReminder,
 )
+from dryeye_defender.widgets.components.background_task import BackgroundTask
 from dryeye_defender.widgets.components.blink_model_thread import BlinkModelThread
 from dryeye_defender.widgets.stats_window.main import BlinkStatsWindow
 from dryeye_defender.widgets.components.notification_dropdown import (
     NotificationDropdown,
 )
+from dryeye_defender.widgets.components.popup_combo_box import PopupComboBox
 from dryeye_defender.widgets.debug_window.main import DebugWindow
 from dryeye_defender.widgets.components.tray_icon import TrayIcon
 from dryeye_defender.widgets.components.animated_toggle import AnimatedToggle
@@ -54,18 +70,54 @@ BLINK_ANIME_GIF_PATH = find_data_file("blink_animated_anime.gif")
 LOGO_PNG_PATH = find_data_file("Logo.png")
 MINIMUM_DURATION_LACK_OF_BLINK_MS = 10  # minimum duration for considering lack of blink
 DEFAULT_INFERENCE_INTERVAL_MS = 10
+# If set, run inference in a persistent frame loop paced by the performance mode instead of
+# restarting the inference thread on every timer tick
+PERSISTENT_WORKER = env_flag("PERSISTENT_WORKER")
+# If set, read camera frames on a dedicated capture thread so camera I/O overlaps inference
+PIPELINED_CAPTURE = env_flag("PIPELINED_CAPTURE")
+# If set, run inference on a crop around the last detected face instead of the full frame
+FACE_ROI_TRACKING = env_flag("FACE_ROI_TRACKING")
+# Maximum percentage of one CPU core the "Adaptive" performance mode may spend on inference
+ADAPTIVE_CPU_BUDGET_PERCENT = float(
+    os.environ.get("ADAPTIVE_CPU_BUDGET_PERCENT", DEFAULT_CPU_BUDGET_PERCENT)
+)
+# If set, the pipeline metrics are written to this file periodically, as JSON if it ends in .json
+# and in the Prometheus text format otherwise
+METRICS_FILE = os.environ.get("METRICS_FILE")
+METRICS_EXPORT_INTERVAL_S = float(
+    os.environ.get("METRICS_EXPORT_INTERVAL_S", DEFAULT_EXPORT_INTERVAL_S)
+)
 LOGGER = logging.getLogger(__name__)
 
 # if user dismisses a popup, allow this many seconds before permitting another popup
 ALERT_SECONDS_COOLDOWN = 10
+# A lack of blink that is not trusted because of a low frame rate is still reminded of once no
+# blink was detected for this many lack of blink thresholds, so that machines too slow to reach
+# the trusted frame rate still get reminders
+UNTRUSTED_LACK_OF_BLINK_FACTOR = 2
 MARGIN_PX = 70
+# Maximum time the shutdown waits for the frame being processed to finish and store its row,
+# e.g. if the model is still loading
+SHUTDOWN_FRAME_TIMEOUT_MS = 5000
+
+# Description of each startup step done in the background, shown while it is pending
+STARTUP_STEPS = OrderedDict(
+    [
+        ("model", "Loading the blink detection model..."),
+        ("camera", "Opening the camera..."),
+        ("cameras", "Looking for cameras..."),
+    ]
+)
+
 
-# https://stackoverflow.com/a/72368992/24131637 sadly this mad line of code is
-# required for windows to play sound correctly
-try:
-    playsound(BEEP_SOUND_EFFECT_PATH)
-except Exception:
-    pass
+def _warm_up_sound() -> None:
+    """Play the sound once, run on a background thread at startup as it blocks while playing"""
+    # https://stackoverflow.com/a/72368992/24131637 sadly this mad line of code is
+    # required for windows to play sound correctly
+    try:
+        playsound(BEEP_SOUND_EFFECT_PATH)
+    except Exception:  # pylint: disable=broad-except
+        pass
 
 
 class SettingType(TypedDict):
@@ -144,8 +196,12 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
             ("Normal", DEFAULT_INFERENCE_INTERVAL_MS),
             ("Power Saving", DEFAULT_INFERENCE_INTERVAL_MS * 5),
             ("Ultra Power Saving", DEFAULT_INFERENCE_INTERVAL_MS * 10),
+            # Starting interval only, then chosen per frame by AdaptiveInferenceScheduler
+            ("Adaptive", DEFAULT_INFERENCE_INTERVAL_MS),
         ]
     )
+    # Emitted with the timestamp of each blink reminder (popup or tray notification)
+    blink_reminder_shown = Signal(float)
 
     def __init__(self, parent: Optional[QWidget] = None) -> None:
         """Initialize all variable and create the layout of the window
@@ -165,22 +221,60 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
             self.thread_finished_slot,
             MINIMUM_DURATION_LACK_OF_BLINK_MS,
             self,
-            True,
+            False,
+            PIPELINED_CAPTURE,
+            FACE_ROI_TRACKING,
         )
         self.db_api.store_event(time.time(), EventTypes.SOFTWARE_STARTUP)
 
+        self.persistent_worker = PERSISTENT_WORKER
+        self.blink_thread.target_fps = 1000 / DEFAULT_INFERENCE_INTERVAL_MS
         self.timer = QTimer(self)
         self.timer.setInterval(DEFAULT_INFERENCE_INTERVAL_MS)
         # QTimer produced timeout signal at constant intervals
         self.timer.timeout.connect(self.blink_thread.start_thread)
 
+        self.adaptive_inference = False
+        self.adaptive_scheduler = AdaptiveInferenceScheduler(
+            cpu_budget_percent=ADAPTIVE_CPU_BUDGET_PERCENT
+        )
+        self.last_blink_time = time.time()
+        self.blink_thread.update_frame_stats.connect(self._frame_stats_updated_slot)
+        self.last_end_of_alert_time = self.last_suppressed_alert_time = (
+            time.time() - ALERT_SECONDS_COOLDOWN
+        )
+        self._suppressed_alerts = self.blink_thread.metrics.counter(
+            "alerts_suppressed_total",
+            "Lack of blink reminders held back because the effective frame rate was too low",
+        )
+        self.metrics_exporter = self._start_metrics_exporter()
+
         self.tray_available = (
             QSystemTrayIcon.isSystemTrayAvailable()
             and QSystemTrayIcon.supportsMessages()
         )
         if self.tray_available:
             self.tray = TrayIcon(BLINK_ICON_PATH)
-        self.blink_reminder = self._create_blink_reminder()
+        self.blink_reminder_gifs = {
+            "Default": BLINK_GIF_PATH,
+            "Anime": BLINK_ANIME_GIF_PATH,
+        }
+        # Created on first use, see `blink_reminder`
+        self._blink_reminder: Optional[AnimatedBlinkReminder] = None
+        # Created on first use and reused, so that the live signals are only connected once
+        self.blink_stats_window: Optional[BlinkStatsWindow] = None
+        # Reused as well, so that a replaced window can not keep the thread rendering debug images
+        self.debug_window: Optional[DebugWindow] = None
+        # Slow initialisation steps run in the background once the window is shown
+        self._background_tasks: List[BackgroundTask] = []
+        # Capture profiles supported by each camera index, probed at most once per camera
+        self._supported_capture_profiles: dict[int, List[str]] = {}
+        # Camera index whose supported profiles are listed in the dropdown, if any
+        self._listed_capture_profiles_index: Optional[int] = None
+        # Camera index whose supported profiles are being probed in the background, if any
+        self._probing_capture_profiles_index: Optional[int] = None
+        self._model_load_failed = False
+        threading.Thread(target=_warm_up_sound, name="SoundWarmUp", daemon=True).start()
 
         image_label = QLabel()
         pixmap = QPixmap(LOGO_PNG_PATH)
@@ -190,6 +284,11 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         image_label.setPixmap(scaled_pixmap)
         window_layout.addWidget(image_label)
 
+        # Progress of the startup steps still running in the background
+        self._pending_startup_steps = list(STARTUP_STEPS)
+        self.startup_status_label = QLabel()
+        window_layout.addWidget(self.startup_status_label)
+
         # Create Settings
         settings_layout = QGridLayout()
         offset_label = QLabel("                ")
@@ -197,27 +296,91 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         settings_layout.addWidget(self._create_settings_grid())
         window_layout.addLayout(settings_layout)
 
+        self.blink_thread.model_loaded.connect(self._model_loaded_slot)
+        # The model may have finished loading before the signal was connected
+        if not self.blink_thread.is_model_loading():
+            self._model_loaded_slot(self.blink_thread.is_model_loaded())
+        self._update_startup_status()
+        self._open_default_camera()
+
+    def _start_metrics_exporter(self) -> Optional[MetricsFileExporter]:
+        """Start writing the metrics to METRICS_FILE periodically, if it is set
+
+        :return: the started exporter, None if METRICS_FILE is not set
+        """
+        if not METRICS_FILE:
+            return None
+        metrics_exporter = MetricsFileExporter(
+            self.blink_thread.metrics, Path(METRICS_FILE), METRICS_EXPORT_INTERVAL_S
+        )
+        metrics_exporter.start()
+        return metrics_exporter
+
+    def _update_startup_status(self) -> None:
+        """Show the startup steps still running in the background, hide the label once none
+        is left"""
+        self.startup_status_label.setText(
+            "\n".join(STARTUP_STEPS[step] for step in self._pending_startup_steps)
+        )
+        self.startup_status_label.setVisible(bool(self._pending_startup_steps))
+
+    def _startup_step_done(self, step: str) -> None:
+        """Mark a startup step as done
+
+        :param step: key of the step in STARTUP_STEPS
+        """
+        if step in self._pending_startup_steps:
+            self._pending_startup_steps.remove(step)
+            LOGGER.info("Startup step done: %s", step)
+        self._update_startup_status()
+
+    @Slot()
+    def _model_loaded_slot(self, success: bool) -> None:
+        """Slot called once the blink detection model finished loading in the background
+
+        :param success: whether the model could be loaded
+        """
+        self._startup_step_done("model")
+        if not success:
+            self._model_load_failed = True
+            self.toggle_button.setEnabled(False)
+            QMessageBox.critical(
+                self, "Error", "The blink detection model could not be loaded"
+            )
+
+    def _run_in_background(self, task: BackgroundTask, result_slot: Any) -> None:
+        """Start a task, keeping a reference to it until it finishes
+
+        :param task: the task, not started yet
+        :param result_slot: slot called with the result of the task
+        """
+        task.result_ready.connect(result_slot)
+        task.finished.connect(lambda: self._background_tasks.remove(task))
+        self._background_tasks.append(task)
+        task.start()
+
+    @property
+    def blink_reminder(self) -> AnimatedBlinkReminder:
+        """The blink reminder popup, created on first use as loading its animation is slow"""
+        if self._blink_reminder is None:
+            self._blink_reminder = self._create_blink_reminder()
+        return self._blink_reminder
+
     def _create_blink_reminder(self) -> AnimatedBlinkReminder:
         """Initialize blink reminder for later usage
 
         :return: return the AnimatedBlinkReminder object
         """
-        self.blink_reminder_gifs = {
-            "Default": BLINK_GIF_PATH,
-            "Anime": BLINK_ANIME_GIF_PATH,
-        }
         event_type = "POPUP_NOTIFICATION"
         reset_alert_time_partial = partial(
             self._reset_last_end_of_alert_time, event_type
         )
-        blink_reminder = AnimatedBlinkReminder(
-            movie_path=self.blink_reminder_gifs["Default"],
+        return AnimatedBlinkReminder(
+            movie_path=self.blink_reminder_gifs[self.select_blink_reminder_gif.currentText()],
             dismiss_callback=reset_alert_time_partial,
-            duration_lack=self.blink_thread.model_api.lack_of_blink_threshold,
+            duration_lack=self.blink_thread.lack_of_blink_threshold,
             alert_seconds_cooldown=ALERT_SECONDS_COOLDOWN,
         )
-        self.last_end_of_alert_time = time.time() - ALERT_SECONDS_COOLDOWN
-        return blink_reminder
 
     def _reset_last_end_of_alert_time(self, event_type: EventTypes) -> None:
         """Reset the last time the alert (POPUP or SYSTEM NOTIFICATION) ended
@@ -229,6 +392,7 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         """
         time_since_last_alert = time.time() - self.last_end_of_alert_time
         self.db_api.store_event(time.time(), event_type, time_since_last_alert)
+        self.blink_reminder_shown.emit(time.time())
         self.last_end_of_alert_time = time.time()
 
     def _create_toggle_settings(self) -> SettingType:
@@ -267,7 +431,7 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         self.duration_lack_spin_box = QSpinBox()
         self.duration_lack_spin_box.setRange(1, 60)
         self.duration_lack_spin_box.setValue(
-            self.blink_thread.model_api.lack_of_blink_threshold
+            self.blink_thread.lack_of_blink_threshold
         )
         self.duration_lack_spin_box.valueChanged.connect(self._update_duration_lack)
         settings["interactive_element"] = self.duration_lack_spin_box
@@ -291,38 +455,179 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         )
         self.select_blink_reminder_gif = QComboBox()
         self.select_blink_reminder_gif.addItems(list(self.blink_reminder_gifs.keys()))
-        self.select_blink_reminder_gif.activated.connect(
-            lambda: self.blink_reminder.setup_movie(
-                self.blink_reminder_gifs[self.select_blink_reminder_gif.currentText()]
-            )
-        )
+        self.select_blink_reminder_gif.activated.connect(self._select_blink_reminder_gif)
         settings["interactive_element"] = self.select_blink_reminder_gif
         return settings
 
+    @Slot()
+    def _select_blink_reminder_gif(self) -> None:
+        """Slot called when a blink reminder animation is selected in the dropdown, the
+        reminder uses it when it is created if it was not yet"""
+        if self._blink_reminder is not None:
+            self._blink_reminder.setup_movie(
+                self.blink_reminder_gifs[self.select_blink_reminder_gif.currentText()]
+            )
+
     def _create_select_cam_settings(self) -> SettingType:
         """Create select cam and label cam"""
         settings = make_vboxlayout("Camera", "Select which camera device to use")
 
         self.select_cam = QComboBox()
-        cap_indexes = get_cap_indexes()
+        # The camera at the default position is opened in the background once the window is
+        # shown, see `_open_default_camera()`, detection can't be enabled until then
+        default_cap_index = int(os.environ.get("DEFAULT_CAMERA_INDEX", 0))
+        # The profiles the camera supports are only probed when the profile dropdown is opened
+        self.blink_thread.capture_profile = CAPTURE_PROFILES[DEFAULT_CAPTURE_PROFILE_NAME]
+        self.toggle_button.setEnabled(False)
+        self.select_cam.addItem(str(default_cap_index))
+        self.select_cam.setEnabled(False)
+        # default to first camera index detected if DEFAULT_CAMERA_INDEX env var not specified
+        self.select_cam.activated.connect(self._select_camera)
+        settings["interactive_element"] = self.select_cam
+        return settings
+
+    def _open_default_camera(self) -> None:
+        """Open the camera at the default position in the background so that detection can
+        start before the other cameras are probed, see `_default_camera_opened()`. It is
+        replaced in `_cameras_enumerated()` if the default camera is another one.
+        """
+        task = BackgroundTask(
+            self.blink_thread.init_cap, int(self.select_cam.currentText()), parent=self
+        )
+        task.failed.connect(self._default_camera_opened)
+        self._run_in_background(task, self._default_camera_opened)
+
+    @Slot()
+    def _default_camera_opened(self, _result: Any = None) -> None:
+        """Slot called once the default camera was opened, or failed to, enables detection if
+        it could be opened then probes the other cameras. The cameras are only probed now as
+        probing the default one while it is being opened would fail.
+
+        :param _result: result of `BlinkModelThread.init_cap()`, unused
+        """
+        self._startup_step_done("camera")
+        self.toggle_button.setEnabled(
+            self.blink_thread.is_cap_opened() and not self._model_load_failed
+        )
+        self._enumerate_cameras()
+
+    def _enumerate_cameras(self) -> None:
+        """Probe the available cameras in the background, see `_cameras_enumerated()`"""
+        known_working = []
+        if self.blink_thread.is_cap_opened():
+            known_working.append(self.blink_thread.input_device)
+        self._run_in_background(
+            BackgroundTask(get_cap_indexes, known_working, parent=self),
+            self._cameras_enumerated,
+        )
+
+    @Slot()
+    def _cameras_enumerated(self, cap_indexes: List[str]) -> None:
+        """Slot called with the available cameras once they are probed, lists them and opens
+        the default one
+
+        :param cap_indexes: indexes of the available cameras
+        """
+        self._startup_step_done("cameras")
         if not cap_indexes:
             LOGGER.error("No cameras could be found")
             self.toggle_button.setEnabled(False)
-            cap_indexes = self._alert_no_cam()
+            self._alert_no_cam()
+            return
         # reset blink detection enabled button to enabled because the camera is detected
-        self.toggle_button.setEnabled(True)
-        self.select_cam.addItems(cap_indexes)
+        self.toggle_button.setEnabled(not self._model_load_failed)
+        self.select_cam.clear()
+        self.select_cam.addItems([str(cap_index) for cap_index in cap_indexes])
+        self.select_cam.setEnabled(True)
         selected_cap_index = int(
             cap_indexes[int(os.environ.get("DEFAULT_CAMERA_INDEX", 0))]
         )
-        self.blink_thread.init_cap(selected_cap_index)
-        # default to first camera index detected if DEFAULT_CAMERA_INDEX env var not specified
-        self.select_cam.activated.connect(
-            lambda: self.blink_thread.init_cap(int(self.select_cam.currentText()))
+        self.select_cam.setCurrentText(str(selected_cap_index))
+        if (selected_cap_index != self.blink_thread.input_device
+                or not self.blink_thread.is_cap_opened()):
+            self.blink_thread.init_cap(selected_cap_index)
+
+    @Slot()
+    def _select_camera(self) -> None:
+        """Slot called when a camera is selected in the dropdown, opens the camera. The capture
+        profiles it supports are listed the next time the profile dropdown is opened.
+        """
+        self.blink_thread.init_cap(int(self.select_cam.currentText()))
+
+    def _create_select_capture_profile_settings(self) -> SettingType:
+        """Create select capture profile (resolution, frame rate and format of the camera)"""
+        settings = make_vboxlayout(
+            "Camera Resolution",
+            "Lower resolutions use less CPU for blink detection",
         )
-        settings["interactive_element"] = self.select_cam
+        # Probing the profiles opens the camera with each of them, which is slow, so only the
+        # default profile is listed until the dropdown is opened
+        self.select_capture_profile = PopupComboBox()
+        self.select_capture_profile.addItem(DEFAULT_CAPTURE_PROFILE_NAME)
+        self.select_capture_profile.activated.connect(self._set_capture_profile)
+        self.select_capture_profile.popup_about_to_show.connect(self._update_capture_profiles)
+        settings["interactive_element"] = self.select_capture_profile
         return settings
 
+    def _update_capture_profiles(self) -> None:
+        """Repopulate the capture profile dropdown with the profiles supported by the current
+        camera. The profiles are only probed the first time for each camera, which opens it with
+        each profile, so it is done in the background, see `_capture_profiles_probed()`.
+        """
+        cap_index = self.blink_thread.input_device
+        if cap_index == self._listed_capture_profiles_index:
+            return
+        if cap_index in self._supported_capture_profiles:
+            self._list_capture_profiles(cap_index)
+            return
+        if self._probing_capture_profiles_index is not None:
+            return
+        self._probing_capture_profiles_index = cap_index
+        QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        task = BackgroundTask(self.blink_thread.probe_capture_profiles, parent=self)
+        task.failed.connect(self._capture_profiles_probed)
+        self._run_in_background(task, self._capture_profiles_probed)
+
+    @Slot()
+    def _capture_profiles_probed(self, supported_profiles: Optional[List[str]] = None) -> None:
+        """Slot called once the capture profiles of a camera are probed, or failed to be, lists
+        them if it is still the current camera. Failed probes are retried on the next opening.
+
+        :param supported_profiles: names of the supported profiles, None if probing failed
+        """
+        cap_index = self._probing_capture_profiles_index
+        self._probing_capture_profiles_index = None
+        QApplication.restoreOverrideCursor()
+        if cap_index is None or supported_profiles is None:
+            return
+        self._supported_capture_profiles[cap_index] = supported_profiles
+        if cap_index == self.blink_thread.input_device:
+            self._list_capture_profiles(cap_index)
+
+    def _list_capture_profiles(self, cap_index: int) -> None:
+        """List the probed profiles of a camera in the dropdown, keeping the current selection if
+        it is still supported
+
+        :param cap_index: index of the camera, its profiles must have been probed
+        """
+        supported_profiles = self._supported_capture_profiles[cap_index]
+        self._listed_capture_profiles_index = cap_index
+        current_profile = self.select_capture_profile.currentText() or DEFAULT_CAPTURE_PROFILE_NAME
+        self.select_capture_profile.clear()
+        self.select_capture_profile.addItems(supported_profiles)
+        if current_profile not in supported_profiles:
+            current_profile = DEFAULT_CAPTURE_PROFILE_NAME
+        self.select_capture_profile.setCurrentText(current_profile)
+        if self.blink_thread.capture_profile != CAPTURE_PROFILES[current_profile]:
+            self.blink_thread.set_capture_profile(CAPTURE_PROFILES[current_profile])
+
+    @Slot()
+    def _set_capture_profile(self) -> None:
+        """Slot called when a capture profile is selected in the dropdown"""
+        self.blink_thread.set_capture_profile(
+            CAPTURE_PROFILES[self.select_capture_profile.currentText()]
+        )
+
     def _create_toggle_sound_notification(self) -> SettingType:
         """Create toggle widget for enable/disable sound notification"""
         settings = make_vboxlayout(
@@ -362,6 +667,9 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
             self._set_timer_interval(list(Window.PERFORMANCE_DROPDOWNS.values())[index])
         if list(Window.PERFORMANCE_DROPDOWNS.keys())[index] == "Ultra Power Saving":
             self._set_timer_interval(list(Window.PERFORMANCE_DROPDOWNS.values())[index])
+        self.adaptive_inference = list(Window.PERFORMANCE_DROPDOWNS.keys())[index] == "Adaptive"
+        if self.adaptive_inference:
+            self._set_timer_interval(list(Window.PERFORMANCE_DROPDOWNS.values())[index])
 
     def _create_performance_setting(self) -> SettingType:
         """Choose how performance the software should run (how often we run inference)"""
@@ -417,17 +725,21 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         settings = self._create_select_cam_settings()
         self._add_widget_to_grid(grid, settings, 5)
 
+    def _create_select_capture_profile_row(self, grid: QGridLayout) -> None:
+        settings = self._create_select_capture_profile_settings()
+        self._add_widget_to_grid(grid, settings, 6)
+
     def _create_toggle_sound_notification_row(self, grid: QGridLayout) -> None:
         settings = self._create_toggle_sound_notification()
-        self._add_widget_to_grid(grid, settings, 6)
+        self._add_widget_to_grid(grid, settings, 7)
 
     def _create_see_blink_statistics_row(self, grid: QGridLayout) -> None:
         settings = self._create_see_blink_statistics_setting()
-        self._add_widget_to_grid(grid, settings, 7)
+        self._add_widget_to_grid(grid, settings, 8)
 
     def _create_set_performance_level_row(self, grid: QGridLayout) -> None:
         settings = self._create_performance_setting()
-        self._add_widget_to_grid(grid, settings, 8)
+        self._add_widget_to_grid(grid, settings, 9)
 
     def _create_settings_grid(self) -> QGroupBox:
         """Initialize all variable/object for the settings part of the program"""
@@ -443,6 +755,7 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         self._create_notification_dropdown_row(grid)
         self._create_select_blink_reminder_gif_row(grid)
         self._create_select_cam_settings_row(grid)
+        self._create_select_capture_profile_row(grid)
         self._create_toggle_sound_notification_row(grid)
         self._create_see_blink_statistics_row(grid)
         self._create_set_performance_level_row(grid)
@@ -450,22 +763,18 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         group_box.setLayout(grid)
         return group_box
 
-    def _alert_no_cam(self) -> List[str]:  # pylint: disable=no-self-use
-        """Alert the user with a window popup that there is no webcam connected
-
-        :return: return available video capture ports after alerting the user
+    def _alert_no_cam(self) -> None:
+        """Alert the user with a window popup that there is no webcam connected, then look for
+        cameras again in the background
         """
         no_cam_messagebox = QMessageBox()
         no_cam_messagebox.setIcon(QMessageBox.Icon.Warning)
         no_cam_messagebox.setText("No webcam has been detected")
         no_cam_messagebox.setInformativeText("Connect a webcam for blinking detection")
         no_cam_messagebox.exec()
-        cap_indexes = get_cap_indexes()
-        if not cap_indexes:
-            LOGGER.error("No cameras could be found")
-            self.toggle_button.setEnabled(False)
-            self._alert_no_cam()
-        return get_cap_indexes()
+        self._pending_startup_steps.append("cameras")
+        self._update_startup_status()
+        self._enumerate_cameras()
 
     @staticmethod
     def _play_sound_notification() -> None:
@@ -484,17 +793,20 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
             # dismissal
             time_since_last_alert = time.time() - self.last_end_of_alert_time
             if time_since_last_alert > ALERT_SECONDS_COOLDOWN:
+                # Frames too far apart may have missed the blinks
+                if not self._is_lack_of_blink_trusted():
+                    return
                 LOGGER.info("Lack of blink detected")
                 if self.notification_dropdown.is_current_setting("Popup"):
                     self.blink_reminder.update_duration_lack(
-                        self.blink_thread.model_api.lack_of_blink_threshold
+                        self.blink_thread.lack_of_blink_threshold
                     )
                     self.blink_reminder.show_reminder()
                     if self.sound_toggle_button.isChecked():
                         self._play_sound_notification()
                 elif self.notification_dropdown.is_current_setting("Tray Notification"):
                     self.tray.show_tray_blink_reminder(
-                        self.blink_thread.model_api.lack_of_blink_threshold
+                        self.blink_thread.lack_of_blink_threshold
                     )
                     self._reset_last_end_of_alert_time(
                         EventTypes["SYSTEM_TRAY_NOTIFICATION"]
@@ -511,6 +823,36 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
                         "Only the above notification types have been defined"
                     )
 
+    def _is_lack_of_blink_trusted(self) -> bool:
+        """Whether enough frames were processed over the lack of blink threshold to trust that
+        no blink was missed, or no blink was detected for UNTRUSTED_LACK_OF_BLINK_FACTOR times
+        the threshold whatever the frame rate. Untrusted lack of blinks are logged and counted
+        at most once per ALERT_SECONDS_COOLDOWN.
+
+        :return: False if the effective frame rate was too low to trust the lack of blink
+        """
+        lack_of_blink_threshold_s = self.blink_thread.lack_of_blink_threshold
+        if self.blink_thread.is_rate_trustworthy(lack_of_blink_threshold_s):
+            return True
+        time_since_last_blink = time.time() - self.last_blink_time
+        if time_since_last_blink >= UNTRUSTED_LACK_OF_BLINK_FACTOR * lack_of_blink_threshold_s:
+            LOGGER.warning(
+                "The frame rate is too low to reliably detect blinks, reminding anyway as none "
+                "was detected for %.0f s",
+                time_since_last_blink,
+            )
+            return True
+        if time.time() - self.last_suppressed_alert_time > ALERT_SECONDS_COOLDOWN:
+            self.last_suppressed_alert_time = time.time()
+            self._suppressed_alerts.inc()
+            LOGGER.warning(
+                "Lack of blink detected but only %.1f frames per second were processed over "
+                "the last %s s, not reminding yet",
+                self.blink_thread.effective_fps(lack_of_blink_threshold_s),
+                lack_of_blink_threshold_s,
+            )
+        return False
+
     @Slot()
     def blink_value_updated_slot(self, output: int) -> None:
         """Slot called each frame by the inference thread when the current frame's blink value
@@ -519,11 +861,30 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         :param output: output for the frame processed 1 for blink detected, -1 for no blink
         """
         if output == 1:
+            self.last_blink_time = time.time()
             if self.notification_dropdown.is_current_setting("Popup"):
-                if self.blink_reminder.isVisible():
+                if self._blink_reminder is not None and self._blink_reminder.isVisible():
                     self.blink_reminder.close()
                     self._reset_last_end_of_alert_time(EventTypes["POPUP_NOTIFICATION"])
 
+    @Slot()
+    def _frame_stats_updated_slot(self, frame_stats: dict[str, Any]) -> None:
+        """Slot called each frame by the inference thread with the timings and outputs of the
+        frame, used to pick the next inference interval in the "Adaptive" performance mode
+
+        :param frame_stats: see `BlinkModelThread.update_frame_stats`
+        """
+        if not self.adaptive_inference:
+            return
+        interval_ms = self.adaptive_scheduler.update(
+            frame_stats,
+            time.time() - self.last_blink_time,
+            self.blink_thread.lack_of_blink_threshold,
+        )
+        if interval_ms != self.timer.interval():
+            self.timer.setInterval(interval_ms)
+            self.blink_thread.target_fps = 1000 / interval_ms
+
     @Slot()
     def _set_timer_interval(self, slider_value: int) -> None:
         """Slot called when slider is modified, update the timer value(frequency of the inference)
@@ -531,6 +892,8 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
         :param slider_value: current value of the slider
         """
         self.timer.setInterval(slider_value)
+        # The persistent frame loop paces itself to the equivalent frame rate
+        self.blink_thread.target_fps = 1000 / slider_value
         LOGGER.info("slider_value=%s", slider_value)
 
     @Slot()
@@ -539,7 +902,7 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
 
         :param spinbox_value: current value of the spin box
         """
-        self.blink_thread.model_api.lack_of_blink_threshold = spinbox_value
+        self.blink_thread.lack_of_blink_threshold = spinbox_value
 
     @Slot()
     def _toggle_sound_slot(self) -> None:
@@ -562,30 +925,76 @@ class Window(QWidget):  # pylint: disable=too-many-instance-attributes
             self.toggle_button.setText("Disable")
             if self.tray_available:
                 self.tray.set_tray_toggle_text("Disable")
-            self.timer.start()
-            LOGGER.info("timer started")
+            self._start_inference()
             self.db_api.store_event(time.time(), EventTypes.DETECTION_ENABLED)
         else:
             self.toggle_button.setText("Enable")
             if self.tray_available:
                 self.tray.set_tray_toggle_text("Enable")
+            self._stop_inference()
+            self.db_api.store_event(time.time(), EventTypes.DETECTION_DISABLED)
+
+    def _start_inference(self) -> None:
+        """Start scheduling inference, either via the timer or the persistent frame loop"""
+        self.last_blink_time = time.time()
+        if self.persistent_worker:
+            self.blink_thread.start_continuous()
+            LOGGER.info("persistent frame loop started")
+        else:
+            self.blink_thread.reset_frame_rate()
+            self.timer.start()
+            LOGGER.info("timer started")
+
+    def _stop_inference(self) -> None:
+        """Stop scheduling inference"""
+        if self.persistent_worker:
+            self.blink_thread.stop_continuous()
+            LOGGER.info("persistent frame loop stopped")
+        else:
             LOGGER.info("timer stop")
-            # By stopping the timer, it means we do not schedule the inference thread periodically.
+            # By stopping the timer, it means we do not schedule the inference thread
+            # periodically.
             self.timer.stop()
-            self.db_api.store_event(time.time(), EventTypes.DETECTION_DISABLED)
+
+    @Slot()
+    def shutdown(self) -> None:
+        """Stop any running inference and write queued data before the application exits"""
+        LOGGER.info("Shutting down window")
+        self.timer.stop()
+        self.blink_thread.stop_continuous()
+        # A single frame may still be running, its row must be stored before the database closes
+        if not self.blink_thread.wait(SHUTDOWN_FRAME_TIMEOUT_MS):
+            LOGGER.warning("The frame being processed did not finish within %s ms, its blink "
+                           "data may be lost", SHUTDOWN_FRAME_TIMEOUT_MS)
+        for task in list(self._background_tasks):
+            task.wait()
+        self.blink_thread.release_cap()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        self.db_api.close()
 
     @Slot()
     def _open_facial_window(self) -> None:
-        """Create debug window showing facial mapping and launch it"""
-        self.debug_window = DebugWindow(self.blink_thread)
+        """Create debug window showing facial mapping on first use and launch it"""
+        if self.debug_window is None:
+            self.debug_window = DebugWindow(self.blink_thread)
         self.debug_window.show()
+        self.debug_window.raise_()
         LOGGER.info("open debug")
 
     @Slot()
     def _open_blink_stats(self) -> None:
-        """Create blink stats window and launch it"""
-        self.blink_stats_window = BlinkStatsWindow(self.db_api)
-        # Set default graph
-        self.blink_stats_window.show_default_plot()
+        """Create blink stats window on first use and launch it, redrawing the selected graph"""
+        if self.blink_stats_window is None:
+            self.blink_stats_window = BlinkStatsWindow(self.db_api)
+            self.blink_thread.blink_detected.connect(
+                self.blink_stats_window.blink_graph.add_live_blink)
+            self.blink_reminder_shown.connect(self.blink_stats_window.blink_graph.add_live_event)
+            # Set default graph
+            self.blink_stats_window.show_default_plot()
+        else:
+            self.blink_stats_window.draw_selected_plot(
+                self.blink_stats_window.select_stats_dropdown.currentIndex())
         self.blink_stats_window.show()
+        self.blink_stats_window.raise_()
         LOGGER.info("open blink stats windows")
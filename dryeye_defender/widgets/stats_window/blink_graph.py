@@ -2,20 +2,31 @@
 import logging
 import time
 from datetime import datetime, timezone
-from typing import Any, List
+from typing import Any, List, Optional
 
+import numpy as np
 import pyqtgraph as pg
-from PySide6.QtCore import Slot
+from PySide6.QtCore import QTimer, Slot
 from PySide6.QtWidgets import QVBoxLayout, QWidget
 from dateutil import tz
 
 from blinkdetector.utils.database import EventTypes
-from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
+from dryeye_defender.utils.database import (RAW_RESOLUTION_S, BlinkArrays,
+                                            BlinkHistoryDryEyeDefender, local_utc_offset_s)
+from dryeye_defender.widgets.stats_window.query_cache import StatsQueryCache, bin_start
 
 local_timezone = tz.tzlocal()
 
 LOGGER = logging.getLogger(__name__)
 
+# Live mode redraws at most once per this interval, however many blinks come in
+LIVE_REDRAW_INTERVAL_MS = 1000
+# Initial capacity of the arrays live bars are appended to, doubled whenever full
+INITIAL_LIVE_CAPACITY = 256
+# Maximum seconds live mode waits for the queued blinks to be written before counting the
+# current bin, the database writer may be busy with a maintenance step
+LIVE_SYNC_FLUSH_TIMEOUT_S = 1.0
+
 
 class MinuteOnlyDateAxisItem(pg.DateAxisItem):  # pylint: disable=abstract-method
     """Replace the timestamps to string datetimes with only the hour/minutes shown"""
@@ -35,10 +46,77 @@ class MinuteOnlyDateAxisItem(pg.DateAxisItem):  # pylint: disable=abstract-metho
         """This method is implemented to satisfy the abstract method in the parent class"""
 
 
-class BlinkGraph(QWidget):
+class LiveBarSeries:
+    """Bar positions and heights in pre-allocated arrays, so that appending a bar does not
+    reallocate the arrays on every blink
+    """
+
+    def __init__(self,
+                 timestamps: Any = (),
+                 values: Any = (),
+                 capacity: int = INITIAL_LIVE_CAPACITY) -> None:
+        """Create the series with initial bars
+
+        :param timestamps: x position of the initial bars
+        :param values: height of the initial bars
+        :param capacity: initial number of bars the arrays can hold
+        """
+        self.size = len(timestamps)
+        capacity = max(capacity, 2 * self.size)
+        self.x = np.empty(capacity)
+        self.height = np.empty(capacity)
+        self.x[:self.size] = timestamps
+        self.height[:self.size] = values
+
+    def append(self, x: float, height: float) -> None:
+        """Add a bar after the last one
+
+        :param x: x position of the bar
+        :param height: height of the bar
+        """
+        if self.size == len(self.x):
+            self.x = np.concatenate((self.x, np.empty_like(self.x)))
+            self.height = np.concatenate((self.height, np.empty_like(self.height)))
+        self.x[self.size] = x
+        self.height[self.size] = height
+        self.size += 1
+
+    def last_x(self) -> Optional[float]:
+        """Get the x position of the last bar, None if there are no bars"""
+        return float(self.x[self.size - 1]) if self.size else None
+
+    def set_last_height(self, height: float) -> None:
+        """Change the height of the last bar
+
+        :param height: new height of the bar
+        """
+        self.height[self.size - 1] = height
+
+    def drop_before(self, x: float) -> None:
+        """Remove the bars before a position, e.g. scrolled out of view, keeping the capacity
+
+        :param x: bars at positions below this are removed
+        """
+        dropped = int(np.searchsorted(self.x[:self.size], x))
+        if dropped:
+            self.size -= dropped
+            self.x[:self.size] = self.x[dropped:dropped + self.size]
+            self.height[:self.size] = self.height[dropped:dropped + self.size]
+
+    def view(self) -> tuple[np.ndarray, np.ndarray]:
+        """Get the x positions and heights of the bars, without copying them"""
+        return self.x[:self.size], self.height[:self.size]
+
+
+class BlinkGraph(QWidget):  # pylint: disable=too-many-instance-attributes
     """
     Class for just the graph COMPONENT of the window displaying the blink-per-minute statistics
     over time
+
+    The bar items, legend and axis items are created once and updated in place when switching
+    views. In live mode, blinks and notification events reported by the detector through
+    `add_live_blink()` and `add_live_event()` are appended to the bars of the current view,
+    which are redrawn at most every LIVE_REDRAW_INTERVAL_MS without querying the database.
     """
 
     def __init__(self, db_api: BlinkHistoryDryEyeDefender) -> None:
@@ -46,6 +124,24 @@ class BlinkGraph(QWidget):
         """
         super().__init__()
         self.db_api = db_api
+        self.query_cache = StatsQueryCache(db_api)
+
+        # Series of the current view, kept to append to them in live mode
+        self.live = False
+        self._blink_series = LiveBarSeries()
+        self._event_series = LiveBarSeries()
+        self._view_resolution = RAW_RESOLUTION_S
+        self._view_span_s = 0.0
+        self._tz_offset_s = local_utc_offset_s()
+        # (number of blinks, number of minutes with blinks) of the last bin of the view
+        self._last_bin_counts = [0, 0]
+        self._last_active_minute: Optional[int] = None
+        # Blinks before this unix timestamp are already counted in the last bin
+        self._live_since = 0.0
+        self._live_dirty = False
+        self._live_timer = QTimer(self)
+        self._live_timer.setInterval(LIVE_REDRAW_INTERVAL_MS)
+        self._live_timer.timeout.connect(self._redraw_live)
         # Create the graph widget
         self.graph_widget = pg.PlotWidget()
         self.graph_widget.setLimits(yMin=0)
@@ -61,22 +157,173 @@ class BlinkGraph(QWidget):
         self.graph_widget.getAxis("left").tickFont = axis_font
         self.graph_widget.getAxis("bottom").tickFont = axis_font
 
+        # The x axis items of each tick format, swapped in when switching views
+        self.minute_axis = MinuteOnlyDateAxisItem()
+        self.minute_axis.setLabel(text="Time", units="s")
+        self.minute_axis.tickFont = axis_font
+        self.default_axis = pg.DateAxisItem()
+        self.default_axis.tickFont = axis_font
+
+        # The bars and legend are created once and updated in place by each view
+        self.blink_bars = pg.BarGraphItem(x=[], height=[], width=1, brush="g")
+        self.event_bars = pg.BarGraphItem(x=[], height=[], width=1, brush="r")
+        self.graph_widget.addItem(self.blink_bars)
+        self.graph_widget.addItem(self.event_bars)
+        self.legend = pg.LegendItem()
+        self.legend.addItem(self.blink_bars, "Blink Detection")
+        self.legend.addItem(self.event_bars, "Blink Reminder Event")
+        self.legend.setParentItem(self.graph_widget.graphicsItem())
+        self.legend.anchor(itemPos=(1, 0), parentPos=(1, 0))
+
         layout = QVBoxLayout()
 
         layout.addWidget(self.graph_widget)
         self.setLayout(layout)
 
+    def _set_xaxis(self, axis: pg.AxisItem) -> None:
+        """Install the x axis item unless it is already installed
+
+        :param axis: one of the cached axis items
+        """
+        if self.graph_widget.getAxis("bottom") is not axis:
+            self.graph_widget.setAxisItems({"bottom": axis})
+
     def set_minute_xaxis_tick_format(self) -> None:
         """Set the xaxis to show only show %H:$M hours and minutes for each tick"""
-        x_axis_handle = MinuteOnlyDateAxisItem()
-        x_axis_handle.setLabel(text="Time", units="s")
-        self.graph_widget.setAxisItems({"bottom": x_axis_handle})
+        self._set_xaxis(self.minute_axis)
 
     def set_default_xaxis_tick_format(self) -> None:
         """Set the xaxis to show default tick labelling, which auto-adjusts labels based on the
         zoom scale of the user
         """
-        self.graph_widget.setAxisItems({"bottom": pg.DateAxisItem()})
+        self._set_xaxis(self.default_axis)
+
+    def _set_view(self,  # pylint: disable=too-many-arguments
+                  data: BlinkArrays,
+                  resolution: int,
+                  span_s: float,
+                  bar_width: float,
+                  events: Optional[BlinkArrays] = None) -> None:
+        """Show the series of a view on the persistent bars, and record them for live mode to
+        append to
+
+        :param data: the blink series of the view
+        :param resolution: width of each bin in seconds, see `query_blink_rate()`
+        :param span_s: the view shows the last `span_s` seconds
+        :param bar_width: width of the bars in seconds
+        :param events: the blink reminder events shown by the view, if it shows them
+        """
+        self._blink_series = LiveBarSeries(data["timestamps"], data["values"])
+        if events is None:
+            self._event_series = LiveBarSeries()
+        else:
+            self._event_series = LiveBarSeries(events["timestamps"], events["values"])
+        self._view_resolution = resolution
+        self._view_span_s = span_s
+        self._tz_offset_s = local_utc_offset_s()
+        self._update_bars(bar_width)
+        self.legend.setVisible(events is not None)
+        if self.live:
+            self._sync_last_bin()
+
+    def _update_bars(self, bar_width: Optional[float] = None) -> None:
+        """Update the bars from the series of the current view
+
+        :param bar_width: new width of the bars in seconds, None to keep the current width
+        """
+        width_opts = {} if bar_width is None else {"width": bar_width}
+        x, height = self._blink_series.view()
+        self.blink_bars.setOpts(x=x, height=height, **width_opts)
+        x, height = self._event_series.view()
+        self.event_bars.setOpts(x=x, height=height, **width_opts)
+
+    def _sync_last_bin(self) -> None:
+        """Fetch the blink count and active minutes of the current bin, so that live blinks can
+        update its mean blinks per minute. The blinks still queued for the database writer are
+        written first, and the blinks reported by the detector before are not counted again.
+        """
+        self._last_bin_counts = [0, 0]
+        self._last_active_minute = None
+        if self._view_resolution < 60:
+            return
+        now = time.time()
+        self._live_since = now
+        self.db_api.flush(LIVE_SYNC_FLUSH_TIMEOUT_S)
+        rows = self.db_api.query_blink_counts(
+            bin_start(now, self._view_resolution, self._tz_offset_s),
+            resolution=self._view_resolution, tz_offset_s=self._tz_offset_s)
+        if rows:
+            start, blink_count, active_minutes = rows[-1]
+            if self._blink_series.last_x() != start:
+                self._blink_series.append(start, 0)
+            self._last_bin_counts = [blink_count, active_minutes]
+            self._blink_series.set_last_height(blink_count / active_minutes)
+            self._live_dirty = True
+        if self.db_api.query_blink_counts(now // 60 * 60, resolution=60, tz_offset_s=0):
+            self._last_active_minute = int(now // 60)
+
+    def set_live(self, live: bool) -> None:
+        """Enable or disable live mode
+
+        :param live: whether to append the blinks and events reported by the detector
+        """
+        self.live = live
+        if live:
+            self._sync_last_bin()
+            self._live_timer.start()
+        else:
+            self._live_timer.stop()
+
+    @Slot(float)
+    def add_live_blink(self, timestamp: float) -> None:
+        """Slot called when the detector stores a blink, i.e. a row counted in the rollups,
+        appended to the view in live mode
+
+        :param timestamp: unix timestamp of the blink
+        """
+        if not self.live:
+            return
+        if self._view_resolution < 60:
+            self._blink_series.append(timestamp, 1)
+        elif timestamp >= self._live_since:
+            start = bin_start(timestamp, self._view_resolution, self._tz_offset_s)
+            if self._blink_series.last_x() != start:
+                self._blink_series.append(start, 0)
+                self._last_bin_counts = [0, 0]
+            minute = int(timestamp // 60)
+            self._last_bin_counts[0] += 1
+            if minute != self._last_active_minute:
+                self._last_bin_counts[1] += 1
+                self._last_active_minute = minute
+            self._blink_series.set_last_height(
+                self._last_bin_counts[0] / self._last_bin_counts[1])
+        self._live_dirty = True
+
+    @Slot(float)
+    def add_live_event(self, timestamp: float) -> None:
+        """Slot called when a blink reminder is shown, appended to the views showing them in
+        live mode
+
+        :param timestamp: unix timestamp of the reminder
+        """
+        if not self.live or self._view_resolution >= 60:
+            return
+        self._event_series.append(timestamp, 1)
+        self._live_dirty = True
+
+    @Slot()
+    def _redraw_live(self) -> None:
+        """Scroll the view to the current time and update the bars with the live data"""
+        graph_end_time = time.time()
+        self.graph_widget.setXRange(graph_end_time - self._view_span_s, graph_end_time)
+        if not self._live_dirty:
+            return
+        self._live_dirty = False
+        # Bars keep being appended in live mode, only keep the ones still in view
+        view_start = graph_end_time - self._view_span_s - max(self._view_resolution, 1)
+        self._blink_series.drop_before(view_start)
+        self._event_series.drop_before(view_start)
+        self._update_bars()
 
     @Slot()
     def plot_graph_last_5_minutes(self) -> None:
@@ -84,45 +331,25 @@ class BlinkGraph(QWidget):
         timestamp of the blink
         """
         LOGGER.info("plot_graph_by_minute called")
-        self.graph_widget.clear()
         graph_end_time = time.time()
         graph_start_time = graph_end_time - 60 * 5
         self.graph_widget.setXRange(graph_start_time, graph_end_time)
         self.graph_widget.setLabel("left", "Event Detected")
         self.set_default_xaxis_tick_format()
-        data = self.db_api.query_raw_blink_history_no_grouping(graph_start_time)
-        if not data:
+        data = self.query_cache.query_blink_rate("last_5_minutes", graph_start_time,
+                                                 RAW_RESOLUTION_S)
+        events = self.db_api.query_events(graph_start_time,
+                                          [EventTypes["SYSTEM_TRAY_NOTIFICATION"],
+                                           EventTypes["POPUP_NOTIFICATION"], ],
+                                          as_array=True)
+        self._set_view(data, RAW_RESOLUTION_S, graph_end_time - graph_start_time, 1, events)
+        if len(data["timestamps"]) == 0:
             LOGGER.info("no data found in last 5 minutes")
             self.graph_widget.setTitle("No blink data available over the last 10 minutes")
             return
         LOGGER.info("Retrieved data for plot: %s", data)
-
+        LOGGER.info("Events found: %s", events)
         self.graph_widget.setTitle("Blinks over last 5 minutes")
-        bargraph = pg.BarGraphItem(x=data["timestamps"], height=data["values"],
-                                   width=1, brush="g")
-        self.graph_widget.addItem(bargraph)
-
-        events = self.db_api.query_events(graph_start_time,
-                                          [EventTypes["SYSTEM_TRAY_NOTIFICATION"],
-                                           EventTypes["POPUP_NOTIFICATION"], ])
-        LOGGER.info("Retrieved data for plot: %s", data)
-        if not events:
-            LOGGER.info("no events found")
-            legend = pg.LegendItem()
-            legend.addItem(bargraph, "Blink Detection")
-            legend.setParentItem(self.graph_widget.graphicsItem())
-            legend.anchor(itemPos=(1, 0), parentPos=(1, 0))
-        else:
-            LOGGER.info("Events found: %s", events)
-            event_bargraph = pg.BarGraphItem(x=events["timestamps"], height=events["values"],
-                                             width=1, brush="r")
-            self.graph_widget.addItem(event_bargraph)
-            legend = pg.LegendItem()
-            legend.addItem(bargraph, "Blink Detection")
-            legend.addItem(event_bargraph, "Blink Reminder Event")
-            legend.setParentItem(self.graph_widget.graphicsItem())
-            legend.anchor(itemPos=(1, 0), parentPos=(1, 0))
-        self.graph_widget.show()
 
     @Slot()
     def plot_graph_by_minute(self) -> None:
@@ -130,85 +357,73 @@ class BlinkGraph(QWidget):
         minute.
         """
         LOGGER.info("plot_graph_by_minute called")
-        self.graph_widget.clear()
         graph_end_time = time.time()
         graph_start_time = graph_end_time - 60 * 60
         self.graph_widget.setXRange(graph_start_time, graph_end_time)
+        self.graph_widget.setLabel("left", "Blinks per minute")
         self.set_minute_xaxis_tick_format()
-        data = self.db_api.query_blink_history_groupby_minute_since(graph_start_time)
-        if not data:
+        data = self.query_cache.query_blink_rate("last_hour", graph_start_time, 60)
+        self._set_view(data, 60, graph_end_time - graph_start_time, 60 - 2)
+        if len(data["timestamps"]) == 0:
             LOGGER.info("no data found in last 60 minutes")
             self.graph_widget.setTitle("No blink data available over the last 10 minutes")
             return
         LOGGER.info("Retrieved data for plot: %s", data)
         self.graph_widget.setTitle("Blink rate over last 60 minutes")
-        bargraph = pg.BarGraphItem(x=data["timestamps"], height=data["values"],
-                                   width=60 - 2, brush="g")
-        self.graph_widget.addItem(bargraph)
-        self.graph_widget.setLabel("left", "Blinks per minute")
 
     @Slot()
     def plot_graph_by_hour(self) -> None:
         """Retrieve blink data from DB over last 24 hours and plot per hour bin,the mean blinks per
         minute.
         """
-        self.graph_widget.clear()
         graph_end_time = time.time()
         graph_start_time = graph_end_time - 60 * 60 * 24
         self.graph_widget.setXRange(graph_start_time, graph_end_time)
+        self.graph_widget.setLabel("left", "Blinks per minute")
         self.set_minute_xaxis_tick_format()
-        data = self.db_api.query_blink_history_groupby_hour_since(graph_start_time)
-        if not data:
+        data = self.query_cache.query_blink_rate("last_day", graph_start_time, 60 * 60)
+        self._set_view(data, 60 * 60, graph_end_time - graph_start_time, 60 * 60 - 2)
+        if len(data["timestamps"]) == 0:
             LOGGER.info("no data found in last 24 hours")
             self.graph_widget.setTitle("No blink data available over the last 24 hours")
             return
         LOGGER.info("Retrieved data for plot: %s", data)
         self.graph_widget.setTitle("Blink rate over last 24 hours")
-        bargraph = pg.BarGraphItem(x=data["timestamps"], height=data["values"],
-                                   width=60 * 60 - 2, brush="g")
-        self.graph_widget.addItem(bargraph)
-        self.graph_widget.setLabel("left", "Blinks per minute")
 
     @Slot()
     def plot_graph_by_day(self) -> None:
         """Retrieve blink data from DB over last 30 days and plot per day bin, the mean
         blinks per minute.
         """
-        self.graph_widget.clear()
         graph_end_time = time.time()
         graph_start_time = graph_end_time - 60 * 60 * 24 * 30
         self.graph_widget.setXRange(graph_start_time, graph_end_time)
+        self.graph_widget.setLabel("left", "Blinks per minute")
         self.set_default_xaxis_tick_format()
-        data = self.db_api.query_blink_history_groupby_day_since(graph_start_time)
-        if not data:
+        data = self.query_cache.query_blink_rate("last_month", graph_start_time, 24 * 60 * 60)
+        self._set_view(data, 24 * 60 * 60, graph_end_time - graph_start_time, 24 * 60 * 60 - 2)
+        if len(data["timestamps"]) == 0:
             LOGGER.info("no data found in last 30 days")
             self.graph_widget.setTitle("No blink data available over the last 30 days")
             return
         LOGGER.info("Retrieved data for plot: %s", data)
         self.graph_widget.setTitle("Blink rate over last 30 days")
-        bargraph = pg.BarGraphItem(x=data["timestamps"], height=data["values"],
-                                   width=24 * 60 * 60 - 2, brush="g")
-        self.graph_widget.addItem(bargraph)
-        self.graph_widget.setLabel("left", "Blinks per minute")
 
     @Slot()
     def plot_graph_by_year(self) -> None:
         """Retrieve blink data from DB over last 360 days and plot per day bin, the mean
         blinks per minute.
         """
-        self.graph_widget.clear()
         graph_end_time = time.time()
         graph_start_time = graph_end_time - 60 * 60 * 24 * 30 * 12
         self.graph_widget.setXRange(graph_start_time, graph_end_time)
+        self.graph_widget.setLabel("left", "Blinks per minute")
         self.set_default_xaxis_tick_format()
-        data = self.db_api.query_blink_history_groupby_day_since(graph_start_time)
-        if not data:
+        data = self.query_cache.query_blink_rate("last_year", graph_start_time, 24 * 60 * 60)
+        self._set_view(data, 24 * 60 * 60, graph_end_time - graph_start_time, 24 * 60 * 60 - 2)
+        if len(data["timestamps"]) == 0:
             LOGGER.info("no data found in last 360 days")
             self.graph_widget.setTitle("No blink data available over the last 360 days")
             return
         LOGGER.info("Retrieved data for plot: %s", data)
         self.graph_widget.setTitle("Blink rate over last 360 days")
-        bargraph = pg.BarGraphItem(x=data["timestamps"], height=data["values"],
-                                   width=24 * 60 * 60 - 2, brush="g")
-        self.graph_widget.addItem(bargraph)
-        self.graph_widget.setLabel("left", "Blinks per minute")
@@ -3,8 +3,8 @@ import logging
 from typing import Optional
 
 from PySide6.QtCore import Slot
-from PySide6.QtWidgets import QVBoxLayout, QWidget, QLabel, QComboBox, QPushButton
-from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QVBoxLayout, QWidget, QLabel, QComboBox, QPushButton, QCheckBox
+from PySide6.QtGui import QCloseEvent, QFont
 
 from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
 from dryeye_defender.widgets.stats_window.blink_graph import BlinkGraph
@@ -46,6 +46,21 @@ class BlinkStatsWindow(QWidget):
         update_font(self.open_blink_stats_button)
         qbbox_layout.addWidget(self.open_blink_stats_button)
 
+        # Appends the blinks and reminders reported by the detector without pressing Update
+        self.live_checkbox = QCheckBox("Live")
+        update_font(self.live_checkbox)
+        self.live_checkbox.toggled.connect(self.blink_graph.set_live)
+        qbbox_layout.addWidget(self.live_checkbox)
+
+    def closeEvent(self, event: QCloseEvent) -> None:  # pylint: disable=invalid-name
+        """Stop the live updates when the window is closed, it starts without them when shown
+        again
+
+        :param event: the close event
+        """
+        self.live_checkbox.setChecked(False)
+        super().closeEvent(event)
+
     def show_default_plot(self) -> None:
         """Display the default plot"""
         self.draw_selected_plot(self.default_plot_index)
@@ -0,0 +1,104 @@
+"""Cache of the blink rate series shown in the stats window, refreshed incrementally"""
+import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from dryeye_defender.utils.database import (ROLLUP_TIERS, BlinkArrays,
+                                            BlinkHistoryDryEyeDefender, local_utc_offset_s)
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of views kept before evicting the least recently used
+DEFAULT_MAX_VIEWS = 8
+
+
+def bin_start(timestamp: float, resolution: int, tz_offset_s: int) -> float:
+    """Get the start of the bin containing the timestamp, raw blinks are not binned
+
+    :param timestamp: unix timestamp
+    :param resolution: width of each bin in seconds
+    :param tz_offset_s: offset from UTC in seconds the bins are aligned to
+    :return: unix timestamp of the start of the bin
+    """
+    if resolution < ROLLUP_TIERS[-1].seconds:
+        return timestamp
+    return float((timestamp + tz_offset_s) // resolution * resolution - tz_offset_s)
+
+
+class CachedSeries(NamedTuple):
+    """Bins of one view fetched so far"""
+
+    # Bins starting from the one containing this unix timestamp are cached
+    since: float
+    timestamps: np.ndarray
+    values: np.ndarray
+
+
+class StatsQueryCache:
+    """LRU cache of `BlinkHistoryDryEyeDefender.query_blink_rate()` results keyed by view,
+    resolution and timezone offset
+
+    On each query, only the bins from the newest cached one onwards are fetched from the
+    database and merged into the cache, the newest bin being fetched again as it may have
+    received blinks since. Re-opening a view, even the year view, therefore only reads its
+    newest bin.
+    """
+
+    def __init__(self,
+                 db_api: BlinkHistoryDryEyeDefender,
+                 max_views: int = DEFAULT_MAX_VIEWS) -> None:
+        """Create an empty cache
+
+        :param db_api: database to query on cache misses and refreshes
+        :param max_views: number of views kept before evicting the least recently used
+        """
+        self.db_api = db_api
+        self.max_views = max_views
+        self._views: "OrderedDict[tuple[str, int, int], CachedSeries]" = OrderedDict()
+
+    def clear(self) -> None:
+        """Drop every cached view"""
+        self._views.clear()
+
+    def query_blink_rate(self,
+                         view: str,
+                         since: float,
+                         resolution: int,
+                         tz_offset_s: Optional[int] = None) -> BlinkArrays:
+        """Get the blink rate since a timestamp, see `query_blink_rate()` of the database
+
+        :param view: name of the view, bins before `since` are dropped from the view's cache, so
+         views with different time spans should use different names
+        :param since: Only consider timestamps after this, a unix timestamp
+        :param resolution: width of each bin in seconds, below 60 seconds the raw blinks
+        :param tz_offset_s: offset from UTC in seconds the bins are aligned to, defaults to the
+         current local offset
+        :return: dict of "timestamps" and "values" arrays
+        """
+        if tz_offset_s is None:
+            tz_offset_s = local_utc_offset_s()
+        key = (view, resolution, tz_offset_s)
+        since = bin_start(since, resolution, tz_offset_s)
+        cached = self._views.get(key)
+        if cached is None or cached.since > since:
+            LOGGER.debug("Stats query cache miss for view %s", view)
+            fetch_since = since
+            timestamps, values = np.empty(0), np.empty(0)
+        else:
+            self._views.move_to_end(key)
+            # The newest cached bin may have received blinks since it was fetched
+            fetch_since = max(cached.timestamps[-1] if len(cached.timestamps) else cached.since,
+                              since)
+            kept = (cached.timestamps >= since) & (cached.timestamps < fetch_since)
+            timestamps, values = cached.timestamps[kept], cached.values[kept]
+        new = self.db_api.query_blink_rate(fetch_since, resolution=resolution, as_array=True,
+                                           tz_offset_s=tz_offset_s)
+        timestamps = np.concatenate((timestamps, new["timestamps"]))
+        values = np.concatenate((values, new["values"])).astype(new["values"].dtype, copy=False)
+        self._views[key] = CachedSeries(since, timestamps, values)
+        if len(self._views) > self.max_views:
+            self._views.popitem(last=False)
+        LOGGER.debug("Fetched %s new bins for view %s", len(new["timestamps"]), view)
+        return {"timestamps": timestamps, "values": values}
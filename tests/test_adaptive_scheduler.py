@@ -0,0 +1,45 @@
+"""Test the adaptive inference scheduler"""
+from typing import Any
+
+from dryeye_defender.utils.adaptive_scheduler import AdaptiveInferenceScheduler
+
+
+def make_frame_stats(total_s: float = 0.001,
+                     blink_value: int = -1,
+                     left_ear: Any = 0.0,
+                     right_ear: Any = 0.0) -> dict[str, Any]:
+    """Build a frame stats dict as emitted by BlinkModelThread.update_frame_stats"""
+    return {"timestamp": 0.0, "grab_s": 0.0, "inference_s": total_s, "total_s": total_s,
+            "blink_value": blink_value, "left_ear": left_ear, "right_ear": right_ear}
+
+
+def test_backs_off_when_eyes_steadily_open() -> None:
+    """The interval grows up to the maximum while the eyes stay open"""
+    scheduler = AdaptiveInferenceScheduler(min_interval_ms=10, max_interval_ms=200)
+    for _ in range(50):
+        interval = scheduler.update(make_frame_stats(), 0.0, 10)
+    assert interval == 200
+
+
+def test_backs_off_when_face_absent() -> None:
+    """The interval jumps to the maximum when no face is detected"""
+    scheduler = AdaptiveInferenceScheduler(min_interval_ms=10, max_interval_ms=200)
+    assert scheduler.update(make_frame_stats(left_ear=None, right_ear=None), 0.0, 10) == 200
+
+
+def test_fast_when_blinking_or_alert_close() -> None:
+    """The interval returns to the minimum on a blink or shortly before an alert is due"""
+    scheduler = AdaptiveInferenceScheduler(min_interval_ms=10, max_interval_ms=200)
+    for _ in range(50):
+        scheduler.update(make_frame_stats(), 0.0, 10)
+    assert scheduler.update(make_frame_stats(blink_value=1), 0.0, 10) == 10
+    for _ in range(50):
+        scheduler.update(make_frame_stats(), 0.0, 10)
+    assert scheduler.update(make_frame_stats(), 9.5, 10) == 10
+
+
+def test_cpu_budget_limits_interval() -> None:
+    """A 20 ms frame with a 10% CPU budget needs at least 200 ms between frames"""
+    scheduler = AdaptiveInferenceScheduler(min_interval_ms=10, max_interval_ms=100,
+                                           cpu_budget_percent=10)
+    assert scheduler.update(make_frame_stats(total_s=0.02, blink_value=1), 0.0, 10) == 200
@@ -0,0 +1,100 @@
+"""Test the benchmarks and their command line"""
+# pylint: disable = protected-access
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from dryeye_defender.bench import __main__ as bench_main
+from dryeye_defender.bench import database as bench_database
+from dryeye_defender.bench.pipeline import run_pipeline_benchmark
+
+DUMMY_IMAGE_PATH = Path("tests/assets/dummy.jpg")
+
+
+def test_working_periods() -> None:
+    """Periods cover the working hours of each day, the last one ending at `end` at the latest,
+    and today is skipped before the working hours started
+    """
+    end = time.mktime((2023, 1, 10, 12, 0, 0, 0, 0, -1))
+    assert bench_database._working_periods(2, end) == [
+        (time.mktime((2023, 1, 9, 9, 0, 0, 0, 0, -1)),
+         time.mktime((2023, 1, 9, 17, 0, 0, 0, 0, -1))),
+        (time.mktime((2023, 1, 10, 9, 0, 0, 0, 0, -1)), end),
+    ]
+    end = time.mktime((2023, 1, 10, 8, 0, 0, 0, 0, -1))
+    assert bench_database._working_periods(1, end) == [
+        (time.mktime((2023, 1, 9, 9, 0, 0, 0, 0, -1)),
+         time.mktime((2023, 1, 9, 17, 0, 0, 0, 0, -1))),
+    ]
+
+
+def test_generate_history(tmp_path: Path) -> None:
+    """Per-frame rows are only generated within the retention period, and every blink is
+    counted in the rollups
+    """
+    db_path = tmp_path / "history.db"
+    bench_database.generate_history(db_path, 3, retention_days=1.5, frames_per_second=1.0)
+    cutoff = time.time() - 1.5 * 24 * 60 * 60
+    with closing(sqlite3.connect(db_path)) as db_con:
+        oldest_frame, frame_count = db_con.execute(
+            "SELECT MIN(blink_time), COUNT(*) FROM blink_history WHERE blink_marker = 0"
+        ).fetchone()
+        blink_count = db_con.execute(
+            "SELECT COUNT(*) FROM blink_history WHERE blink_marker = 1").fetchone()[0]
+        rollup_count = db_con.execute(
+            "SELECT SUM(blink_count) FROM blink_minute_rollup").fetchone()[0]
+    assert frame_count > 0
+    assert oldest_frame >= cutoff
+    assert 0 < blink_count < rollup_count
+
+
+def test_compare_to_baseline() -> None:
+    """Latencies above the threshold are regressions, missing or empty ones are not compared"""
+    results = {"1_day": {"fast": {"count": 2, "p50_ms": 1.0},
+                         "slow": {"count": 2, "p50_ms": 4.0},
+                         "new": {"count": 2, "p50_ms": 1.0},
+                         "empty": {"count": 0}}}
+    baseline = {"1_day": {"fast": {"count": 2, "p50_ms": 1.0},
+                          "slow": {"count": 2, "p50_ms": 2.0},
+                          "empty": {"count": 2, "p50_ms": 1.0}}}
+    comparison, regressions = bench_database.compare_to_baseline(results, baseline, 1.5)
+    assert comparison == {"1_day": {
+        "fast": {"baseline_p50_ms": 1.0, "p50_ms": 1.0, "ratio": 1.0},
+        "slow": {"baseline_p50_ms": 2.0, "p50_ms": 4.0, "ratio": 2.0},
+    }}
+    assert regressions == ["1_day/slow"]
+
+
+@pytest.mark.parametrize("regressions, exit_status", [([], 0), (["1_day/slow"], 1)])
+def test_main_exit_status(regressions: list[str], exit_status: int) -> None:
+    """The command line exits with a non-zero status when there are regressions"""
+    report = {"results": {}, "comparison": {}, "regressions": regressions}
+    with patch.object(bench_database, "run_database_benchmark", return_value=report):
+        assert bench_main.main(["database", "--histories", "1_day"]) == exit_status
+
+
+def test_main_save_baseline_requires_baseline() -> None:
+    """Saving a baseline without saying where is a usage error"""
+    with pytest.raises(SystemExit):
+        bench_main.main(["database", "--save_baseline"])
+
+
+def test_pipeline_benchmark(tmp_path: Path) -> None:
+    """The pipeline benchmark replays the frames of a directory through the detector and
+    reports the measured frames
+    """
+    shutil.copy(DUMMY_IMAGE_PATH, tmp_path / "frame.jpg")
+    report = run_pipeline_benchmark(tmp_path, loops=3, warmup_frames=1,
+                                    db_path=tmp_path / "bench.db")
+    assert report["frames"] == 2
+    assert report["fps"] > 0
+    assert set(report["latency"]) == {"grab", "inference", "store_blink", "total"}
+    assert report["latency"]["total"]["count"] == 2
+    assert report["latency"]["store_blink"]["count"] == 2
+    with closing(sqlite3.connect(tmp_path / "bench.db")) as db_con:
+        assert db_con.execute("SELECT COUNT(*) FROM blink_history").fetchone()[0] == 3
@@ -0,0 +1,20 @@
+"""Test the live bars of the stats graph"""
+import numpy as np
+
+from dryeye_defender.widgets.stats_window.blink_graph import LiveBarSeries
+
+
+def test_live_bar_series() -> None:
+    """Bars are appended past the initial capacity and dropped once scrolled out of view"""
+    series = LiveBarSeries([1.0, 2.0], [1.0, 1.0], capacity=2)
+    series.append(3.0, 2.0)
+    series.set_last_height(3.0)
+    assert series.last_x() == 3.0
+    series.drop_before(2.0)
+    x, height = series.view()
+    np.testing.assert_array_equal(x, [2.0, 3.0])
+    np.testing.assert_array_equal(height, [1.0, 3.0])
+    series.drop_before(4.0)
+    assert series.last_x() is None
+    series.append(5.0, 1.0)
+    np.testing.assert_array_equal(series.view()[0], [5.0])
@@ -2,13 +2,22 @@
 import datetime
 import sqlite3
 # pylint: disable = redefined-outer-name
+import threading
 import time
+from contextlib import closing
+from pathlib import Path
 from typing import Generator
+from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 from freezegun import freeze_time
 
+from blinkdetector.utils.database import BlinkHistory, EventTypes
+from dryeye_defender.utils import database, migrations
 from dryeye_defender.utils.database import BlinkHistoryDryEyeDefender
+from dryeye_defender.utils.migrations import LATEST_SCHEMA_VERSION, get_schema_version
+from dryeye_defender.widgets.stats_window.query_cache import StatsQueryCache
 
 MOCK_DATE = "2023-01-01"
 MOCK_TIME = f"{MOCK_DATE} 13:00:00"
@@ -109,3 +118,233 @@ def test_database_query_blink_history_groupby_minute_since(
     # result = blinkhistory._display_all_rows()
     result = blinkhistory.query_blink_history_groupby_minute_since(MOCK_TIMESTAMP - 60)
     assert result == {"timestamps": [1672577940.0], "values": [2]}
+
+
+def test_database_store_event_flush(connection: sqlite3.Connection) -> None:
+    """Test store_event queues the event until flushed, or until flush_max_rows are queued"""
+    blinkhistory = BlinkHistoryDryEyeDefender(db_con=connection, flush_max_rows=3)
+    blinkhistory.store_event(MOCK_TIMESTAMP, EventTypes.POPUP_NOTIFICATION)
+    assert connection.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0
+    blinkhistory.flush()
+    assert connection.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+
+    for _ in range(3):
+        blinkhistory.store_event(MOCK_TIMESTAMP, EventTypes.POPUP_NOTIFICATION)
+    assert connection.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 4
+
+
+def test_database_query_flushes(connection: sqlite3.Connection) -> None:
+    """Test queries see events that are still queued"""
+    blinkhistory = BlinkHistoryDryEyeDefender(db_con=connection)
+    blinkhistory.store_event(MOCK_TIMESTAMP, EventTypes.POPUP_NOTIFICATION)
+    result = blinkhistory.query_events(MOCK_TIMESTAMP - 60, [EventTypes.POPUP_NOTIFICATION])
+    assert result == {"timestamps": [MOCK_TIMESTAMP], "values": [1]}
+
+
+def test_database_writer_thread(tmp_path: Path) -> None:
+    """Test events stored to a database file are committed by the writer thread and read back
+    through a read-only connection
+    """
+    blinkhistory = BlinkHistoryDryEyeDefender(tmp_path / "saved_blink.db")
+    # A new database has no blinks for the rollups to catch up with
+    assert not migrations.has_pending_backfills(blinkhistory.db_con)
+    blinkhistory.store_event(MOCK_TIMESTAMP, EventTypes.POPUP_NOTIFICATION)
+    blinkhistory.flush()
+    # Queries read the committed rows without waiting for the writer
+    with patch.object(blinkhistory._writer, "flush",  # pylint: disable=protected-access
+                      side_effect=AssertionError("The query waited for the writer")):
+        result = blinkhistory.query_events(MOCK_TIMESTAMP - 60, [EventTypes.POPUP_NOTIFICATION])
+    assert result == {"timestamps": [MOCK_TIMESTAMP], "values": [1]}
+    with pytest.raises(sqlite3.OperationalError):
+        blinkhistory._read_con().execute("DELETE FROM events")  # pylint: disable=protected-access
+    blinkhistory.close()
+    # The connection opened from the path is closed as well
+    with pytest.raises(sqlite3.ProgrammingError):
+        blinkhistory.db_con.execute("SELECT 1")
+
+
+def test_database_connection_profile(tmp_path: Path) -> None:
+    """Test the connection profile is applied to the database file"""
+    blinkhistory = BlinkHistoryDryEyeDefender(tmp_path / "saved_blink.db")
+    assert blinkhistory.db_con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # 1 is NORMAL
+    assert blinkhistory.db_con.execute("PRAGMA synchronous").fetchone()[0] == 1
+    blinkhistory.close()
+
+
+@pytest.mark.usefixtures("setup_db")
+def test_database_migrations(connection: sqlite3.Connection) -> None:
+    """Test the schema migrations run once and record the schema version"""
+    blinkhistory = BlinkHistoryDryEyeDefender(db_con=connection)
+    assert blinkhistory.schema_version == LATEST_SCHEMA_VERSION
+    assert get_schema_version(connection) == LATEST_SCHEMA_VERSION
+    index_names = [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "idx_blink_history_blink_time_marked" in index_names
+    assert "idx_events_event_type_id_timestamp" in index_names
+    # Switching to incremental auto vacuum rewrites the file, which is left to the maintenance
+    assert connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    # Opening the database again does not re-run the migrations
+    assert BlinkHistoryDryEyeDefender(db_con=connection).schema_version == LATEST_SCHEMA_VERSION
+
+
+def test_database_deferred_backfill(tmp_path: Path) -> None:
+    """Test the rollups of a database populated before they existed are caught up by the writer
+    thread, rather than when the database is opened
+    """
+    db_path = tmp_path / "saved_blink.db"
+    pre_migration = BlinkHistory(db_path)
+    with pre_migration.db_con:
+        pre_migration.db_con.executemany(
+            """INSERT INTO blink_history(blink_time, blink_value, left_ear, right_ear,
+            blink_marker) VALUES(?,?,?,?,?)""",
+            [(MOCK_TIMESTAMP + i, 1, 0.1, 0.2, 1) for i in range(3)])
+    pre_migration.db_con.close()
+
+    backfill_started = threading.Event()
+    backfill_allowed = threading.Event()
+    backfill_done = threading.Event()
+
+    def blocking_run_backfills(db_con: sqlite3.Connection) -> None:
+        backfill_started.set()
+        backfill_allowed.wait()
+        migrations.run_backfills(db_con)
+        backfill_done.set()
+
+    with patch.object(database, "run_backfills", new=blocking_run_backfills):
+        blinkhistory = BlinkHistoryDryEyeDefender(db_path)
+        try:
+            assert blinkhistory.schema_version == LATEST_SCHEMA_VERSION
+            assert backfill_started.wait(5)
+            assert blinkhistory.query_blink_counts(MOCK_TIMESTAMP - 60, tz_offset_s=0) == []
+        finally:
+            backfill_allowed.set()
+        assert backfill_done.wait(5)
+    assert blinkhistory.query_blink_counts(MOCK_TIMESTAMP - 60, tz_offset_s=0) == [
+        (MOCK_TIMESTAMP // 60 * 60, 3, 1)]
+    blinkhistory.close()
+    with closing(sqlite3.connect(db_path)) as db_con:
+        assert not migrations.has_pending_backfills(db_con)
+        assert db_con.execute("SELECT SUM(blink_count) FROM blink_day_rollup").fetchone()[0] == 3
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_database_minute_rollup(blinkhistory: BlinkHistoryDryEyeDefender) -> None:
+    """Test blinks stored before and after the rollup table was created are aggregated"""
+    blinkhistory.store_blink(time.time() + 30, 1, 0.1, 0.2, 1)
+    blinkhistory.store_blink(time.time() + 31, -1, 0.9, 0.8, 0)
+    result = blinkhistory.query_blink_history_groupby_minute_since(time.time() - 60)
+    assert result == {"timestamps": [1672577940.0, 1672578000.0], "values": [2, 1]}
+    result = blinkhistory.query_blink_history_groupby_hour_since(time.time() - 3600,
+                                                                 tz_offset_s=0)
+    assert result == {"timestamps": [1672574400.0, 1672578000.0], "values": [2.0, 1.0]}
+    result = blinkhistory.query_blink_history_groupby_day_since(time.time() - 86400,
+                                                                tz_offset_s=0)
+    assert result == {"timestamps": [1672531200.0], "values": [1.5]}
+
+
+def test_database_blink_listener(connection: sqlite3.Connection) -> None:
+    """Test the blink listeners are called for the blinks counted in the rollups only"""
+    blinkhistory = BlinkHistoryDryEyeDefender(db_con=connection)
+    listener = Mock()
+    blinkhistory.add_blink_listener(listener)
+    blinkhistory.store_blink(MOCK_TIMESTAMP, 1, 0.1, 0.2, 1)
+    blinkhistory.write_blink_history(MOCK_TIMESTAMP + 0.1, 1, 0.1, 0.2, 0)
+    listener.assert_called_once_with(MOCK_TIMESTAMP)
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_database_query_blink_rate(blinkhistory: BlinkHistoryDryEyeDefender) -> None:
+    """Test the blink rate is read from the hour and day rollups at coarse resolutions"""
+    blinkhistory.store_blink(time.time() + 30, 1, 0.1, 0.2, 1)
+    blinkhistory.flush()
+    assert blinkhistory.db_con.execute(
+        "SELECT hour, blink_count, active_minutes FROM blink_hour_rollup ORDER BY hour"
+    ).fetchall() == [(464604, 2, 1), (464605, 1, 1)]
+    result = blinkhistory.query_blink_rate(time.time() - 86400, resolution=2 * 3600,
+                                           tz_offset_s=0)
+    assert result == {"timestamps": [1672574400.0], "values": [1.5]}
+    result = blinkhistory.query_blink_rate(time.time() - 86400, time.time() - 1,
+                                           resolution=3600, tz_offset_s=0)
+    assert result == {"timestamps": [1672574400.0], "values": [2.0]}
+    result = blinkhistory.query_blink_rate(time.time() - 86400 * 7, resolution=7 * 86400,
+                                           tz_offset_s=0)
+    assert result == {"timestamps": [1672272000.0], "values": [1.5]}
+    result = blinkhistory.query_blink_rate(time.time(), resolution=1)
+    assert result == {"timestamps": [time.time() + 30], "values": [1]}
+    with pytest.raises(ValueError):
+        blinkhistory.query_blink_rate(time.time() - 86400, resolution=90)
+    with pytest.raises(ValueError):
+        blinkhistory.query_blink_counts(time.time() - 86400, resolution=30)
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_database_retention(connection: sqlite3.Connection) -> None:
+    """Test raw blink rows past the retention period are deleted but stay counted in the
+    rollups, and incremental auto vacuum is enabled
+    """
+    blinkhistory = BlinkHistoryDryEyeDefender(db_con=connection, retention_days=1)
+    blinkhistory.store_blink(time.time() - 2 * 24 * 60 * 60, 1, 0.1, 0.2, 1)
+    blinkhistory.run_maintenance()
+    assert connection.execute("SELECT COUNT(*) FROM blink_history").fetchone()[0] == 3
+    result = blinkhistory.query_blink_rate(time.time() - 7 * 24 * 60 * 60, resolution=86400,
+                                           tz_offset_s=0)
+    assert result == {"timestamps": [1672358400.0, 1672531200.0], "values": [1.0, 2.0]}
+    # 2 is INCREMENTAL
+    assert connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_database_query_as_array(blinkhistory: BlinkHistoryDryEyeDefender) -> None:
+    """Test queries fill NumPy arrays when asked to, including when nothing matches"""
+    result = blinkhistory.query_raw_blink_history_no_grouping(time.time() - 60, as_array=True)
+    assert result["timestamps"].dtype == np.float64
+    assert result["values"].dtype == np.int32
+    np.testing.assert_array_equal(result["timestamps"], [time.time() - 3, time.time() - 1])
+    np.testing.assert_array_equal(result["values"], [1, 1])
+    result = blinkhistory.query_blink_history_groupby_minute_since(time.time() - 60,
+                                                                   as_array=True)
+    np.testing.assert_array_equal(result["timestamps"], [1672577940.0])
+    np.testing.assert_array_equal(result["values"], [2.0])
+    result = blinkhistory.query_events(time.time() - 60, [EventTypes.POPUP_NOTIFICATION],
+                                       as_array=True)
+    assert len(result["timestamps"]) == 0
+    assert len(result["values"]) == 0
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_database_query_blink_rate_timezone(blinkhistory: BlinkHistoryDryEyeDefender) -> None:
+    """Test bins are aligned to the timezone offset, falling back to a finer tier when the
+    offset is not a whole number of bins of the coarser one
+    """
+    blinkhistory.store_blink(time.time() + 30, 1, 0.1, 0.2, 1)
+    # 12:59 and 13:00 UTC fall on either side of midnight in UTC-13
+    result = blinkhistory.query_blink_rate(time.time() - 86400, resolution=86400,
+                                           tz_offset_s=-13 * 3600)
+    assert result == {"timestamps": [1672491600.0, 1672578000.0], "values": [2.0, 1.0]}
+    # 12:59 and 13:00 UTC are both between 18:00 and 19:00 in UTC+05:30
+    result = blinkhistory.query_blink_rate(time.time() - 86400, resolution=3600,
+                                           tz_offset_s=5 * 3600 + 30 * 60)
+    assert result == {"timestamps": [1672576200.0], "values": [1.5]}
+
+
+@freeze_time(MOCK_TIME)
+@pytest.mark.usefixtures("setup_db")
+def test_stats_query_cache(blinkhistory: BlinkHistoryDryEyeDefender) -> None:
+    """Test the stats cache only fetches from its newest bin onwards and merges the result"""
+    query_cache = StatsQueryCache(blinkhistory)
+    result = query_cache.query_blink_rate("last_hour", time.time() - 3600, 60, tz_offset_s=0)
+    np.testing.assert_array_equal(result["timestamps"], [1672577940.0])
+    blinkhistory.store_blink(time.time() + 30, 1, 0.1, 0.2, 1)
+    with patch.object(blinkhistory, "query_blink_rate",
+                      wraps=blinkhistory.query_blink_rate) as query_blink_rate:
+        result = query_cache.query_blink_rate("last_hour", time.time() - 3600, 60,
+                                              tz_offset_s=0)
+    assert query_blink_rate.call_args.args == (1672577940.0,)
+    np.testing.assert_array_equal(result["timestamps"], [1672577940.0, 1672578000.0])
+    np.testing.assert_array_equal(result["values"], [2.0, 1.0])
@@ -0,0 +1,96 @@
+"""Test tracking the face region of interest and remapping the landmarks to the full frame"""
+from typing import Any, NamedTuple
+
+import numpy as np
+import pytest
+
+from dryeye_defender.utils.face_roi import FaceRoiTracker, landmarks_to_array
+
+FRAME_SHAPE = (480, 640, 3)
+
+
+class Landmark(NamedTuple):
+    """MediaPipe style landmark"""
+
+    x: float
+    y: float
+    z: float
+
+
+def face_landmarks(x_min: float, y_min: float, x_max: float, y_max: float) -> Any:
+    """Landmarks at the corners of a face bounding box, normalised to the frame"""
+    return np.array([[x_min, y_min], [x_max, y_min], [x_min, y_max], [x_max, y_max]])
+
+
+def test_landmarks_to_array() -> None:
+    """Landmark objects and arrays of one or more faces are converted to (N, 2) arrays"""
+    expected = [[0.1, 0.2], [0.3, 0.4]]
+    landmarks = [Landmark(0.1, 0.2, 0.5), Landmark(0.3, 0.4, 0.5)]
+    assert landmarks_to_array(landmarks) == pytest.approx(np.array(expected))
+    assert landmarks_to_array(np.array([[[0.1, 0.2, 0.5], [0.3, 0.4, 0.5]]])) == pytest.approx(
+        np.array(expected))
+    assert landmarks_to_array([]) is None
+    assert landmarks_to_array(None) is None
+
+
+def test_face_roi_margin() -> None:
+    """The crop is the face bounding box enlarged by the margin on each side"""
+    tracker = FaceRoiTracker(margin=0.5)
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    image, roi = tracker.crop(frame)
+    assert image is frame and roi is None
+    # A 160 x 120 px face at (240, 180)
+    tracker.update(face_landmarks(0.375, 0.375, 0.625, 0.625), None, FRAME_SHAPE)
+    assert tracker.roi == (160, 120, 480, 360)
+    image, roi = tracker.crop(frame)
+    assert roi == tracker.roi
+    assert image.shape == (240, 320, 3)
+
+
+def test_face_roi_clamped_to_frame() -> None:
+    """The crop does not extend outside of the frame"""
+    tracker = FaceRoiTracker(margin=0.5)
+    tracker.update(face_landmarks(0.0, 0.5, 0.3, 1.0), None, FRAME_SHAPE)
+    assert tracker.roi == (0, 120, 288, 480)
+
+
+def test_face_roi_lost_and_reacquired() -> None:
+    """The full frame is processed once the face is lost, and the crop resumes once it is found
+    again
+    """
+    tracker = FaceRoiTracker()
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    tracker.update(face_landmarks(0.4, 0.4, 0.6, 0.6), None, FRAME_SHAPE)
+    _, roi = tracker.crop(frame)
+    assert roi is not None
+    assert tracker.update(None, roi, FRAME_SHAPE) is None
+    image, roi = tracker.crop(frame)
+    assert image is frame and roi is None
+    tracker.update(face_landmarks(0.1, 0.1, 0.3, 0.3), None, FRAME_SHAPE)
+    _, roi = tracker.crop(frame)
+    assert roi == tracker.roi
+
+
+def test_face_roi_full_frame_interval() -> None:
+    """The full frame is processed periodically to re-acquire a face that moved fast"""
+    tracker = FaceRoiTracker(full_frame_interval=2)
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    tracker.update(face_landmarks(0.4, 0.4, 0.6, 0.6), None, FRAME_SHAPE)
+    assert [tracker.crop(frame)[1] is None for _ in range(3)] == [False, False, True]
+
+
+def test_face_roi_remap_landmarks() -> None:
+    """Landmarks detected in the crop are returned normalised to the full frame, and the debug
+    image of the crop is pasted back at the same place
+    """
+    tracker = FaceRoiTracker()
+    roi = (100, 50, 300, 250)
+    landmarks = tracker.update(np.array([[0.0, 0.0], [0.5, 0.5], [1.0, 1.0]]), roi, FRAME_SHAPE)
+    assert landmarks == pytest.approx(np.array([[100 / 640, 50 / 480],
+                                                [200 / 640, 150 / 480],
+                                                [300 / 640, 250 / 480]]))
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    debug_img = FaceRoiTracker.remap_image(frame, np.full((200, 200, 3), 255, np.uint8), roi)
+    assert debug_img.shape == FRAME_SHAPE
+    assert debug_img[50:250, 100:300].min() == 255
+    assert debug_img.sum() == 255 * 200 * 200 * 3
@@ -0,0 +1,60 @@
+# pylint: disable = protected-access
+"""Test the capture stage reading frames on a background thread, with a fake capture device"""
+import threading
+import time
+from typing import Any, List, Tuple
+
+from dryeye_defender.widgets.components.frame_grabber import CAMERA_RETRY_DELAY_S, FrameGrabber
+
+TIMEOUT_S = 2.0
+
+
+class FakeCapture:
+    """Capture device returning the given frames, then failing like a disconnected camera"""
+
+    def __init__(self, frames: List[Any]) -> None:
+        self.frames = list(frames)
+        self.read_count = 0
+        self.exhausted = threading.Event()
+
+    def read(self) -> Tuple[bool, Any]:
+        """Return the next frame, or (False, None) once all frames were read"""
+        self.read_count += 1
+        if not self.frames:
+            self.exhausted.set()
+            return False, None
+        return True, self.frames.pop(0)
+
+
+def test_frame_grabber_keeps_newest_frames() -> None:
+    """Only the newest frames are kept in the ring buffer and `read()` returns the newest one,
+    then reports that no frame is available once the source ended
+    """
+    cap = FakeCapture(list(range(10)))
+    frame_grabber = FrameGrabber(cap, buffer_size=3)  # type: ignore[arg-type]
+    frame_grabber.start()
+    try:
+        assert cap.exhausted.wait(TIMEOUT_S)
+        assert [img for _, _, img in frame_grabber._frames] == [7, 8, 9]
+        ret, img, timestamp = frame_grabber.read(timeout=TIMEOUT_S)
+        assert ret and img == 9
+        assert timestamp <= time.time()
+        # The newest frame was already returned and the source has ended
+        assert frame_grabber.read(timeout=0.05) == (False, None, 0.0)
+    finally:
+        frame_grabber.stop()
+
+
+def test_frame_grabber_stop() -> None:
+    """`stop()` interrupts the retry delay of a failing camera and no frame is read after it"""
+    cap = FakeCapture([])
+    frame_grabber = FrameGrabber(cap)  # type: ignore[arg-type]
+    frame_grabber.start()
+    assert cap.exhausted.wait(TIMEOUT_S)
+    start = time.perf_counter()
+    frame_grabber.stop()
+    assert time.perf_counter() - start < CAMERA_RETRY_DELAY_S
+    assert frame_grabber._thread is None
+    read_count = cap.read_count
+    time.sleep(0.05)
+    assert cap.read_count == read_count
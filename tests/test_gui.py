@@ -2,9 +2,13 @@
 """
 This is a unit test for running the application, and testing the detector on a few dummy frames.
 """
+import sqlite3
+import threading
 import time
+from contextlib import closing
+from pathlib import Path
 from typing import Generator, Any
-from unittest.mock import patch
+from unittest.mock import Mock, PropertyMock, patch
 
 import cv2
 import pytest
@@ -13,13 +17,17 @@ from PySide6.QtCore import Qt
 from pytestqt.qtbot import QtBot  # type: ignore[import-untyped]
 
 from dryeye_defender.__main__ import Application
+from dryeye_defender.utils.database import INSERT_BLINK_SQL, BlinkHistoryDryEyeDefender
+from dryeye_defender.utils.database_writer import DatabaseWriter
 from dryeye_defender.utils.utils import get_saved_data_path
 from dryeye_defender.widgets.components.blink_model_thread import BlinkModelThread
-from dryeye_defender.widgets.settings_window import Window
+from dryeye_defender.widgets.settings_window import (ALERT_SECONDS_COOLDOWN,
+                                                     UNTRUSTED_LACK_OF_BLINK_FACTOR, Window)
 
 DUMMY_IMAGE_PATH = "tests/assets/dummy.jpg"
 NO_BLINKING_IMAGE_PATH = "tests/assets/no_blink.jpg"
 BLINKING_IMAGE_PATH = "tests/assets/blink.jpg"
+MISSING_IMAGE_PATH = "tests/assets/missing.jpg"
 BLINK_MODEL_THREAD_TIMEOUT_MS = 3000
 
 
@@ -36,6 +44,10 @@ class MockVideoCapture:
         """Read from the dummy image"""
         return cv2.VideoCapture(self.image_path).read()  # pylint: disable=no-member
 
+    def isOpened(self) -> bool:  # pylint: disable=invalid-name
+        """Whether the dummy image could be opened"""
+        return bool(self._cap.isOpened())
+
     def release(self) -> None:
         """Release the dummy image"""
         self._cap.release()
@@ -107,6 +119,53 @@ def mock_init_cap_blink(self: BlinkModelThread, input_device: int) -> None:
     self.cap = MockVideoCapture(BLINKING_IMAGE_PATH)  # type: ignore[assignment]
 
 
+def mock_init_cap_no_frame(self: BlinkModelThread, input_device: int) -> None:
+    """Mock the init_cap function to use a camera which returns no frame"""
+    self.cap = MockVideoCapture(MISSING_IMAGE_PATH)  # type: ignore[assignment]
+
+
+def create_window(qtbot: QtBot, qapp: Application) -> Window:
+    """Create the settings window and wait for its default camera to be opened in the
+    background
+    """
+    window = Window(qapp.main_window.centralWidget())
+    qtbot.waitUntil(lambda: "camera" not in window._pending_startup_steps,
+                    timeout=BLINK_MODEL_THREAD_TIMEOUT_MS)
+    return window
+
+
+def test_application_deferred_startup(qtbot: QtBot, qapp: Application) -> None:
+    """Test the window is shown and the camera opened while the model is still loading, and
+    detection can be enabled once the camera is open
+    """
+    load_model = BlinkModelThread._load_model
+    loading_allowed = threading.Event()
+
+    def blocking_load_model(self: BlinkModelThread, *args: Any) -> None:
+        loading_allowed.wait()
+        load_model(self, *args)
+
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap", new=mock_init_cap
+    ), patch.object(BlinkModelThread, "_load_model", new=blocking_load_model):
+        try:
+            window = Window(qapp.main_window.centralWidget())
+            window.show()
+            assert window.isVisible()
+            assert window.blink_thread.is_model_loading()
+            assert window.startup_status_label.isVisible()
+            qtbot.waitUntil(window.toggle_button.isEnabled, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS)
+            assert window.blink_thread.is_model_loading()
+            assert "model" in window._pending_startup_steps
+            with qtbot.waitSignal(
+                window.blink_thread.model_loaded, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
+            ):
+                loading_allowed.set()
+        finally:
+            loading_allowed.set()
+        assert "model" not in window._pending_startup_steps
+
+
 def test_application(qtbot: QtBot, qapp: Application) -> None:
     """Test the main application, running the detector using the debug compute button for a few
     frames on a dummy image
@@ -114,7 +173,7 @@ def test_application(qtbot: QtBot, qapp: Application) -> None:
     with patch(
         "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap", new=mock_init_cap
     ):
-        window = Window(qapp.main_window.centralWidget())
+        window = create_window(qtbot, qapp)
         for _ in range(5):
             with qtbot.waitSignal(
                 window.blink_thread.finished, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
@@ -123,6 +182,40 @@ def test_application(qtbot: QtBot, qapp: Application) -> None:
                 assert window.blink_thread.isRunning()
 
 
+def test_application_no_frame(qtbot: QtBot, qapp: Application) -> None:
+    """Test frame_processed is still emitted when the camera returns no frame, so that the lack
+    of blink check runs on every tick
+    """
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap_no_frame,
+    ):
+        window = create_window(qtbot, qapp)
+        with qtbot.waitSignal(
+            window.blink_thread.frame_processed, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
+        ):
+            window.blink_thread.start_thread()
+
+
+def test_application_persistent_worker(qtbot: QtBot, qapp: Application) -> None:
+    """Test running the detector as a persistent frame loop on a dummy image, which should keep
+    processing frames until it is stopped
+    """
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap", new=mock_init_cap
+    ):
+        window = create_window(qtbot, qapp)
+        window.blink_thread.start_continuous(target_fps=20)
+        for _ in range(3):
+            with qtbot.waitSignal(
+                window.blink_thread.frame_processed, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
+            ):
+                pass
+            assert window.blink_thread.isRunning()
+        window.blink_thread.stop_continuous()
+        assert not window.blink_thread.isRunning()
+
+
 def test_application_no_blink(qtbot: QtBot, qapp: Application) -> None:
     """Test the main application, running the detector using the debug compute button for a frame
     on an image of a face that isn't blinking
@@ -131,7 +224,7 @@ def test_application_no_blink(qtbot: QtBot, qapp: Application) -> None:
         "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
         new=mock_init_cap_no_blink,
     ):
-        window = Window(qapp.main_window.centralWidget())
+        window = create_window(qtbot, qapp)
         with qtbot.waitSignal(
             window.blink_thread.finished, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
         ):
@@ -152,7 +245,7 @@ def test_application_blink(qtbot: QtBot, qapp: Application) -> None:
         "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
         new=mock_init_cap_blink,
     ):
-        window = Window(qapp.main_window.centralWidget())
+        window = create_window(qtbot, qapp)
         with qtbot.waitSignal(
             window.blink_thread.finished, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
         ):
@@ -173,7 +266,7 @@ def test_application_popup(qtbot: QtBot, qapp: Application) -> None:
         "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
         new=mock_init_cap_no_blink,
     ):
-        window = Window(qapp.main_window.centralWidget())
+        window = create_window(qtbot, qapp)
 
         # Set variables so that the popup window will appear
         window.notification_dropdown.set_current_notification_settings(
@@ -194,3 +287,162 @@ def test_application_popup(qtbot: QtBot, qapp: Application) -> None:
 
         qtbot.mouseClick(window.toggle_button, Qt.MouseButton.LeftButton)
         assert not window.toggle_button.isChecked()
+
+
+def test_application_live_stats(qtbot: QtBot, qapp: Application) -> None:
+    """Test a blink detected on an image of a face that is blinking is appended to the stats
+    graph in live mode, without refreshing it
+    """
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap_blink,
+    ):
+        window = create_window(qtbot, qapp)
+        window._open_blink_stats()
+        assert window.blink_stats_window is not None
+        blink_graph = window.blink_stats_window.blink_graph
+        window.blink_stats_window.live_checkbox.setChecked(True)
+        bar_count = blink_graph._blink_series.size
+        with qtbot.waitSignal(
+            window.blink_thread.blink_detected, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
+        ):
+            window.blink_thread.start_thread()  # run one frame
+        qtbot.waitUntil(lambda: len(blink_graph.blink_bars.opts["x"]) == bar_count + 1,
+                        timeout=BLINK_MODEL_THREAD_TIMEOUT_MS)
+        window.blink_stats_window.close()
+
+
+def test_application_reopen_stats(qtbot: QtBot, qapp: Application) -> None:
+    """Test the stats window is reused when opened again, leaving live mode when closed"""
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap,
+    ):
+        window = create_window(qtbot, qapp)
+        window._open_blink_stats()
+        stats_window = window.blink_stats_window
+        assert stats_window is not None
+        stats_window.live_checkbox.setChecked(True)
+        assert stats_window.blink_graph.live
+        stats_window.close()
+        assert not stats_window.blink_graph.live
+        window._open_blink_stats()
+        assert window.blink_stats_window is stats_window
+        assert stats_window.isVisible()
+        stats_window.close()
+
+
+def test_application_reopen_debug_window(qtbot: QtBot, qapp: Application) -> None:
+    """Test the debug window is reused when opened again, and the thread stops rendering debug
+    outputs once it is closed
+    """
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap,
+    ):
+        window = create_window(qtbot, qapp)
+        window._open_facial_window()
+        debug_window = window.debug_window
+        window._open_facial_window()
+        assert window.debug_window is debug_window
+        assert window.blink_thread._debug_subscribers
+        assert debug_window is not None
+        debug_window.close()
+        assert not window.blink_thread._debug_subscribers
+
+
+def test_application_probe_capture_profiles(qtbot: QtBot, qapp: Application) -> None:
+    """Test the capture profiles are probed in the background when the dropdown is opened, and
+    listed once probed
+    """
+    probing_allowed = threading.Event()
+    supported_profiles = ["Camera Default", "640x480 MJPG 30fps"]
+
+    def blocking_probe_capture_profiles(self: BlinkModelThread) -> list[str]:
+        probing_allowed.wait()
+        return supported_profiles
+
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap", new=mock_init_cap
+    ), patch.object(BlinkModelThread, "probe_capture_profiles",
+                    new=blocking_probe_capture_profiles):
+        window = create_window(qtbot, qapp)
+        try:
+            window._update_capture_profiles()
+            assert window.select_capture_profile.count() == 1
+        finally:
+            probing_allowed.set()
+        qtbot.waitUntil(lambda: window.select_capture_profile.count() == 2,
+                        timeout=BLINK_MODEL_THREAD_TIMEOUT_MS)
+        assert window._supported_capture_profiles[window.blink_thread.input_device] == (
+            supported_profiles
+        )
+
+
+def test_application_tick_stats(qtbot: QtBot, qapp: Application) -> None:
+    """Test the timer ticks and the effective frame rate are reported after a frame"""
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap,
+    ):
+        window = create_window(qtbot, qapp)
+        with qtbot.waitSignal(
+            window.blink_thread.tick_stats_updated, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS
+        ) as blocker:
+            window.blink_thread.start_thread()  # run one frame
+        tick_stats = blocker.args[0]
+        assert tick_stats["requested"] == tick_stats["executed"] + tick_stats["skipped"]
+        assert tick_stats["executed"] >= 1
+        assert set(tick_stats["fps"]) == {"1s", "10s", "60s"}
+
+
+def test_blink_thread_writes_through_writer(qtbot: QtBot, tmp_path: Path) -> None:
+    """Test the row of a frame processed by the thread is queued to the database writer rather
+    than committed on the shared connection by the inference thread
+    """
+    db_api = BlinkHistoryDryEyeDefender(tmp_path / "blink.db")
+    blink_thread = BlinkModelThread(db_api, Mock(), Mock(), 10000)
+    blink_thread.cap = MockVideoCapture(BLINKING_IMAGE_PATH)  # type: ignore[assignment]
+    assert blink_thread.model_api  # wait for the model to load
+    writer = db_api._writer
+    write = DatabaseWriter.write
+    with patch.object(DatabaseWriter, "write", autospec=True, side_effect=write) as queue_write:
+        with qtbot.waitSignal(blink_thread.frame_processed, timeout=BLINK_MODEL_THREAD_TIMEOUT_MS):
+            blink_thread.start_thread()
+        blink_thread.wait()
+    db_api.close()
+    # The threads of the windows created by the other tests write through their own writers
+    assert [call.args[1] for call in queue_write.call_args_list
+            if call.args[0] is writer] == [INSERT_BLINK_SQL]
+    with closing(sqlite3.connect(tmp_path / "blink.db")) as db_con:
+        assert db_con.execute("SELECT COUNT(*) FROM blink_history").fetchone()[0] == 1
+
+
+def test_application_low_frame_rate_reminder(qtbot: QtBot, qapp: Application) -> None:
+    """Test a lack of blink is not reminded of while the frame rate is too low to trust it, but
+    is once no blink was detected for long enough
+    """
+    with patch(
+        "dryeye_defender.widgets.settings_window.BlinkModelThread.init_cap",
+        new=mock_init_cap,
+    ), patch.object(Window, "blink_reminder", new_callable=PropertyMock) as blink_reminder:
+        window = create_window(qtbot, qapp)
+        assert window.blink_thread.model_api  # wait for the model to load
+        window.blink_thread._model_api = Mock(lack_of_blink=True)
+        window.notification_dropdown.dropdown.setCurrentIndex(
+            window.notification_dropdown.dropdown.findText("Popup"))
+        # 3 frames in the last 2 s
+        window.blink_thread.reset_frame_rate()
+        now = time.monotonic()
+        for frame_time in (now - 2, now - 1, now):
+            window.blink_thread._frame_rate.mark(frame_time)
+        assert not window.blink_thread.is_rate_trustworthy(10)
+        window.last_end_of_alert_time = time.time() - ALERT_SECONDS_COOLDOWN - 1
+        window.last_blink_time = time.time()
+        window.thread_finished_slot()
+        blink_reminder.return_value.show_reminder.assert_not_called()
+        assert window._suppressed_alerts.value == 1
+        window.last_blink_time = time.time() - UNTRUSTED_LACK_OF_BLINK_FACTOR * (
+            window.blink_thread.lack_of_blink_threshold + 1)
+        window.thread_finished_slot()
+        blink_reminder.return_value.show_reminder.assert_called_once()
@@ -0,0 +1,65 @@
+"""Test the pipeline metrics and their export"""
+import json
+from pathlib import Path
+
+import pytest
+
+from dryeye_defender.utils.metrics import MetricsFileExporter, MetricsRegistry
+
+
+def test_rolling_histogram() -> None:
+    """Percentiles are computed over the last samples only, buckets over all samples"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.01, 0.1),
+                                   window_size=4)
+    for value in [1.0, 1.0, 0.005, 0.005, 0.05, 0.05]:
+        histogram.observe(value)
+    assert sorted(histogram.window()) == [0.005, 0.005, 0.05, 0.05]
+    assert histogram.percentiles([0, 100]) == {"p0": 0.005, "p100": 0.05}
+    assert histogram.snapshot()["buckets"] == {"0.01": 2, "0.1": 4, "+Inf": 6}
+    assert registry.histogram("latency_seconds", "Latency") is histogram
+    with pytest.raises(ValueError):
+        registry.counter("latency_seconds", "Latency")
+
+
+def test_rate_meter() -> None:
+    """Rates are computed over the window, or since the first event if more recent, and over the
+    period covered by the kept events once older ones are overwritten
+    """
+    rate_meter = MetricsRegistry().rate_meter("frames_per_second", "FPS", capacity=100)
+    assert rate_meter.rate(10, now=0.0) == 0.0
+    for i in range(50):
+        rate_meter.mark(i * 0.1)
+    assert rate_meter.rate(10, now=5.0) == pytest.approx(10.0)
+    assert rate_meter.rate(1, now=5.0) == pytest.approx(10.0)
+    # No events for 5 s halves the rate over 10 s
+    assert rate_meter.rate(10, now=10.0) == pytest.approx(5.0)
+    assert rate_meter.rate(1, now=10.0) == 0.0
+    for i in range(200):
+        rate_meter.mark(10 + i * 0.01)
+    # Only the last 100 events, from 11 s, are kept
+    assert rate_meter.rate(60, now=12.0) == pytest.approx(100.0)
+    rate_meter.reset()
+    assert rate_meter.history_s(now=20.0) == 0.0
+    assert rate_meter.rate(10, now=20.0) == 0.0
+
+
+def test_metrics_export(tmp_path: Path) -> None:
+    """The metrics are exported in the Prometheus text format and as JSON"""
+    registry = MetricsRegistry(prefix="test_")
+    registry.counter("ticks_dropped_total", "Dropped ticks").inc(3)
+    registry.histogram("latency_seconds", "Latency", buckets=(0.01,)).observe(0.002)
+    prometheus = registry.to_prometheus().splitlines()
+    assert "# TYPE test_ticks_dropped_total counter" in prometheus
+    assert "test_ticks_dropped_total 3" in prometheus
+    assert 'test_latency_seconds_bucket{le="0.01"} 1' in prometheus
+    assert 'test_latency_seconds_bucket{le="+Inf"} 1' in prometheus
+    assert "test_latency_seconds_count 1" in prometheus
+    assert 'test_latency_seconds_rolling{quantile="0.5"} 0.002' in prometheus
+
+    exporter = MetricsFileExporter(registry, tmp_path / "metrics.json", interval_s=60)
+    exporter.start()
+    exporter.stop()
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["ticks_dropped_total"] == {"value": 3}
+    assert metrics["latency_seconds"]["count"] == 1
@@ -0,0 +1,36 @@
+"""Test the utils functions"""
+import numpy as np
+import pytest
+
+from dryeye_defender.utils.utils import bgr_array_to_qimage, env_flag
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1", True), ("true", True), ("True", True), ("yes", True),
+    ("0", False), ("false", False), ("", False), ("no", False),
+])
+def test_env_flag(monkeypatch: pytest.MonkeyPatch, value: str, expected: bool) -> None:
+    """Only "1", "true" and "yes" enable a flag"""
+    monkeypatch.setenv("TEST_FLAG", value)
+    assert env_flag("TEST_FLAG") is expected
+
+
+def test_env_flag_unset(monkeypatch: pytest.MonkeyPatch) -> None:
+    """An unset flag is disabled"""
+    monkeypatch.delenv("TEST_FLAG", raising=False)
+    assert not env_flag("TEST_FLAG")
+
+
+def test_bgr_array_to_qimage() -> None:
+    """The image owns a copy of the pixels, in the BGR order of OpenCV, with an odd width whose
+    rows are padded in the QImage
+    """
+    img = np.zeros((2, 3, 3), dtype=np.uint8)
+    img[0, 0] = (255, 0, 0)  # blue
+    img[1, 2] = (0, 0, 255)  # red
+    image = bgr_array_to_qimage(img)
+    img[:] = 0
+    assert (image.width(), image.height()) == (3, 2)
+    assert image.pixelColor(0, 0).name() == "#0000ff"
+    assert image.pixelColor(2, 1).name() == "#ff0000"
+    assert image.pixelColor(1, 0).name() == "#000000"